@@ -2,66 +2,259 @@
 # ==============================================================================================================#
 #                                           IMPORTA BIBLIOTECAS
 # ==============================================================================================================#
+# só o necessário para desenhar a página: as bibliotecas pesadas (plotly, folium, streamlit_folium,
+# streamlit_extras, pyarrow) são importadas na visão que as usa, depois que o esqueleto da página já apareceu
 import streamlit as st
-import streamlit_extras
-from streamlit_extras.add_vertical_space import add_vertical_space
-from streamlit_extras.row import row
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import datetime
+import os
 import numpy as np
-from streamlit_folium import st_folium
-import folium
 import time
+from functools import partial
+
+from queimadas.instrumentacao import execucao_atual, finalizar_execucao, iniciar_execucao, metricas, trecho
+
+# cada execução do script (rerun) é medida: tempo de cada etapa, acertos/falhas dos caches e linhas lidas
+iniciar_execucao('app')
 
 # ==============================================================================================================#
 #                                     DEFINE FUNÇÕES
 # ==============================================================================================================#
-# Cache the conversion to prevent computation on every rerun
-# Função que carrega os dados de focos tabulares
+# Função que retorna o serviço de consultas dos focos (cubo de contagens, focos individuais e cache LRU dos
+# resultados). Uma única instância (somente leitura) é compartilhada por todas as sessões.
+
+
+@st.cache_resource
+def load_servico():
+    from queimadas.servico import ServicoFocos
+    return ServicoFocos()
+
+# Função que retorna o resultado de uma consulta para um estado e intervalo de datas. Granularidades: "diaria",
+# "mensal", "anual", "climatologia", "municipios" e "biomas" (rankings completos), "mapa" (focos agrupados
+# para o zoom passado em "parametros"), "eventos" (eventos de fogo, filtrados pelo bioma em "parametros") e
+# "satelites" (focos por mês de cada satélite)
+
+
+def consultar(granularidade, estado, data_inicial, data_final, *parametros):
+    return load_servico().consultar(granularidade, estado, data_inicial, data_final, *parametros)
+
+# Função que retorna os parâmetros das consultas dos painéis para o satélite escolhido (None: satélite de
+# referência)
+
+
+def parametros_satelite(satelite):
+    return () if satelite is None else (satelite,)
+
+# Função que carrega as grades mensais de focos (anos x 12 x lat x lon) usadas pelos mapas
+
+
+@st.cache_resource
+def load_grades():
+    from queimadas.grade import carregar_grades
+    return carregar_grades()
+
+# Função que monta o mapa do acumulado, da climatologia ou da anomalia de um ano/mês (mes=None é o ano todo)
+
+
+@st.cache_data(max_entries=64)
+def figura_mapa(tipo, ano=None, mes=None):
+    from queimadas.grade import figura_grade
+
+    grades = load_grades()
+
+    if tipo == 'climatologia':
+        periodo = 'Anual' if mes is None else f'Mês {mes:02d}'
+        return figura_grade(grades.climatologia(mes), grades.grade, f'Climatologia {periodo}')
+
+    periodo = str(ano) if mes is None else f'{mes:02d}/{ano}'
+
+    if tipo == 'acumulado':
+        return figura_grade(grades.acumulado(ano, mes), grades.grade, f'Acumulado {periodo}')
+
+    return figura_grade(grades.anomalia(ano, mes), grades.grade, f'Anomalia {periodo}', anomalia=True)
+
+# Função que monta a análise conjunta focos x chuva antecedente (grades de focos, regiões das células e cache
+# local do CHIRPS, sem o Earth Engine)
+
+
+@st.cache_resource
+def load_analise_conjunta():
+    from queimadas.conjunta import carregar_analise_conjunta
+    return carregar_analise_conjunta()
+
+# Função que monta as figuras da análise conjunta de uma região: "serie" (focos e chuva antecedente por mês),
+# "correlacao" (mapa da correlação da janela, mes=None: todos os meses) e "chuva" (mapa da chuva antecedente de
+# um ano/mês)
+
+
+@st.cache_data(max_entries=64)
+def figura_conjunta(tipo, estado=None, bioma=None, janela=None, ano=None, mes=None):
+    from queimadas.conjunta import figura_serie_conjunta
+    from queimadas.grade import figura_grade
+
+    analise = load_analise_conjunta()
+    regiao = estado or bioma or 'Brasil'
+
+    if tipo == 'serie':
+        return figura_serie_conjunta(analise.serie(estado, bioma), f'Focos x chuva antecedente: {regiao}')
+
+    if tipo == 'correlacao':
+        periodo = 'todos os meses' if mes is None else f'mês {mes:02d}'
+        return figura_grade(analise.mapa_correlacao(janela, mes, estado, bioma), analise.grade,
+                            f'Correlação focos x chuva de {janela} dias ({periodo})', anomalia=True,
+                            rotulo='Correlação')
+
+    return figura_grade(analise.mapa_chuva(ano, mes, janela, estado, bioma), analise.grade,
+                        f'Chuva dos {janela} dias antes de {mes:02d}/{ano}', rotulo='mm', cores='Blues')
+
+# largura máxima (pixels) dos gráficos de linha dos painéis: as séries mais longas são reduzidas a um ponto por
+# pixel antes de virar o JSON do plotly
+LARGURA_GRAFICO_PX = 700
 
+# Função que monta a figura de um painel da "Série Temporal". As figuras ficam em cache por (painel, filtro) e são
+# compartilhadas (somente leitura) entre as sessões: os painéis que não mudaram não são refeitos a cada execução.
 
-@st.cache_data
-def load_data():
 
-    # leitura do dataframe
-    # df = pd.read_csv(
-    #    'C:/Users/enriq/Downloads/PROCESSAMENTO_PYTHON/dashboards/01_queimadas/focos_br_AQUA_2003_2024.csv', compression='zip')
+@st.cache_resource(max_entries=128)
+def figura_painel(painel, estado, data_inicial, data_final, satelite=None):
 
-    # lendo todos dataframes
-    df_lat = pd.read_csv(
-        'dados/lat.csv', compression='zip')
-    df_lon = pd.read_csv(
-        'dados/lon.csv', compression='zip')
-    df_municipios = pd.read_csv(
-        'dados/municipios.csv', compression='zip')
-    df_estados = pd.read_csv(
-        'dados/estados.csv', compression='zip')
-    df_biomas = pd.read_csv(
-        'dados/biomas.csv', compression='zip')
+    import plotly.express as px
+    from queimadas.reducao import reduzir_serie
 
-    # junta
-    df = pd.concat([df_lat, df_lon, df_municipios,
-                   df_estados, df_biomas], axis=1)
+    serie = consultar(painel, estado, data_inicial, data_final, *parametros_satelite(satelite))
+    titulo = {'y': 0.93, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top', 'font_size': 20, 'font_color': 'red'}
 
-    # insere a coluna data como DateTime no DataFrame
-    df['data'] = pd.to_datetime(df['data'])
+    if painel in ('diaria', 'mensal'):
+        # min-max: os picos da série continuam no gráfico. As datas vão como "AAAA-MM-DD" (sem a hora) no JSON.
+        serie = reduzir_serie(serie, LARGURA_GRAFICO_PX)
+        serie = serie.set_axis(serie.index.strftime('%Y-%m-%d'))
+        fig = px.line(serie, width=300, height=300)
+        fig.update_layout(showlegend=False, xaxis_title="Mês/Ano", yaxis_title="Focos de Calor",
+                          xaxis_type='date',
+                          title={'text': 'Diária' if painel == 'diaria' else 'Mensal', **titulo})
 
-    # seta a coluna data com o index do dataframe
-    df.set_index('data', inplace=True)
+    elif painel == 'satelites':
+        # uma linha por satélite e a soma de todos sem as detecções repetidas
+        serie = serie.set_axis(serie.index.strftime('%Y-%m-%d'))
+        fig = px.line(serie, height=350)
+        fig.update_layout(xaxis_title="Mês/Ano", yaxis_title="Focos de Calor", xaxis_type='date',
+                          legend_title_text='Satélite', title={'text': 'Focos por satélite', **titulo})
 
-    # coloca em ordem crescente de data
-    df = df.sort_values('data')
+    elif painel == 'anual':
+        fig = px.bar(x=serie.index.year, y=serie.values, width=300, height=300)
+        fig.update_layout(showlegend=False, xaxis_title="Ano", yaxis_title="Focos de Calor",
+                          title={'text': 'Anual', **titulo})
 
-    return df
+    elif painel == 'climatologia':
+        fig = px.bar(serie, width=300, height=300)
+        fig.update_layout(showlegend=False, xaxis_title="Mês", yaxis_title="Focos de Calor",
+                          title={'text': 'Mensal Média', **titulo})
 
-# Função que tranforma dataframe para CSV
+    elif painel == 'municipios':
+        fig = px.bar(serie[0:2], width=300, height=600, orientation='h', color=["goldenrod", "goldenrod"])
+        fig.update_layout(showlegend=False, xaxis_title="Cidades", yaxis_title="Focos de Calor",
+                          title={'text': 'Top5 cidades com maiores ocorrências', **titulo, 'font_color': 'white'},
+                          paper_bgcolor='#18C99F',
+                          plot_bgcolor='#18C99F',
+                          yaxis={'color': 'white'},
+                          font=dict(family='Arial', size=64, color='rgb(67, 67, 67)'))
 
+    else:
+        fig = px.bar(serie[0:5], width=300, height=300)
+        fig.update_layout(showlegend=False, xaxis_title="Cidades", yaxis_title="Focos de Calor",
+                          title={'text': 'Top5 cidades com maiores ocorrências', **titulo})
 
-@st.cache_data
-def convert_df(df):
-    return df.to_csv(index=False).encode("utf-8")
+    return fig
+
+# Função que monta o gráfico dos eventos de fogo por mês de início (bioma=None: todos os biomas)
+
+
+@st.cache_resource(max_entries=64)
+def figura_eventos(estado, data_inicial, data_final, bioma=None):
+
+    import plotly.express as px
+    from queimadas.eventos import eventos_por_mes
+
+    eventos = consultar('eventos', estado, data_inicial, data_final, *(() if bioma is None else (bioma,)))
+    serie = eventos_por_mes(eventos)
+    serie = serie.set_axis(serie.index.strftime('%Y-%m-%d'))
+
+    fig = px.bar(serie, height=300)
+    fig.update_layout(showlegend=False, xaxis_title="Mês de início", yaxis_title="Eventos", xaxis_type='date',
+                      title={'text': 'Eventos de fogo por mês', 'y': 0.93, 'x': 0.5, 'xanchor': 'center',
+                             'yanchor': 'top', 'font_size': 20, 'font_color': 'red'})
+
+    return fig
+
+# Tabelas de download dos painéis: painel -> (nome do arquivo, colunas, quantidade de linhas)
+PAINEIS = {'diaria': ('focos_diario_total', ['data', 'focos'], None),
+           'anual': ('focos_anual_total', ['data', 'focos'], None),
+           'mensal': ('focos_mensal_total', ['data', 'focos'], None),
+           'climatologia': ('focos_mensal_climatologica', ['mês', 'focos'], None),
+           'municipios': ('top5_cidades', ['cidades', 'focos'], 2),
+           'biomas': ('top5_biomas', ['biomas', 'focos'], 5)}
+
+# Função que monta a tabela de download de um painel
+
+
+def tabela_painel(painel, estado, data_inicial, data_final, satelite=None):
+
+    import pandas as pd
+
+    _, colunas, linhas = PAINEIS[painel]
+    serie = consultar(painel, estado, data_inicial, data_final, *parametros_satelite(satelite))[:linhas]
+
+    return pd.DataFrame({colunas[0]: serie.index, colunas[1]: serie.values})
+
+# Funções que geram os arquivos de download. Elas são passadas para os botões e só rodam quando o botão é
+# clicado.
+
+
+def exportar_painel(painel, estado, data_inicial, data_final, formato, satelite=None):
+    from queimadas.exportacao import exportar
+    return exportar(tabela_painel(painel, estado, data_inicial, data_final, satelite), formato)
+
+
+def exportar_paineis(estado, data_inicial, data_final, formato, satelite=None):
+    from queimadas.exportacao import exportar_pacote
+    return exportar_pacote({PAINEIS[painel][0]: tabela_painel(painel, estado, data_inicial, data_final, satelite)
+                            for painel in PAINEIS}, formato)
+
+# Função que mostra o botão de download dos dados de um painel
+
+
+def botao_download(painel, estado, data_inicial, data_final, formato, satelite=None):
+    from queimadas.exportacao import extensao, mime
+    st.download_button(label="Download data",
+                       data=partial(exportar_painel, painel, estado, data_inicial, data_final, formato, satelite),
+                       file_name=f"{PAINEIS[painel][0]}.{extensao(formato)}",
+                       mime=mime(formato),
+                       key=f'download_{painel}')
+
+# Função que mostra, na barra lateral, o painel de administração: trechos medidos na execução anterior (esta
+# ainda não terminou), caches do serviço e agregados do processo. Aparece com "?admin=1" na URL ou com a
+# variável de ambiente QUEIMADAS_ADMIN=1.
+
+
+def painel_administracao():
+
+    import pandas as pd
+
+    with st.sidebar.expander(':orange[**Administração: desempenho**]'):
+
+        # execução anterior desta sessão (as recentes da instrumentação são do processo, de todas as sessões)
+        anterior = st.session_state.get('execucao_anterior')
+        if anterior is not None:
+            st.metric('Execução anterior desta sessão (ms)', f"{anterior['duracao_ms']:.0f}")
+            st.dataframe(pd.DataFrame(anterior['trechos']), hide_index=True)
+            st.json(anterior['contadores'], expanded=False)
+
+        st.markdown('**Cache de resultados**')
+        st.json(load_servico().cache.metricas(), expanded=False)
+
+        st.markdown('**Agregados do processo**')
+        agregados = metricas()
+        st.dataframe(pd.DataFrame(agregados['trechos']).T, use_container_width=True)
+        st.json(agregados['contadores'], expanded=False)
 
 
 # ==============================================================================================================#
@@ -96,14 +289,24 @@ with st.sidebar:
     st.write("-------------------")
 
     tipo_analise = st.radio(":orange[**Escolha o Tipo de Análise**]",
-                            ["**Série Temporal**", "**Distribuição Espacial**"],
-                            captions=["Gráficos temporais", "Mapas"])
+                            ["**Série Temporal**", "**Distribuição Espacial**", "**Focos x Chuva**"],
+                            captions=["Gráficos temporais", "Mapas", "Análise conjunta com o CHIRPS"],
+                            key='tipo_analise')
+
+execucao = execucao_atual()
+if execucao is not None:
+    execucao.atributos['visao'] = tipo_analise.strip('*')
 
 # ==============================================================================================================#
 #                                           ANÁLISE TEMPORAL
 # ==============================================================================================================#
 if tipo_analise == '**Série Temporal**':
 
+    # https://plotly.com/python/figure-labels/
+    st.markdown('# Série Temporal')
+
+    from queimadas.exportacao import FORMATOS, exportar_focos, extensao, mime
+
     # --------------------------------------------------------#
     #                      SIDEBAR
     # --------------------------------------------------------#
@@ -111,17 +314,12 @@ if tipo_analise == '**Série Temporal**':
 
         st.divider()
 
-        # with st.spinner('Carregando os dados. Favor aguardar...'):
-        #    time.sleep(5)
-
-        st.write('Carregando os dados. Favor aguardar...')
-
-        # carrega os dados
-        df = load_data()
+        # carrega só a lista de estados: o cubo de cada ano é lido quando um gráfico precisa dele
+        with st.spinner('Carregando os dados. Favor aguardar...'), trecho('carga', dados='estados'):
+            estados = load_servico().estados()
         # st.success(':orange[Carregamento dos dados finalizado!]')
 
         # seleciona o "ESTADO"
-        estados = sorted(df['estado'].unique().tolist())
         estado_selecionado = st.selectbox(
             ':orange[**Selecione o ESTADO**]:', estados)
 
@@ -132,16 +330,45 @@ if tipo_analise == '**Série Temporal**':
         data_final = st.date_input(':orange[**Digite a data FINAL**]:', min_value=datetime.date(
             2002, 3, 1), max_value=datetime.date(2024, 5, 31))
 
-        # filtra por Data
-        df_filtrado = df.loc[str(data_inicial):str(data_final)]
+        # satélite: o de referência (todos os anos) ou, depois da ingestão com --satelites, todos os satélites sem
+        # as detecções repetidas ou um deles (anos com arquivos mensais)
+        satelite = None
+        satelites = load_servico().satelites()
+        if satelites:
+            from queimadas.satelites import SATELITE_REFERENCIA, TODOS_SATELITES, TOLERANCIA_KM, TOLERANCIA_MINUTOS
+            opcoes = {f'Referência ({SATELITE_REFERENCIA})': None,
+                      'Todos (sem detecções repetidas)': TODOS_SATELITES,
+                      **{nome: nome for nome in satelites}}
+            satelite = opcoes[st.selectbox(':orange[**Selecione o SATÉLITE**]:', list(opcoes))]
+
+        # o satélite escolhido vale só para os painéis da série temporal: o mapa, os eventos de fogo e os focos
+        # brutos vêm do armazenamento do satélite de referência
+        aviso_referencia = None if satelite is None else \
+            f'Somente com os focos do satélite de referência ({SATELITE_REFERENCIA}): o satélite escolhido vale ' \
+            'para os gráficos da série temporal.'
+
+        # downloads: os arquivos só são gerados quando o botão é clicado
+        formato_download = st.radio(':orange[**Formato dos downloads**]', list(FORMATOS), horizontal=True)
+
+        st.download_button(label="Download de todos os gráficos (zip)",
+                           data=partial(exportar_paineis, estado_selecionado, data_inicial, data_final,
+                                        formato_download, satelite),
+                           file_name=f"focos_{estado_selecionado.lower()}_{data_inicial}_{data_final}.zip",
+                           mime='application/zip')
+
+        st.download_button(label="Download dos focos (dados brutos)" if satelite is None else
+                                 f"Download dos focos (dados brutos, {SATELITE_REFERENCIA})",
+                           data=partial(exportar_focos, estado_selecionado, data_inicial, data_final,
+                                        formato_download),
+                           file_name=f"focos_{estado_selecionado.lower()}_{data_inicial}_{data_final}."
+                                     f"{extensao(formato_download)}",
+                           mime=mime(formato_download), help=aviso_referencia)
 
-        # filtra por Estado
-        df_filtrado = df_filtrado[df_filtrado['estado'] == estado_selecionado]
-
-    # https://plotly.com/python/figure-labels/
-    st.markdown('# Série Temporal')
     st.markdown(f'### Estado selecionado = :red[{estado_selecionado.title()}]')
 
+    # consultas dos painéis no satélite escolhido (as séries mensal, anual e a climatologia saem da diária)
+    extras = parametros_satelite(satelite)
+
     # esta parte será usada para os gráficos
     col1, col2 = st.columns(2)  # 2 colunas
     col3, col4 = st.columns(2)  # 2 colunas
@@ -150,155 +377,81 @@ if tipo_analise == '**Série Temporal**':
     # --------------------------------------------------------#
     #               GRÁFICO: DIÁRIO TOTAL
     # --------------------------------------------------------#
-    with col1:
+    with col1, trecho('painel', painel='diaria'):
         tab1, tab2 = st.tabs(['Gráfico', 'Dados'])
         with tab1:
-            diaria = df_filtrado.groupby(pd.Grouper(freq='1D')).count()['lat']
-            fig_diaria = px.line(diaria, width=300, height=300)
-            fig_diaria.update_layout(showlegend=False, xaxis_title="Mês/Ano", yaxis_title="Focos de Calor",
-                                     title={'text': 'Diária',
-                                            'y': 0.93,
-                                            'x': 0.5,
-                                            'xanchor': 'center',
-                                            'yanchor': 'top',
-                                            'font_size': 20,
-                                            'font_color': 'red'})
-            col1.plotly_chart(fig_diaria, use_container_width=True)
+            diaria = consultar('diaria', estado_selecionado, data_inicial, data_final, *extras)
+            col1.plotly_chart(figura_painel('diaria', estado_selecionado, data_inicial, data_final, satelite),
+                              use_container_width=True)
 
         with tab2:
             st.dataframe(diaria)
 
         # botão de downaload dos dados
-        dfx = pd.DataFrame({'data': diaria.index, 'focos': diaria.values})
-        csv = convert_df(dfx)
-        st.download_button(label="Download data",
-                           data=csv,
-                           file_name="focos_diario_total.csv")
+        botao_download('diaria', estado_selecionado, data_inicial, data_final, formato_download, satelite)
 
         st.divider()
 
     # --------------------------------------------------------#
     #               GRÁFICO: ANUAL TOTAL
     # --------------------------------------------------------#
-    with col2:
+    with col2, trecho('painel', painel='anual'):
         tab1, tab2 = st.tabs(['Gráfico', 'Dados'])
         with tab1:
-            anual = df_filtrado.groupby(pd.Grouper(freq='1Y')).count()['lat']
-            fig_anual = px.bar(x=anual.index.year,
-                               y=anual.values, width=300, height=300)
-            fig_anual.update_layout(showlegend=False, xaxis_title="Ano", yaxis_title="Focos de Calor",
-                                    title={'text': 'Anual',
-                                           'y': 0.93,
-                                           'x': 0.5,
-                                           'xanchor': 'center',
-                                           'yanchor': 'top',
-                                           'font_size': 20,
-                                           'font_color': 'red'})
-            col2.plotly_chart(fig_anual, use_container_width=True)
+            anual = consultar('anual', estado_selecionado, data_inicial, data_final, *extras)
+            col2.plotly_chart(figura_painel('anual', estado_selecionado, data_inicial, data_final, satelite),
+                              use_container_width=True)
 
         with tab2:
             st.dataframe(anual)
 
         # botão de downaload dos dados
-        dfx = pd.DataFrame({'data': anual.index, 'focos': anual.values})
-        csv = convert_df(dfx)
-        st.download_button(label="Download data",
-                           data=csv,
-                           file_name="focos_anual_total.csv")
+        botao_download('anual', estado_selecionado, data_inicial, data_final, formato_download, satelite)
         st.divider()
 
     # --------------------------------------------------------#
     #               GRÁFICO: MENSAL TOTAL
     # --------------------------------------------------------#
-    with col3:
+    with col3, trecho('painel', painel='mensal'):
         tab1, tab2 = st.tabs(['Gráfico', 'Dados'])
         with tab1:
-            mensal = df_filtrado.groupby(pd.Grouper(freq='1M')).count()['lat']
-            fig_mensal = px.line(mensal, width=300, height=300)
-            fig_mensal.update_layout(showlegend=False, xaxis_title="Mês/Ano", yaxis_title="Focos de Calor",
-                                     title={'text': 'Mensal',
-                                            'y': 0.93,
-                                            'x': 0.5,
-                                            'xanchor': 'center',
-                                            'yanchor': 'top',
-                                            'font_size': 20,
-                                            'font_color': 'red'})
-            col3.plotly_chart(fig_mensal, use_container_width=True)
+            mensal = consultar('mensal', estado_selecionado, data_inicial, data_final, *extras)
+            col3.plotly_chart(figura_painel('mensal', estado_selecionado, data_inicial, data_final, satelite),
+                              use_container_width=True)
 
         with tab2:
             st.dataframe(mensal)
 
         # botão de downaload dos dados
-        dfx = pd.DataFrame({'data': mensal.index, 'focos': mensal.values})
-        csv = convert_df(dfx)
-        st.download_button(label="Download data",
-                           data=csv,
-                           file_name="focos_mensal_total.csv")
+        botao_download('mensal', estado_selecionado, data_inicial, data_final, formato_download, satelite)
 
     # --------------------------------------------------------#
     #               GRÁFICO: MENSAL MÉDIO
     # --------------------------------------------------------#
-    with col4:
+    with col4, trecho('painel', painel='climatologia'):
         tab1, tab2 = st.tabs(['Gráfico', 'Dados'])
         with tab1:
-            mensal_climatologia = mensal.groupby(mensal.index.month).mean()
-            meses = np.array(['Jan', 'Fev', 'Mar', 'Abr', 'Mai',
-                             'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'])
-            mensal_climatologia.index = meses
-            fig_mensal_climatologia = px.bar(
-                mensal_climatologia, width=300, height=300)
-            fig_mensal_climatologia.update_layout(showlegend=False, xaxis_title="Mês", yaxis_title="Focos de Calor",
-                                                  title={'text': 'Mensal Média',
-                                                         'y': 0.93,
-                                                         'x': 0.5,
-                                                         'xanchor': 'center',
-                                                         'yanchor': 'top',
-                                                         'font_size': 20,
-                                                         'font_color': 'red'})
-            col4.plotly_chart(fig_mensal_climatologia,
+            mensal_climatologia = consultar('climatologia', estado_selecionado, data_inicial, data_final, *extras)
+            col4.plotly_chart(figura_painel('climatologia', estado_selecionado, data_inicial, data_final, satelite),
                               use_container_width=True)
 
         with tab2:
             st.dataframe(mensal_climatologia)
 
         # botão de downaload dos dados
-        dfx = pd.DataFrame({'mês': meses,
-                            'focos': mensal_climatologia.values})
-        csv = convert_df(dfx)
-        st.download_button(label="Download data",
-                           data=csv,
-                           file_name="focos_mensal_climatologica.csv")
+        botao_download('climatologia', estado_selecionado, data_inicial, data_final, formato_download, satelite)
 
     # --------------------------------------------------------#
     #               GRÁFICO: TOP5 CIDADES
     # --------------------------------------------------------#
-    with col5:
+    with col5, trecho('painel', painel='municipios'):
 
         tab1, tab2 = st.tabs(['Gráfico', 'Dados'])
 
         with tab1:
-            top5 = df_filtrado['municipio'].value_counts(
-                normalize=False, ascending=False)[0:2]
-
-            fig_top5_cidades = px.bar(top5, width=300, height=600, orientation='h', color=[
-                                      "goldenrod", "goldenrod"])
-
-            fig_top5_cidades.update_layout(showlegend=False, xaxis_title="Cidades", yaxis_title="Focos de Calor",
-                                           title={'text': 'Top5 cidades com maiores ocorrências',
-                                                  'y': 0.93,
-                                                  'x': 0.5,
-                                                  'xanchor': 'center',
-                                                  'yanchor': 'top',
-                                                  'font_size': 20,
-                                                  'font_color': 'white'},
-                                           paper_bgcolor='#18C99F',
-                                           plot_bgcolor='#18C99F',
-                                           yaxis={'color': 'white'},
-                                           font=dict(
-                                               family='Arial', size=64, color='rgb(67, 67, 67)')
-                                           )
-
-            col5.plotly_chart(fig_top5_cidades, use_container_width=True)
+            top5 = consultar('municipios', estado_selecionado, data_inicial, data_final, *extras)[0:2]
+            col5.plotly_chart(figura_painel('municipios', estado_selecionado, data_inicial, data_final, satelite),
+                              use_container_width=True)
 
         with tab2:
             st.dataframe(top5)
@@ -312,31 +465,18 @@ if tipo_analise == '**Série Temporal**':
         expander.image("https://static.streamlit.io/examples/dice.jpg")
 
         # botão de downaload dos dados
-        dfx = pd.DataFrame({'cidades': top5.index, 'focos': top5.values})
-        csv = convert_df(dfx)
-        st.download_button(label="Download data", data=csv,
-                           file_name="top5_cidades.csv")
+        botao_download('municipios', estado_selecionado, data_inicial, data_final, formato_download, satelite)
 
     # --------------------------------------------------------#
     #                   GRÁFICO: BIOMA
     # --------------------------------------------------------#
-    with col6:
+    with col6, trecho('painel', painel='biomas'):
         tab1, tab2 = st.tabs(['Gráfico', 'Dados'])
         with tab1:
 
-            top5 = df_filtrado['bioma'].value_counts(
-                normalize=False, ascending=False)[0:5]
-
-            fig_top5_cidades = px.bar(top5, width=300, height=300)
-            fig_top5_cidades.update_layout(showlegend=False, xaxis_title="Cidades", yaxis_title="Focos de Calor",
-                                           title={'text': 'Top5 cidades com maiores ocorrências',
-                                                  'y': 0.93,
-                                                  'x': 0.5,
-                                                  'xanchor': 'center',
-                                                  'yanchor': 'top',
-                                                  'font_size': 20,
-                                                  'font_color': 'red'})
-            col6.plotly_chart(fig_top5_cidades, use_container_width=True)
+            top5 = consultar('biomas', estado_selecionado, data_inicial, data_final, *extras)[0:5]
+            col6.plotly_chart(figura_painel('biomas', estado_selecionado, data_inicial, data_final, satelite),
+                              use_container_width=True)
 
         with tab2:
             st.dataframe(top5)
@@ -349,9 +489,81 @@ if tipo_analise == '**Série Temporal**':
                         ''')
         expander.image("https://static.streamlit.io/examples/dice.jpg")
 
+    # --------------------------------------------------------#
+    #               GRÁFICO: FOCOS POR SATÉLITE
+    # --------------------------------------------------------#
+    if satelites:
+        with trecho('painel', painel='satelites'):
+            st.plotly_chart(figura_painel('satelites', estado_selecionado, data_inicial, data_final),
+                            use_container_width=True)
+            st.caption(f'Meses com arquivos mensais do INPE. Detecções de satélites diferentes a até '
+                       f'{TOLERANCIA_KM:g} km e {TOLERANCIA_MINUTOS} minutos uma da outra contam como um foco em '
+                       '"todos".')
+
+    # --------------------------------------------------------#
+    #               EVENTOS DE FOGO
+    # --------------------------------------------------------#
+    # focos próximos (até 2 km) em dias seguidos formam um evento; a tabela é gerada na ingestão
+    if load_servico().eventos is not None:
+
+        st.markdown('### Eventos de fogo')
+        if aviso_referencia:
+            st.caption(aviso_referencia)
+
+        with trecho('painel', painel='eventos'):
+            todos = consultar('eventos', estado_selecionado, data_inicial, data_final)
+            biomas = ['Todos'] + sorted(todos['bioma'].dropna().unique().tolist())
+            bioma_selecionado = st.selectbox('Selecione o :red[**Bioma**]:', biomas)
+            bioma = None if bioma_selecionado == 'Todos' else bioma_selecionado
+
+            eventos = todos if bioma is None else consultar('eventos', estado_selecionado, data_inicial,
+                                                            data_final, bioma)
+
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric('Eventos', len(eventos))
+            if len(eventos):
+                m2.metric('Focos por evento (mediana)', int(eventos['focos'].median()))
+                m3.metric('Duração média (dias)', f"{eventos['duracao_dias'].mean():.1f}")
+                m4.metric('Maior área (km²)', f"{eventos['area_km2'].max():.0f}")
+
+            col7, col8 = st.columns([2.0, 1.0], gap='medium')
+            col7.plotly_chart(figura_eventos(estado_selecionado, data_inicial, data_final, bioma),
+                              use_container_width=True)
+
+            col8.markdown('**Maiores eventos**')
+            col8.dataframe(eventos.nlargest(10, 'focos')[['inicio', 'duracao_dias', 'focos', 'area_km2',
+                                                          'municipio', 'bioma']], hide_index=True)
+
     # --------------------------------------------------------#
     #               GRÁFICO: MAPA FOLIUM
     # --------------------------------------------------------#
+    st.markdown('### Mapa dos focos de calor')
+    if aviso_referencia:
+        st.caption(aviso_referencia)
+
+    from streamlit_folium import st_folium
+    from queimadas.mapa import ZOOM_INICIAL, camada_focos, centro, mapa_base
+
+    # zoom e centro atuais do mapa (voltam ao padrão quando o filtro muda)
+    filtro_mapa = (estado_selecionado, data_inicial, data_final)
+    visao = st.session_state.get('mapa_focos') or {}
+    if st.session_state.get('mapa_focos_filtro') != filtro_mapa:
+        st.session_state['mapa_focos_filtro'] = filtro_mapa
+        visao = {}
+
+    zoom = int(visao.get('zoom') or ZOOM_INICIAL)
+
+    # os focos são agrupados no servidor para o zoom atual: o mapa recebe no máximo algumas mil células
+    focos_agrupados = consultar('mapa', estado_selecionado, data_inicial, data_final, zoom)
+
+    centro_mapa = visao.get('center') or {}
+    centro_mapa = (centro_mapa['lat'], centro_mapa['lng']) if centro_mapa else centro(focos_agrupados)
+
+    st.caption(f'{int(focos_agrupados["focos"].sum())} focos agrupados em {len(focos_agrupados)} células')
+    with trecho('mapa', celulas=len(focos_agrupados)):
+        st_folium(mapa_base(centro_mapa, zoom), key='mapa_focos', height=500, use_container_width=True,
+                  zoom=zoom, center=centro_mapa, feature_group_to_add=camada_focos(focos_agrupados),
+                  returned_objects=['zoom', 'center'])
 
 # ==============================================================================================================#
 #                                           ANÁLISE ESPACIAL
@@ -376,55 +588,122 @@ elif tipo_analise == '**Distribuição Espacial**':
     # --------------------------------------------------------#
     #                    GRÁFICOS
     # --------------------------------------------------------#
+    # grades mensais dos focos (anos x 12 x lat x lon)
+    try:
+        with trecho('carga', dados='grades'):
+            grades = load_grades()
+    except FileNotFoundError:
+        grades = None
+
+    anos = grades.anos.tolist() if grades is not None else np.arange(2003, 2025, 1).tolist()
+    meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+             'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+    st.markdown('# Distribuição Espacial')
+
     if frequencia_analise == "**Climatologia**":
-        st.markdown('# Distribuição Espacial')
         st.header(':black[Climatologia]')
-        c1, c2 = st.columns(2)
+    elif frequencia_analise == "**Anomalia**":
+        st.header(':black[Anomalia]')
 
-        with c1:
+    c1, c2 = st.columns(2)
 
-            # seleciona o "ANO"
-            anos = np.arange(2003, 2025, 1).tolist()
-            ano_selecionado = st.selectbox('Selecione o :red[**Ano**]:', anos)
-            st.image('dados/Fig_0_acumulado_e_anomalia_focos_2023_BRASIL.png',
-                     use_column_width=True)
-            st.image('dados/Fig_0_acumulado_e_anomalia_focos_2023_BRASIL.png',
-                     use_column_width=True)
+    with c1, trecho('painel', painel='ano'):
 
-        with c2:
+        # seleciona o "ANO"
+        ano_selecionado = st.selectbox('Selecione o :red[**Ano**]:', anos, index=len(anos) - 1)
 
-            # seleciona o "MÊS"
-            meses = ['Janeiro', 'Fevereiro', 'Março', 'Maio', 'Junho',
-                     'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-            mes_selecionado = st.selectbox('Selecione o :red[**Mês**]:', meses)
+        if grades is None:
+            st.warning('Grades de focos ainda não geradas (python -m queimadas.grade).')
             st.image('dados/Fig_0_acumulado_e_anomalia_focos_2023_BRASIL.png',
                      use_column_width=True)
+        elif frequencia_analise == "**Climatologia**":
+            st.plotly_chart(figura_mapa('acumulado', ano_selecionado), use_container_width=True)
+            st.plotly_chart(figura_mapa('climatologia'), use_container_width=True)
+        else:
+            st.plotly_chart(figura_mapa('anomalia', ano_selecionado), use_container_width=True)
 
-    # --------------------------------------------------------#
-    #                    GRÁFICOS
-    # --------------------------------------------------------#
-    elif frequencia_analise == "**Anomalia**":
-        st.markdown('# Distribuição Espacial')
-        st.header(':black[Anomalia]')
-        c1, c2 = st.columns(2)
+    with c2, trecho('painel', painel='mes'):
 
-        with c1:
+        # seleciona o "MÊS"
+        mes_selecionado = st.selectbox('Selecione o :red[**Mês**]:', meses)
+        mes = meses.index(mes_selecionado) + 1
 
-            # seleciona o "ANO"
-            anos = np.arange(2003, 2025, 1).tolist()
-            ano_selecionado = st.selectbox('Selecione o :red[**Ano**]:', anos)
-            # st.image(f'Fig_0_acumulado_e_anomalia_focos_{ano_selecionado}_BRASIL.png', use_column_width=True)
+        if grades is None:
             st.image('dados/Fig_0_acumulado_e_anomalia_focos_2023_BRASIL.png',
                      use_column_width=True)
+        elif frequencia_analise == "**Climatologia**":
+            st.plotly_chart(figura_mapa('acumulado', ano_selecionado, mes), use_container_width=True)
+            st.plotly_chart(figura_mapa('climatologia', None, mes), use_container_width=True)
+        else:
+            st.plotly_chart(figura_mapa('anomalia', ano_selecionado, mes), use_container_width=True)
+
+# ==============================================================================================================#
+#                                      ANÁLISE CONJUNTA: FOCOS x CHUVA
+# ==============================================================================================================#
+elif tipo_analise == '**Focos x Chuva**':
+
+    st.markdown('# Focos x Chuva')
+
+    # grades de focos + chuva antecedente do cache local do CHIRPS (python app_chirps/cache_chirps.py)
+    try:
+        with st.spinner('Cruzando os focos com a chuva do CHIRPS. Favor aguardar...'), \
+                trecho('carga', dados='conjunta'):
+            analise = load_analise_conjunta()
+    except (FileNotFoundError, ValueError) as erro:
+        analise = None
+        st.warning(f'Análise conjunta indisponível: {erro}. Preencha o cache local do CHIRPS com '
+                   '"python app_chirps/cache_chirps.py --inicio AAAA-MM-DD --fim AAAA-MM-DD".')
+
+    meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+             'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+    if analise is not None:
+
+        # --------------------------------------------------------#
+        #                      SIDEBAR
+        # --------------------------------------------------------#
+        with st.sidebar:
 
-        with c2:
+            st.divider()
 
-            # seleciona o "MÊS"
-            meses = ['Janeiro', 'Fevereiro', 'Março', 'Maio', 'Junho',
-                     'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-            mes_selecionado = st.selectbox('Selecione o :red[**Mês**]:', meses)
-            st.image(
-                f'dados/Fig_0_acumulado_e_anomalia_focos_2023_BRASIL.png', use_column_width=True)
+            tipo_regiao = st.radio(':orange[**Região**]', ['Brasil', 'Estado', 'Bioma'], horizontal=True)
+            estado_selecionado = bioma_selecionado = None
+            if tipo_regiao == 'Estado':
+                estado_selecionado = st.selectbox(':orange[**Selecione o ESTADO**]:', analise.regioes.estados)
+            elif tipo_regiao == 'Bioma':
+                bioma_selecionado = st.selectbox(':orange[**Selecione o BIOMA**]:', analise.regioes.biomas)
+
+            janelas = {f'{dias} dias': dias for dias in analise.janelas}
+            janela = janelas[st.selectbox(':orange[**Chuva acumulada antes do mês**]:', list(janelas))]
+
+            # correlação com todos os meses (ciclo anual incluído) ou com um mês do calendário entre os anos
+            mes_correlacao = st.selectbox(':orange[**Meses da correlação**]:', ['Todos'] + meses)
+            mes_correlacao = None if mes_correlacao == 'Todos' else meses.index(mes_correlacao) + 1
+
+        # --------------------------------------------------------#
+        #                    GRÁFICOS
+        # --------------------------------------------------------#
+        regiao = dict(estado=estado_selecionado, bioma=bioma_selecionado)
+
+        with trecho('painel', painel='conjunta_serie'):
+            st.plotly_chart(figura_conjunta('serie', **regiao), use_container_width=True)
+
+            st.markdown('**Correlação entre os focos do mês e a chuva antecedente**')
+            st.dataframe(analise.correlacoes(mes=mes_correlacao, **regiao), hide_index=True)
+
+        c1, c2 = st.columns(2)
+
+        with c1, trecho('painel', painel='conjunta_correlacao'):
+            st.plotly_chart(figura_conjunta('correlacao', janela=janela, mes=mes_correlacao, **regiao),
+                            use_container_width=True)
+
+        with c2, trecho('painel', painel='conjunta_chuva'):
+            anos = analise.grades.anos.tolist()
+            ano_selecionado = st.selectbox('Selecione o :red[**Ano**]:', anos, index=len(anos) - 1)
+            mes = meses.index(st.selectbox('Selecione o :red[**Mês**]:', meses, index=8)) + 1
+            st.plotly_chart(figura_conjunta('chuva', janela=janela, ano=ano_selecionado, mes=mes, **regiao),
+                            use_container_width=True)
 
 
 # ==============================================================================================================#
@@ -437,6 +716,9 @@ with st.sidebar:
     st.sidebar.markdown('**Contato**: enrique@unifei.edu.br')
 
 
+from streamlit_extras.add_vertical_space import add_vertical_space
+from streamlit_extras.row import row
+
 st.divider()
 add_vertical_space(1)
 st.markdown("#### Maiores Informações:")
@@ -452,3 +734,11 @@ links_row.link_button("🐙  Acesso aos dados originais",
 links_row.link_button("0️⃣  Visite nosso repositório",
                       "https://github.com/evmpython",
                       use_container_width=True)
+
+# ==============================================================================================================#
+#                                       ADMINISTRAÇÃO / DESEMPENHO
+# ==============================================================================================================#
+if st.query_params.get('admin') == '1' or os.environ.get('QUEIMADAS_ADMIN') == '1':
+    painel_administracao()
+
+st.session_state['execucao_anterior'] = finalizar_execucao()
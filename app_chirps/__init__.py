@@ -0,0 +1,7 @@
+# ==============================================================================================================#
+#                     APP DE PRECIPITAÇÃO CHIRPS: CACHE LOCAL E CONSULTAS AO EARTH ENGINE
+# ==============================================================================================================#
+# Os módulos podem ser importados como pacote (from app_chirps.cache_chirps import CacheChirps, a partir da raiz
+# do repositório). O app (streamlit run app_chirps/app_chirps.py) e o job de carga (python
+# app_chirps/cache_chirps.py) rodam como scripts e importam os módulos vizinhos pelo nome, sem o pacote.
+# ==============================================================================================================#
@@ -6,6 +6,11 @@ import geemap.foliumap as geemap  # Importação correta para Streamlit
 import ee
 import datetime
 from datetime import timedelta
+import numpy as np
+import branca.colormap as cm
+import folium
+from cache_chirps import ANO_INICIAL, PERIODOS, CacheChirps, estatisticas, periodo_acumulado
+from consulta_chirps import ConsultaChirps
 
 # Inicializar o Google Earth Engine
 try:
@@ -18,41 +23,98 @@ except Exception as e:
 st.set_page_config(layout="wide")
 st.title("Visualizador de Precipitação Diária - CHIRPS (Brasil)")
 
-# Função para obter geometria do Brasil
-def obter_geometria_brasil():
-    brasil = ee.FeatureCollection("USDOS/LSIB_SIMPLE/2017") \
-              .filter(ee.Filter.eq("country_na", "Brazil"))
-    return brasil.geometry()
+# Função principal para obter imagem CHIRPS: o dia mais recente com dados (até 30 dias antes da data
+# escolhida) e a precipitação média e máxima dele vêm de uma única consulta ao Earth Engine
+def obter_imagem_chirps_para_o_brasil(consulta, data_selecionada):
+    try:
+        resumo = consulta.dia_mais_recente(data_selecionada)
+    except Exception as e:
+        st.error(f"Erro ao consultar o Earth Engine: {e}")
+        return None, None, None
+
+    if resumo is None:
+        st.error("Sem dados de precipitação recentes.")
+        return None, None, None
+
+    dia, media, maximo = resumo
+    if dia != data_selecionada:
+        st.warning(f"Não há dados para {data_selecionada.strftime('%Y-%m-%d')}.")
+        st.info(f"Mostrando dados de {dia.strftime('%Y-%m-%d')}")
+
+    return consulta.imagem(dia), media, maximo
+
+# Função que monta a camada do mapa a partir da grade do cache local (sem chamar o Earth Engine)
+def camada_precipitacao_local(grade, cache, valor_minimo, valor_maximo, paleta, opacidade):
+    cores = cm.LinearColormap(paleta, vmin=valor_minimo, vmax=valor_maximo)
+    tabela = np.array([cores.rgba_bytes_tuple(valor)
+                       for valor in np.linspace(valor_minimo, valor_maximo, 256)], dtype=np.uint8)
+
+    # valores fora de [mínimo, máximo] ficam com a cor do extremo, como no Earth Engine
+    validos = np.isfinite(grade)
+    niveis = np.clip((np.nan_to_num(grade) - valor_minimo) / max(valor_maximo - valor_minimo, 1e-6) * 255, 0, 255)
+    rgba = tabela[niveis.astype(np.uint8)]
+    rgba[..., 3] = np.where(validos, int(opacidade * 255), 0)
+
+    # a linha 0 da grade é o sul; a imagem começa pelo norte
+    return folium.raster_layers.ImageOverlay(
+        rgba[::-1],
+        bounds=[[cache.grade['lat_min'], cache.grade['lon_min']], [cache.grade['lat_max'], cache.grade['lon_max']]],
+        mercator_project=True,
+        name="Precipitação (mm)"
+    )
 
-# Função principal para obter imagem CHIRPS
-def obter_imagem_chirps_para_o_brasil(data_selecionada):
-    data_inicial = data_selecionada.strftime("%Y-%m-%d")
-    data_final = (data_selecionada + timedelta(days=1)).strftime("%Y-%m-%d")
+# Função que mostra o acumulado (ou a anomalia em relação à climatologia) de [inicio, fim] a partir do cache local
+def mostrar_periodo(cache, modo, inicio, fim, valor_minimo, valor_maximo, paleta, opacidade):
+    st.header(f"{modo} de precipitação no Brasil - {inicio.strftime('%Y-%m-%d')} a {fim.strftime('%Y-%m-%d')}")
 
-    colecao_chirps = ee.ImageCollection("UCSB-CHG/CHIRPS/DAILY") \
-                        .filterDate(data_inicial, data_final)
+    total_dias = (fim - inicio).days + 1
+    if modo == "Anomalia":
+        grade, dias, anos = cache.anomalia(inicio, fim)
+        # escala simétrica em torno de zero: seco em vermelho, úmido em azul
+        valor_minimo, valor_maximo, paleta = -valor_maximo, valor_maximo, ['red', 'white', 'blue']
+    else:
+        grade, dias = cache.acumulado(inicio, fim)
 
-    if colecao_chirps.size().getInfo() == 0:
-        st.warning(f"Não há dados para {data_inicial}. Buscando dados mais recentes...")
+    if dias == 0:
+        st.error("Período sem dados no cache local. Preencha com: python cache_chirps.py --inicio AAAA-MM-DD --fim AAAA-MM-DD")
+        return
+    if dias < total_dias:
+        st.warning(f"Só {dias} dos {total_dias} dias do período estão no cache local.")
+    if modo == "Anomalia" and anos == 0:
+        st.error("Nenhum ano com o período completo no cache para calcular a climatologia.")
+        return
 
-        for dias_volta in range(1, 31):
-            nova_data = data_selecionada - timedelta(days=dias_volta)
-            nova_inicial = nova_data.strftime("%Y-%m-%d")
-            nova_final = (nova_data + timedelta(days=1)).strftime("%Y-%m-%d")
+    mapa = geemap.Map(center=[-15, -55], zoom=4)
+    camada_precipitacao_local(grade, cache, valor_minimo, valor_maximo, paleta, opacidade).add_to(mapa)
+    mapa.addLayerControl()
+
+    media, maximo = estatisticas(grade)
+    nome = "da anomalia" if modo == "Anomalia" else "do acumulado"
+    if media is not None:
+        st.write(f"Média {nome}: {media:.1f} mm")
+    if maximo is not None:
+        st.write(f"Máximo {nome}: {maximo:.1f} mm")
+    if modo == "Anomalia":
+        st.caption(f"Climatologia de {anos} anos. Fonte: cache local")
+    else:
+        st.caption("Fonte: cache local")
 
-            nova_colecao = ee.ImageCollection("UCSB-CHG/CHIRPS/DAILY") \
-                              .filterDate(nova_inicial, nova_final)
+    mapa.to_streamlit(height=600)
 
-            if nova_colecao.size().getInfo() > 0:
-                st.info(f"Mostrando dados de {nova_inicial}")
-                colecao_chirps = nova_colecao
-                break
-        else:
-            st.error("Sem dados de precipitação recentes.")
-            return None
+# Função que mostra a série diária da precipitação média no Brasil a partir do cache local
+def mostrar_serie_temporal(cache, inicio, fim):
+    st.header(f"Precipitação média diária no Brasil - {inicio.strftime('%Y-%m-%d')} a {fim.strftime('%Y-%m-%d')}")
+
+    datas, valores = cache.serie_media_area(inicio, fim)
+    dias = int(np.isfinite(valores).sum())
+    if dias == 0:
+        st.error("Período sem dados no cache local. Preencha com: python cache_chirps.py --inicio AAAA-MM-DD --fim AAAA-MM-DD")
+        return
+    if dias < len(datas):
+        st.warning(f"Só {dias} dos {len(datas)} dias do período estão no cache local.")
 
-    imagem = colecao_chirps.first()
-    return imagem.clip(obter_geometria_brasil())
+    st.line_chart({'Data': datas, 'Precipitação média (mm)': valores}, x='Data', y='Precipitação média (mm)')
+    st.caption("Média ponderada pela área das células. Fonte: cache local")
 
 # Interface do usuário
 col1, col2 = st.columns([1, 3])
@@ -70,6 +132,29 @@ with col1:
         max_value=data_disponivel
     )
 
+    modo = st.radio("Modo", ["Dia", "Acumulado", "Anomalia", "Série temporal"], horizontal=True)
+    inicio = fim = data_selecionada
+    if modo in ("Acumulado", "Anomalia"):
+        periodo = st.selectbox("Período", PERIODOS + ["Personalizado"])
+        if periodo == "Personalizado":
+            intervalo = st.date_input(
+                "Intervalo",
+                value=(data_selecionada - timedelta(days=29), data_selecionada),
+                min_value=datetime.date(ANO_INICIAL, 1, 1),
+                max_value=data_disponivel
+            )
+            inicio, fim = intervalo[0], intervalo[-1]
+        else:
+            inicio, fim = periodo_acumulado(data_selecionada, periodo)
+    elif modo == "Série temporal":
+        intervalo = st.date_input(
+            "Intervalo",
+            value=(datetime.date(ANO_INICIAL, 1, 1), data_selecionada),
+            min_value=datetime.date(ANO_INICIAL, 1, 1),
+            max_value=data_disponivel
+        )
+        inicio, fim = intervalo[0], intervalo[-1]
+
     st.subheader("Visualização do Mapa")
     valor_minimo = st.slider("Valor mínimo (mm)", 0.1, 50.0, 0.1)
     valor_maximo = st.slider("Valor máximo (mm)", 0.1, 300.0, 50.0)
@@ -80,57 +165,70 @@ with col1:
     )
 
 with col2:
-    st.header(f"Precipitação no Brasil - {data_selecionada.strftime('%Y-%m-%d')}")
-    imagem_chirps = obter_imagem_chirps_para_o_brasil(data_selecionada)
+    cache = CacheChirps()
 
-    mapa = geemap.Map(center=[-15, -55], zoom=4)
+    if modo == "Série temporal":
+        mostrar_serie_temporal(cache, inicio, fim)
 
-    if imagem_chirps:
-        precipitacao = imagem_chirps.select("precipitation")
-        parametros = {
-            'min': valor_minimo,
-            'max': valor_maximo,
-            'palette': [c.strip() for c in paleta_cores.split(',')],
-            'opacity': opacidade
-        }
-
-        mapa.addLayer(precipitacao, parametros, "Precipitação (mm)")
-
-        contorno = ee.Image().byte().paint(
-            featureCollection=obter_geometria_brasil(),
-            color=1,
-            width=2
-        )
-        mapa.addLayer(contorno, {'palette': 'red'}, "Limite do Brasil")
+    elif modo in ("Acumulado", "Anomalia"):
+        mostrar_periodo(cache, modo, inicio, fim, valor_minimo, valor_maximo,
+                        [c.strip() for c in paleta_cores.split(',')], opacidade)
 
-        mapa.addLayerControl()
+    else:
+        st.header(f"Precipitação no Brasil - {data_selecionada.strftime('%Y-%m-%d')}")
 
-        try:
-            media = precipitacao.reduceRegion(
-                reducer=ee.Reducer.mean(),
-                geometry=obter_geometria_brasil(),
-                scale=5500,
-                maxPixels=1e10
-            ).getInfo().get('precipitation', None)
+        mapa = geemap.Map(center=[-15, -55], zoom=4)
 
-            maximo = precipitacao.reduceRegion(
-                reducer=ee.Reducer.max(),
-                geometry=obter_geometria_brasil(),
-                scale=5500,
-                maxPixels=1e10
-            ).getInfo().get('precipitation', None)
+        # cache local primeiro: só vai ao Earth Engine se o dia não estiver no cache
+        consulta = ConsultaChirps(ee)
+        precipitacao_local = cache.ler(data_selecionada)
+        imagem_chirps = None
+        if precipitacao_local is None:
+            imagem_chirps, media, maximo = obter_imagem_chirps_para_o_brasil(consulta, data_selecionada)
 
+        if precipitacao_local is not None:
+            camada_precipitacao_local(
+                precipitacao_local, cache, valor_minimo, valor_maximo,
+                [c.strip() for c in paleta_cores.split(',')], opacidade
+            ).add_to(mapa)
+            mapa.addLayerControl()
+
+            media, maximo = estatisticas(precipitacao_local)
             if media is not None:
                 st.write(f"Precipitação média: {media:.1f} mm")
             if maximo is not None:
                 st.write(f"Precipitação máxima: {maximo:.1f} mm")
+            st.caption("Fonte: cache local")
 
-        except Exception as e:
-            st.warning(f"Erro ao calcular estatísticas: {e}")
-    else:
-        st.error("Nenhum dado disponível.")
+        elif imagem_chirps:
+            precipitacao = imagem_chirps.select("precipitation")
+            parametros = {
+                'min': valor_minimo,
+                'max': valor_maximo,
+                'palette': [c.strip() for c in paleta_cores.split(',')],
+                'opacity': opacidade
+            }
 
-    mapa.to_streamlit(height=600)
+            consulta.adicionar_camada(mapa, precipitacao, parametros, "Precipitação (mm)")
+
+            contorno = ee.Image().byte().paint(
+                featureCollection=consulta.geometria,
+                color=1,
+                width=2
+            )
+            consulta.adicionar_camada(mapa, contorno, {'palette': 'red'}, "Limite do Brasil")
+
+            mapa.addLayerControl()
+
+            if media is not None:
+                st.write(f"Precipitação média: {media:.1f} mm")
+            if maximo is not None:
+                st.write(f"Precipitação máxima: {maximo:.1f} mm")
+        else:
+            st.error("Nenhum dado disponível.")
+
+        mapa.to_streamlit(height=600)
+        st.caption(f"Chamadas ao Earth Engine nesta renderização: {consulta.chamadas}")
 
 # Rodapé
 st.markdown("---")
@@ -0,0 +1,389 @@
+# ==============================================================================================================#
+#                     CACHE LOCAL DA PRECIPITAÇÃO DIÁRIA CHIRPS RECORTADA PARA O BRASIL
+# ==============================================================================================================#
+# A precipitação diária do CHIRPS é guardada numa grade regular sobre o Brasil (0.25° por padrão, a mesma grade
+# de queimadas.grade.GRADE_BRASIL), um arquivo por ano:
+#
+#   cache/chirps_AAAA.npy        float32 (dias do ano x ny x nx), NaN fora do Brasil e nos dias não baixados
+#   cache/chirps_AAAA_dias.npy   bool (dias do ano), True nos dias já baixados
+#   cache/grade.json             limites e resolução da grade
+#
+# Os arquivos .npy não são compactados para poderem ser abertos com memmap (leitura sem cópia e com o cache de
+# páginas do sistema compartilhado entre processos). A linha 0 da grade é a latitude mais ao sul.
+#
+# O cache é preenchido por um job de carga (um pedido ao Earth Engine por bloco de dias):
+#
+#   python cache_chirps.py --inicio 1981-01-01 --fim 2024-12-31
+#
+# e o app lê dele primeiro, indo ao Earth Engine só quando o dia não está no cache.
+# ==============================================================================================================#
+import argparse
+import calendar
+import datetime
+import json
+import os
+from datetime import timedelta
+
+import numpy as np
+
+# importado pelo pacote (app_chirps.cache_chirps) ou como módulo vizinho do app e do job de carga
+try:
+    from .consulta_chirps import COLECAO_CHIRPS, geometria_brasil
+except ImportError:
+    from consulta_chirps import COLECAO_CHIRPS, geometria_brasil
+
+DIRETORIO_CACHE = os.environ.get('CHIRPS_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache'))
+
+# mesma grade dos focos de calor (queimadas.grade.GRADE_BRASIL)
+GRADE_PADRAO = {'lat_min': -34.0, 'lat_max': 6.0, 'lon_min': -74.0, 'lon_max': -34.0, 'resolucao': 0.25}
+
+VALOR_AUSENTE = -9999.0
+
+# dias pedidos ao Earth Engine em cada chamada do job de carga
+DIAS_POR_PEDIDO = 31
+
+# dias lidos do memmap de cada vez nas reduções no tempo (limita a memória a DIAS_POR_BLOCO grades)
+DIAS_POR_BLOCO = 64
+
+# períodos de acumulação pré-definidos (terminam ou contêm a data escolhida)
+PERIODOS = ['Pêntada (5 dias)', 'Mês', 'Estação (3 meses)', 'Ano']
+
+# primeiro ano do CHIRPS
+ANO_INICIAL = 1981
+
+
+class CacheChirps:
+
+    def __init__(self, diretorio=DIRETORIO_CACHE, grade=None):
+
+        self.diretorio = diretorio
+        arquivo_grade = os.path.join(diretorio, 'grade.json')
+
+        # a grade gravada no cache vale sobre a pedida (não dá para misturar grades no mesmo cache)
+        if os.path.isfile(arquivo_grade):
+            with open(arquivo_grade, encoding='utf-8') as f:
+                grade = json.load(f)
+
+        self.grade = dict(GRADE_PADRAO if grade is None else grade)
+        self.ny = int(round((self.grade['lat_max'] - self.grade['lat_min']) / self.grade['resolucao']))
+        self.nx = int(round((self.grade['lon_max'] - self.grade['lon_min']) / self.grade['resolucao']))
+
+    # latitudes e longitudes dos centros das células
+    @property
+    def lats(self):
+        return self.grade['lat_min'] + (np.arange(self.ny) + 0.5) * self.grade['resolucao']
+
+    @property
+    def lons(self):
+        return self.grade['lon_min'] + (np.arange(self.nx) + 0.5) * self.grade['resolucao']
+
+    def _arquivo(self, ano, sufixo=''):
+        return os.path.join(self.diretorio, f'chirps_{ano}{sufixo}.npy')
+
+    # ==========================================================================================================#
+    #                                                LEITURA
+    # ==========================================================================================================#
+    # Função que abre (memmap, somente leitura) a precipitação de um ano. Retorna None se o ano não existe.
+    def abrir_ano(self, ano):
+
+        if not os.path.isfile(self._arquivo(ano)):
+            return None
+
+        return np.load(self._arquivo(ano), mmap_mode='r')
+
+    # Função que retorna os dias já baixados de um ano (bool, um por dia do ano)
+    def dias_preenchidos(self, ano):
+
+        arquivo = self._arquivo(ano, '_dias')
+        if not os.path.isfile(arquivo):
+            return np.zeros(_dias_no_ano(ano), dtype=bool)
+
+        return np.load(arquivo)
+
+    def contem(self, data):
+        return bool(self.dias_preenchidos(data.year)[data.timetuple().tm_yday - 1])
+
+    # Função que retorna a grade (ny x nx) de um dia, ou None se o dia não está no cache
+    def ler(self, data):
+
+        if not self.contem(data):
+            return None
+
+        return self.abrir_ano(data.year)[data.timetuple().tm_yday - 1]
+
+    # Função que retorna os anos que têm arquivo no cache
+    def anos(self):
+
+        if not os.path.isdir(self.diretorio):
+            return []
+
+        return sorted(int(nome[7:11]) for nome in os.listdir(self.diretorio)
+                      if nome.startswith('chirps_') and nome.endswith('.npy') and nome[7:11].isdigit()
+                      and len(nome) == len('chirps_AAAA.npy'))
+
+    # Função que retorna o dia mais recente no cache entre "data" e "janela" dias antes, ou None
+    def ultimo_dia_disponivel(self, data, janela=30):
+
+        for dias_volta in range(janela + 1):
+            dia = data - timedelta(days=dias_volta)
+            if self.contem(dia):
+                return dia
+
+        return None
+
+    # ==========================================================================================================#
+    #                                          REDUÇÕES NO TEMPO
+    # ==========================================================================================================#
+    # Função que percorre [inicio, fim] em blocos de até DIAS_POR_BLOCO dias de um mesmo ano. Gera
+    # (primeiro dia do bloco, grades do bloco (dias x ny x nx, memmap) ou None, dias baixados do bloco). Também
+    # usada fora do app (queimadas.conjunta) para ler períodos longos sem conhecer os arquivos do cache.
+    def blocos(self, inicio, fim):
+
+        for ano in range(inicio.year, fim.year + 1):
+            primeiro = max(inicio, datetime.date(ano, 1, 1)).timetuple().tm_yday - 1
+            ultimo = min(fim, datetime.date(ano, 12, 31)).timetuple().tm_yday
+            precipitacao = self.abrir_ano(ano)
+            preenchidos = self.dias_preenchidos(ano)
+
+            for i in range(primeiro, ultimo, DIAS_POR_BLOCO):
+                j = min(i + DIAS_POR_BLOCO, ultimo)
+                yield (datetime.date(ano, 1, 1) + timedelta(days=i),
+                       None if precipitacao is None else precipitacao[i:j],
+                       preenchidos[i:j])
+
+    # Função que retorna a precipitação acumulada (mm) de [inicio, fim] e o número de dias do período que estão
+    # no cache. Os dias fora do cache não entram na soma; as células sem nenhum dado ficam NaN.
+    def acumulado(self, inicio, fim):
+
+        soma = np.zeros((self.ny, self.nx), dtype=np.float64)
+        validos = np.zeros((self.ny, self.nx), dtype=bool)
+        dias = 0
+
+        for _, grades, preenchidos in self.blocos(inicio, fim):
+            if grades is None or not preenchidos.any():
+                continue
+            bloco = grades[preenchidos]
+            finitos = np.isfinite(bloco)
+            soma += np.where(finitos, bloco, 0).sum(axis=0)
+            validos |= finitos.any(axis=0)
+            dias += int(preenchidos.sum())
+
+        return np.where(validos, soma, np.nan).astype(np.float32), dias
+
+    # Função que retorna a climatologia (média entre os anos) do acumulado da mesma janela do calendário de
+    # [inicio, fim] e o número de anos usados. Só entram os anos com a janela completa no cache.
+    def climatologia_acumulado(self, inicio, fim, anos=None):
+
+        if anos is None:
+            anos = self.anos()
+
+        soma = np.zeros((self.ny, self.nx), dtype=np.float64)
+        usados = 0
+
+        for ano in anos:
+            deslocamento = ano - inicio.year
+            inicio_ano = _mesmo_dia(inicio, inicio.year + deslocamento)
+            fim_ano = _mesmo_dia(fim, fim.year + deslocamento)
+            acumulado, dias = self.acumulado(inicio_ano, fim_ano)
+            if dias < (fim_ano - inicio_ano).days + 1:
+                continue
+            soma += acumulado
+            usados += 1
+
+        if usados == 0:
+            return np.full((self.ny, self.nx), np.nan, dtype=np.float32), 0
+
+        return (soma / usados).astype(np.float32), usados
+
+    # Função que retorna a anomalia (mm) do acumulado de [inicio, fim] em relação à climatologia, o número de
+    # dias do período no cache e o número de anos da climatologia
+    def anomalia(self, inicio, fim, anos=None):
+
+        acumulado, dias = self.acumulado(inicio, fim)
+        climatologia, usados = self.climatologia_acumulado(inicio, fim, anos)
+
+        return acumulado - climatologia, dias, usados
+
+    # Função que retorna a série diária da precipitação média na área da grade (média ponderada pelo cosseno da
+    # latitude, só nas células com dado). Retorna (datas datetime64[D], valores em mm, NaN nos dias fora do cache)
+    def serie_media_area(self, inicio, fim):
+
+        datas = np.arange(np.datetime64(inicio, 'D'), np.datetime64(fim, 'D') + 1)
+        valores = np.full(len(datas), np.nan)
+        pesos = np.cos(np.deg2rad(self.lats)).astype(np.float32)[:, np.newaxis]
+
+        for primeiro, grades, preenchidos in self.blocos(inicio, fim):
+            if grades is None or not preenchidos.any():
+                continue
+            i = (primeiro - inicio).days
+            bloco = np.asarray(grades)
+            finitos = np.isfinite(bloco)
+            numerador = (np.where(finitos, bloco, 0) * pesos).sum(axis=(1, 2), dtype=np.float64)
+            denominador = (finitos * pesos).sum(axis=(1, 2), dtype=np.float64)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                media = numerador / denominador
+            valores[i:i + len(bloco)] = np.where(preenchidos, media, np.nan)
+
+        return datas, valores
+
+    # ==========================================================================================================#
+    #                                                ESCRITA
+    # ==========================================================================================================#
+    # Função que grava a grade de um ou mais dias consecutivos de um mesmo ano
+    def gravar(self, data, grades):
+
+        grades = np.asarray(grades, dtype=np.float32)
+        if grades.ndim == 2:
+            grades = grades[np.newaxis]
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        arquivo_grade = os.path.join(self.diretorio, 'grade.json')
+        if not os.path.isfile(arquivo_grade):
+            with open(arquivo_grade, 'w', encoding='utf-8') as f:
+                json.dump(self.grade, f)
+
+        ano = data.year
+        if not os.path.isfile(self._arquivo(ano)):
+            novo = np.lib.format.open_memmap(self._arquivo(ano), mode='w+', dtype=np.float32,
+                                             shape=(_dias_no_ano(ano), self.ny, self.nx))
+            novo[:] = np.nan
+            novo.flush()
+            del novo
+
+        inicio = data.timetuple().tm_yday - 1
+        precipitacao = np.load(self._arquivo(ano), mmap_mode='r+')
+        precipitacao[inicio:inicio + len(grades)] = grades
+        precipitacao.flush()
+        del precipitacao
+
+        # os dias só são marcados como baixados depois que os dados foram gravados
+        dias = self.dias_preenchidos(ano)
+        dias[inicio:inicio + len(grades)] = True
+        np.save(self._arquivo(ano, '_dias'), dias)
+
+    # Função que baixa do Earth Engine os dias de [inicio, fim] que ainda não estão no cache. Retorna a lista
+    # dos dias gravados. "cliente_ee" é o módulo "ee" (ou um substituto com a mesma interface).
+    def preencher(self, inicio, fim, cliente_ee=None, sobrescrever=False):
+
+        gravados = []
+        dia = inicio
+        while dia <= fim:
+            # blocos de dias do mesmo ano
+            ultimo = min(fim, dia + timedelta(days=DIAS_POR_PEDIDO - 1), datetime.date(dia.year, 12, 31))
+            faltando = sobrescrever or not all(self.contem(dia + timedelta(days=i))
+                                               for i in range((ultimo - dia).days + 1))
+            if faltando:
+                for data, grade in baixar_periodo(dia, ultimo, self, cliente_ee).items():
+                    self.gravar(data, grade)
+                    gravados.append(data)
+            dia = ultimo + timedelta(days=1)
+
+        return gravados
+
+
+# ==============================================================================================================#
+#                                           ESTATÍSTICAS (NUMPY)
+# ==============================================================================================================#
+# Função que retorna a precipitação média e máxima (mm) dos pixels válidos de uma grade
+def estatisticas(grade):
+
+    validos = np.isfinite(grade)
+    if not validos.any():
+        return None, None
+
+    return float(grade[validos].mean()), float(grade[validos].max())
+
+
+# ==============================================================================================================#
+#                                             EARTH ENGINE
+# ==============================================================================================================#
+# Função que baixa, num único pedido ao Earth Engine, as grades diárias de [inicio, fim] já reamostradas para a
+# grade do cache. Retorna {data: grade (ny x nx)} só com os dias que existem no CHIRPS.
+def baixar_periodo(inicio, fim, cache, cliente_ee=None):
+
+    if cliente_ee is None:
+        import ee as cliente_ee
+
+    grade = cache.grade
+    colecao = cliente_ee.ImageCollection(COLECAO_CHIRPS) \
+                        .filterDate(inicio.strftime('%Y-%m-%d'), (fim + timedelta(days=1)).strftime('%Y-%m-%d')) \
+                        .select('precipitation')
+
+    # blocos sem nenhum dia no CHIRPS (ex.: dias ainda não publicados)
+    if colecao.size().getInfo() == 0:
+        return {}
+
+    # cada dia vira uma banda "AAAAMMDD_precipitation", média das células de 0.05° dentro da célula da grade
+    imagem = colecao.toBands() \
+                    .reduceResolution(reducer=cliente_ee.Reducer.mean(), maxPixels=1024) \
+                    .clip(geometria_brasil(cliente_ee)) \
+                    .unmask(VALOR_AUSENTE)
+
+    pixels = cliente_ee.data.computePixels({
+        'expression': imagem,
+        'fileFormat': 'NUMPY_NDARRAY',
+        'grid': {'dimensions': {'width': cache.nx, 'height': cache.ny},
+                 'affineTransform': {'scaleX': grade['resolucao'], 'shearX': 0, 'translateX': grade['lon_min'],
+                                     'shearY': 0, 'scaleY': -grade['resolucao'], 'translateY': grade['lat_max']},
+                 'crsCode': 'EPSG:4326'}})
+
+    grades = {}
+    for banda in pixels.dtype.names or ():
+        data = datetime.datetime.strptime(banda.split('_')[0], '%Y%m%d').date()
+        valores = np.asarray(pixels[banda], dtype=np.float32)[::-1]  # linha 0 = sul
+        grades[data] = np.where(valores <= VALOR_AUSENTE, np.nan, valores)
+
+    return grades
+
+
+# Função que retorna [inicio, fim] do período de acumulação que termina (pêntada) ou contém a data
+def periodo_acumulado(data, periodo):
+
+    if periodo == 'Pêntada (5 dias)':
+        return data - timedelta(days=4), data
+
+    if periodo == 'Mês':
+        return data.replace(day=1), data.replace(day=calendar.monthrange(data.year, data.month)[1])
+
+    if periodo == 'Estação (3 meses)':
+        # estações meteorológicas: DJF, MAM, JJA, SON
+        mes = data.month - data.month % 3
+        inicio = datetime.date(data.year - 1, 12, 1) if mes == 0 else datetime.date(data.year, mes, 1)
+        fim_mes = inicio.month + 2
+        fim_ano = inicio.year + (fim_mes - 1) // 12
+        fim_mes = (fim_mes - 1) % 12 + 1
+        return inicio, datetime.date(fim_ano, fim_mes, calendar.monthrange(fim_ano, fim_mes)[1])
+
+    if periodo == 'Ano':
+        return datetime.date(data.year, 1, 1), datetime.date(data.year, 12, 31)
+
+    raise ValueError(f'Período desconhecido: {periodo}')
+
+
+# Função que retorna a mesma data do calendário em outro ano (29/02 vira 28/02 nos anos não bissextos)
+def _mesmo_dia(data, ano):
+
+    if data.month == 2 and data.day == 29 and not calendar.isleap(ano):
+        return datetime.date(ano, 2, 28)
+
+    return data.replace(year=ano)
+
+
+def _dias_no_ano(ano):
+    return 366 if calendar.isleap(ano) else 365
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Carga do cache local de precipitação CHIRPS')
+    parser.add_argument('--inicio', required=True, type=datetime.date.fromisoformat)
+    parser.add_argument('--fim', required=True, type=datetime.date.fromisoformat)
+    parser.add_argument('--sobrescrever', action='store_true')
+    args = parser.parse_args()
+
+    import ee
+    ee.Initialize()
+
+    cache = CacheChirps()
+    for data in cache.preencher(args.inicio, args.fim, ee, args.sobrescrever):
+        print('Dia gravado ===>>>', data)
@@ -0,0 +1,96 @@
+# ==============================================================================================================#
+#                          CONSULTAS AO EARTH ENGINE DO APP DE PRECIPITAÇÃO CHIRPS
+# ==============================================================================================================#
+# Cada getInfo() é uma ida e volta bloqueante ao servidor do Earth Engine. As consultas do app são montadas do
+# lado do servidor e avaliadas de uma só vez:
+#
+#   - o dia mais recente com dados na janela de 31 dias e as estatísticas dele saem de um único getInfo();
+#   - a média e o máximo vêm de um único redutor combinado;
+#   - a geometria do Brasil é montada uma vez por cliente e reaproveitada.
+#
+# As chamadas feitas ao servidor são contadas em ConsultaChirps.chamadas para serem mostradas no app.
+# ==============================================================================================================#
+import datetime
+from datetime import timedelta
+from functools import lru_cache
+
+COLECAO_CHIRPS = 'UCSB-CHG/CHIRPS/DAILY'
+
+# dias para trás procurados quando a data escolhida ainda não tem dados
+JANELA_DIAS = 30
+
+# escala (m) das estatísticas de área
+ESCALA_ESTATISTICAS = 5500
+
+
+# Função que retorna a geometria do Brasil no Earth Engine (montada uma vez por cliente)
+@lru_cache(maxsize=None)
+def geometria_brasil(cliente_ee):
+    return cliente_ee.FeatureCollection("USDOS/LSIB_SIMPLE/2017") \
+                     .filter(cliente_ee.Filter.eq("country_na", "Brazil")).geometry()
+
+
+class ConsultaChirps:
+
+    # "cliente_ee" é o módulo "ee" (ou um substituto com a mesma interface)
+    def __init__(self, cliente_ee=None):
+
+        if cliente_ee is None:
+            import ee as cliente_ee
+
+        self.ee = cliente_ee
+        self.chamadas = 0
+
+    @property
+    def geometria(self):
+        return geometria_brasil(self.ee)
+
+    # Função que avalia um objeto do Earth Engine no servidor (uma chamada)
+    def avaliar(self, objeto):
+
+        self.chamadas += 1
+        return objeto.getInfo()
+
+    # Função que adiciona uma camada ao mapa (cada camada pede um mapid ao servidor)
+    def adicionar_camada(self, mapa, objeto, parametros, nome):
+
+        self.chamadas += 1
+        mapa.addLayer(objeto, parametros, nome)
+
+    # Função que retorna a coleção CHIRPS de [inicio, fim]
+    def colecao(self, inicio, fim):
+        return self.ee.ImageCollection(COLECAO_CHIRPS) \
+                      .filterDate(inicio.strftime("%Y-%m-%d"), (fim + timedelta(days=1)).strftime("%Y-%m-%d")) \
+                      .select('precipitation')
+
+    # Função que busca, numa única chamada, o dia mais recente com dados entre "data - janela" e "data" e a
+    # precipitação média e máxima dele sobre o Brasil. Retorna (dia, média, máximo) ou None se não há dados.
+    def dia_mais_recente(self, data, janela=JANELA_DIAS):
+
+        ee = self.ee
+        geometria = self.geometria
+        redutor = ee.Reducer.mean().combine(reducer2=ee.Reducer.max(), sharedInputs=True)
+
+        def resumir(imagem):
+            estatisticas = imagem.reduceRegion(reducer=redutor, geometry=geometria,
+                                               scale=ESCALA_ESTATISTICAS, maxPixels=1e10)
+            return ee.Feature(None, estatisticas).set('data', imagem.date().format('YYYY-MM-dd'))
+
+        # ordena do mais recente para o mais antigo e resume só a primeira imagem
+        resumo = self.colecao(data - timedelta(days=janela), data) \
+                     .sort('system:time_start', False) \
+                     .limit(1) \
+                     .map(resumir)
+
+        feicoes = (self.avaliar(resumo) or {}).get('features') or []
+        if not feicoes:
+            return None
+
+        propriedades = feicoes[0]['properties']
+        return (datetime.date.fromisoformat(propriedades['data']),
+                propriedades.get('precipitation_mean'),
+                propriedades.get('precipitation_max'))
+
+    # Função que retorna a imagem de precipitação de um dia recortada para o Brasil (não chama o servidor)
+    def imagem(self, data):
+        return self.ee.Image(self.colecao(data, data).first()).clip(self.geometria)
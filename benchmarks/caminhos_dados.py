@@ -0,0 +1,553 @@
+# ==============================================================================================================#
+#                           BENCHMARK DOS CAMINHOS DE DADOS DO DASHBOARD DE QUEIMADAS
+# ==============================================================================================================#
+# Gera focos sintéticos (benchmarks/sinteticos.py) do tamanho pedido e mede cada etapa num processo novo:
+# tempo (s), pico de memória alocada durante a etapa (tracemalloc, MB) e pico de memória do processo (MB).
+# O resultado é gravado em JSON e pode ser comparado com o de uma execução anterior.
+#
+# Etapas (as que dependem dos dados gerados rodam depois da geração):
+#
+#   carregar_focos      leitura do Parquet com todas as colunas (o antigo load_data)
+#   colunas             gravação e abertura das colunas mapeadas em memória + filtros
+#   cubo                montagem e gravação do cubo de contagens diárias
+#   rankings            montagem e gravação dos rankings de municípios e biomas por estado/mês e estado/ano
+#   filtro_indice       filtros estado/intervalo de datas com o IndiceFocos
+#   filtro_mascara      os mesmos filtros com máscara booleana sobre o dataframe inteiro (referência)
+#   agregacoes_cubo     séries diária/mensal/anual, climatologia e rankings pelo serviço (sem cache)
+#   rankings_consultas  rankings de municípios e biomas pelas tabelas pré-calculadas e direto do cubo
+#   paineis             as seis consultas dos painéis da "Série Temporal" (cache vazio), uma após a outra
+#   agregacoes_grouper  as mesmas agregações com groupby/pd.Grouper sobre os focos filtrados (referência)
+#   figuras             JSON do plotly da série diária de cada estado (período todo), completa e reduzida à
+#                       largura do gráfico (bytes)
+#   exportacao          CSV/Parquet das tabelas dos painéis e dos focos brutos
+#   grades              grades mensais dos mapas
+#   mapa                agrupamento dos focos para o mapa em vários zooms
+#   eventos             agrupamento de todos os focos em eventos de fogo e atualização incremental do último mês
+#   satelites           marcação das detecções repetidas entre satélites (os focos sintéticos + cópias deslocadas
+#                       de até 300 m e 30 minutos, como se vistas por outros três satélites)
+#   chirps_cache        estatísticas, acumulado e série do cache local do CHIRPS
+#   conjunta            chuva antecedente (30/60/90 dias) de cada mês a partir do cache do CHIRPS, séries e
+#                       correlações de cada estado e mapas de correlação da análise conjunta focos x chuva
+#   chirps_ee           consulta do dia mais recente com um cliente falso do Earth Engine (chamadas por pedido)
+#
+# Uso (na raiz do repositório):
+#
+#   python benchmarks/caminhos_dados.py --linhas 1000000 --saida base.json
+#   python benchmarks/caminhos_dados.py --linhas 1000000 --saida novo.json --comparar base.json
+#   python benchmarks/caminhos_dados.py --linhas 50000000 --etapas carregar_focos colunas cubo
+# ==============================================================================================================#
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for caminho in (RAIZ, os.path.dirname(os.path.abspath(__file__))):
+    if caminho not in sys.path:
+        sys.path.insert(0, caminho)
+
+# filtros sorteados para as etapas de consulta
+CONSULTAS = 50
+
+
+# ==============================================================================================================#
+#                                                  ETAPAS
+# ==============================================================================================================#
+# Cada etapa recebe os diretórios dos dados e os parâmetros e retorna (preparação, operação): a preparação não
+# é medida; a operação é medida e retorna um dicionário com informações extras para o resultado.
+def _filtros(estados, n=CONSULTAS, semente=0):
+
+    import numpy as np
+
+    rng = np.random.default_rng(semente)
+    filtros = []
+    for _ in range(n):
+        inicio = datetime.date(2003, 1, 1) + datetime.timedelta(days=int(rng.integers(0, 365 * 21)))
+        fim = inicio + datetime.timedelta(days=int(rng.integers(30, 365 * 3)))
+        filtros.append((estados[int(rng.integers(0, len(estados)))], inicio, fim))
+
+    return filtros
+
+
+def etapa_carregar_focos(diretorios, parametros):
+
+    from queimadas.armazenamento import carregar_focos
+
+    def operacao():
+        return {'linhas': len(carregar_focos(diretorio=diretorios['focos']))}
+
+    return None, operacao
+
+
+def etapa_colunas(diretorios, parametros):
+
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.colunas import ColunasFocos, salvar_colunas
+
+    df = carregar_focos(diretorio=diretorios['focos'])
+
+    def operacao():
+        salvar_colunas(df, diretorios['colunas'])
+        colunas = ColunasFocos(diretorios['colunas'])
+        linhas = sum(len(colunas.filtrar(*filtro)) for filtro in _filtros(colunas.estados))
+        return {'linhas_filtradas': linhas}
+
+    return df, operacao
+
+
+def etapa_cubo(diretorios, parametros):
+
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.cubo import DIMENSOES, construir_cubo, salvar_cubo
+
+    df = carregar_focos(colunas=DIMENSOES, diretorio=diretorios['focos'])
+
+    def operacao():
+        cubo = construir_cubo(df)
+        salvar_cubo(cubo, diretorios['cubo'])
+        return {'linhas_cubo': len(cubo)}
+
+    return df, operacao
+
+
+def etapa_rankings(diretorios, parametros):
+
+    from queimadas.cubo import carregar_cubo
+    from queimadas.rankings import construir_rankings, salvar_rankings
+
+    cubo = carregar_cubo(diretorio=diretorios['cubo'])
+
+    def operacao():
+        arrays = construir_rankings(cubo)
+        salvar_rankings(arrays, diretorios['rankings'])
+        return {'linhas_rankings': sum(len(arrays[f'{dimensao}_{periodo}_focos'])
+                                       for dimensao in ('municipio', 'bioma') for periodo in ('mes', 'ano'))}
+
+    return cubo, operacao
+
+
+def etapa_filtro_indice(diretorios, parametros):
+
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.consulta import IndiceFocos
+
+    df = carregar_focos(diretorio=diretorios['focos'])
+
+    def operacao():
+        indice = IndiceFocos(df)
+        linhas = sum(len(indice.filtrar(*filtro)) for filtro in _filtros(indice.estados))
+        return {'linhas_filtradas': linhas}
+
+    return df, operacao
+
+
+def etapa_filtro_mascara(diretorios, parametros):
+
+    import pandas as pd
+    from queimadas.armazenamento import carregar_focos
+
+    df = carregar_focos(diretorio=diretorios['focos'])
+
+    def operacao():
+        linhas = 0
+        for estado, inicio, fim in _filtros(sorted(df['estado'].cat.categories)):
+            mascara = (df['estado'] == estado) & (df.index >= pd.Timestamp(inicio)) & \
+                      (df.index < pd.Timestamp(fim) + pd.Timedelta(days=1))
+            linhas += len(df[mascara])
+        return {'linhas_filtradas': linhas}
+
+    return df, operacao
+
+
+def etapa_agregacoes_cubo(diretorios, parametros):
+
+    from queimadas.servico import GRANULARIDADES, ServicoFocos
+
+    servico = ServicoFocos(diretorio_cubo=diretorios['cubo'], diretorio_focos=diretorios['focos'],
+                           diretorio_colunas=diretorios['colunas'], diretorio_rankings=diretorios['rankings'])
+    servico.indice('cubo')
+
+    def operacao():
+        for estado, inicio, fim in _filtros(servico.estados()):
+            for granularidade in GRANULARIDADES:
+                if granularidade not in ('mapa', 'eventos'):
+                    servico.calcular(granularidade, estado, inicio, fim)
+        return {'consultas': CONSULTAS}
+
+    return servico, operacao
+
+
+def etapa_rankings_consultas(diretorios, parametros):
+
+    from queimadas.cubo import top_biomas, top_municipios
+    from queimadas.servico import ServicoFocos
+
+    servico = ServicoFocos(diretorio_cubo=diretorios['cubo'], diretorio_focos=diretorios['focos'],
+                           diretorio_colunas=diretorios['colunas'], diretorio_rankings=diretorios['rankings'])
+    servico.indice('cubo')
+    servico.rankings
+
+    def operacao():
+        pelas_tabelas, pelo_cubo = 0., 0.
+        for estado, inicio, fim in _filtros(servico.estados()):
+            instante = time.perf_counter()
+            for granularidade in ('municipios', 'biomas'):
+                servico.calcular_ranking(granularidade, estado, inicio, fim)
+            pelas_tabelas += time.perf_counter() - instante
+
+            instante = time.perf_counter()
+            cubo_filtrado = servico.cubo.filtrar(estado, inicio, fim)
+            top_municipios(cubo_filtrado, None)
+            top_biomas(cubo_filtrado, None)
+            pelo_cubo += time.perf_counter() - instante
+        return {'consultas': CONSULTAS, 'tabelas_s': pelas_tabelas, 'cubo_s': pelo_cubo}
+
+    return servico, operacao
+
+
+def etapa_agregacoes_grouper(diretorios, parametros):
+
+    import pandas as pd
+    from queimadas.armazenamento import carregar_focos
+
+    df = carregar_focos(colunas=['estado', 'municipio', 'bioma'], diretorio=diretorios['focos'])
+
+    def operacao():
+        for estado, inicio, fim in _filtros(sorted(df['estado'].cat.categories)):
+            filtrado = df[(df['estado'] == estado) & (df.index >= pd.Timestamp(inicio)) &
+                          (df.index < pd.Timestamp(fim) + pd.Timedelta(days=1))]
+            filtrado.groupby(pd.Grouper(freq='D')).size()
+            mensal = filtrado.groupby(pd.Grouper(freq='MS')).size()
+            filtrado.groupby(pd.Grouper(freq='YS')).size()
+            mensal.groupby(mensal.index.month).mean()
+            filtrado['municipio'].value_counts()
+            filtrado['bioma'].value_counts()
+        return {'consultas': CONSULTAS}
+
+    return df, operacao
+
+
+def etapa_paineis(diretorios, parametros):
+
+    from queimadas.servico import ServicoFocos
+
+    servico = ServicoFocos(diretorio_cubo=diretorios['cubo'], diretorio_focos=diretorios['focos'],
+                           diretorio_colunas=diretorios['colunas'], diretorio_rankings=diretorios['rankings'])
+    servico.indice('cubo')
+    servico.rankings
+    paineis = ['diaria', 'anual', 'mensal', 'climatologia', 'municipios', 'biomas']
+
+    def operacao():
+        for filtro in _filtros(servico.estados()):
+            servico.cache.limpar()
+            for painel in paineis:
+                servico.consultar(painel, *filtro)
+        return {'consultas': CONSULTAS}
+
+    return servico, operacao
+
+
+def etapa_figuras(diretorios, parametros):
+
+    import plotly.express as px
+    import plotly.io as pio
+    from queimadas.reducao import reduzir_serie
+    from queimadas.servico import ServicoFocos
+
+    servico = ServicoFocos(diretorio_cubo=diretorios['cubo'], diretorio_focos=diretorios['focos'],
+                           diretorio_colunas=diretorios['colunas'], diretorio_rankings=diretorios['rankings'])
+    series = [servico.calcular('diaria', estado, None, None) for estado in servico.estados()]
+
+    def operacao():
+        completo, reduzido = 0, 0
+        for serie in series:
+            completo += len(pio.to_json(px.line(serie)))
+            reduzido += len(pio.to_json(px.line(reduzir_serie(serie, parametros['largura_px']))))
+        return {'pontos': sum(map(len, series)), 'bytes_completo': completo, 'bytes_reduzido': reduzido}
+
+    return series, operacao
+
+
+def etapa_exportacao(diretorios, parametros):
+
+    import pandas as pd
+    from queimadas.exportacao import FORMATOS, exportar, exportar_focos
+    from queimadas.servico import ServicoFocos
+
+    servico = ServicoFocos(diretorio_cubo=diretorios['cubo'], diretorio_focos=diretorios['focos'],
+                           diretorio_colunas=diretorios['colunas'])
+    estado = servico.estados()[0]
+    diaria = servico.calcular('diaria', estado, None, None)
+    tabela = pd.DataFrame({'data': diaria.index, 'focos': diaria.values})
+
+    def operacao():
+        tamanhos = {}
+        for formato in FORMATOS:
+            tamanhos[f'painel_{formato}'] = len(exportar(tabela, formato))
+            tamanhos[f'focos_{formato}'] = len(exportar_focos(estado, None, None, formato,
+                                                              diretorio=diretorios['focos']))
+        return {'bytes': tamanhos}
+
+    return servico, operacao
+
+
+def etapa_grades(diretorios, parametros):
+
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.grade import construir_grades
+
+    df = carregar_focos(colunas=['lat', 'lon'], diretorio=diretorios['focos'])
+
+    def operacao():
+        grades = construir_grades(df)
+        return {'anos': len(grades.anos)}
+
+    return df, operacao
+
+
+def etapa_mapa(diretorios, parametros):
+
+    from queimadas.servico import ServicoFocos
+
+    servico = ServicoFocos(diretorio_cubo=diretorios['cubo'], diretorio_focos=diretorios['focos'],
+                           diretorio_colunas=diretorios['colunas'])
+
+    def operacao():
+        celulas = 0
+        for estado, inicio, fim in _filtros(servico.estados(), n=10):
+            for zoom in (4, 6, 8):
+                celulas += len(servico.calcular('mapa', estado, inicio, fim, zoom))
+        return {'celulas': celulas}
+
+    return servico, operacao
+
+
+def etapa_eventos(diretorios, parametros):
+
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.eventos import atualizar_eventos, carregar_eventos
+
+    ultimo_mes = carregar_focos(colunas=['lat'], diretorio=diretorios['focos']).index.max().replace(day=1)
+
+    def operacao():
+        atualizar_eventos(None, diretorios['focos'], diretorios['eventos'])
+        instante = time.perf_counter()
+        atualizar_eventos(ultimo_mes, diretorios['focos'], diretorios['eventos'])
+        incremental = time.perf_counter() - instante
+        eventos = carregar_eventos(diretorios['eventos'])
+        return {'eventos': len(eventos), 'maior_evento': int(eventos['focos'].max()), 'incremental_s': incremental}
+
+    return ultimo_mes, operacao
+
+
+def etapa_satelites(diretorios, parametros):
+
+    import numpy as np
+    import pandas as pd
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.satelites import SATELITE_REFERENCIA, marcar_duplicatas
+
+    rng = np.random.default_rng(0)
+    focos = carregar_focos(colunas=['lat', 'lon'], diretorio=diretorios['focos']).reset_index()
+    focos['data'] += pd.to_timedelta(rng.integers(0, 24 * 60, len(focos)), unit='min')
+
+    # metade dos focos é vista de novo por cada um dos outros satélites, um pouco deslocada no espaço e no tempo
+    partes = [focos.assign(satelite=SATELITE_REFERENCIA)]
+    for satelite in ('NOAA-20', 'NPP-375', 'TERRA_M-M'):
+        copia = focos[rng.random(len(focos)) < 0.5]
+        partes.append(copia.assign(satelite=satelite,
+                                   lat=copia['lat'] + rng.uniform(-0.002, 0.002, len(copia)),
+                                   lon=copia['lon'] + rng.uniform(-0.002, 0.002, len(copia)),
+                                   data=copia['data'] + pd.to_timedelta(rng.integers(-30, 31, len(copia)), unit='min')))
+    deteccoes = pd.concat(partes, ignore_index=True)
+
+    def operacao():
+        repetidas = marcar_duplicatas(deteccoes['data'], deteccoes['lat'], deteccoes['lon'], deteccoes['satelite'])
+        return {'deteccoes': len(deteccoes), 'copias': len(deteccoes) - len(focos), 'repetidas': int(repetidas.sum())}
+
+    return deteccoes, operacao
+
+
+def etapa_chirps_cache(diretorios, parametros):
+
+    from app_chirps.cache_chirps import CacheChirps, estatisticas
+    from sinteticos import gravar_chirps
+
+    cache = CacheChirps(diretorios['chirps'])
+    inicio, fim = gravar_chirps(cache, parametros['dias_chirps'])
+
+    def operacao():
+        for i in range(30):
+            estatisticas(cache.ler(fim - datetime.timedelta(days=i)))
+        cache.acumulado(fim.replace(day=1), fim)
+        datas, valores = cache.serie_media_area(inicio, fim)
+        return {'dias': len(datas)}
+
+    return cache, operacao
+
+
+def etapa_conjunta(diretorios, parametros):
+
+    from app_chirps.cache_chirps import CacheChirps
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.conjunta import JANELAS, AnaliseConjunta, chuva_antecedente, construir_regioes
+    from queimadas.grade import construir_grades
+    from sinteticos import gravar_chirps
+
+    df = carregar_focos(colunas=['lat', 'lon', 'estado', 'bioma'], diretorio=diretorios['focos'])
+    grades, regioes = construir_grades(df), construir_regioes(df)
+    gravar_chirps(CacheChirps(diretorios['chirps']), parametros['dias_chirps'])
+
+    def operacao():
+        chuva = chuva_antecedente(grades.anos, JANELAS, diretorios['chirps'], grades.grade)
+        analise = AnaliseConjunta(grades, chuva, regioes)
+        for estado in regioes.estados:
+            analise.correlacoes(estado)
+        for janela in JANELAS:
+            analise.mapa_correlacao(janela)
+        return {'anos': len(grades.anos), 'estados': len(regioes.estados)}
+
+    return grades, operacao
+
+
+def etapa_chirps_ee(diretorios, parametros):
+
+    from app_chirps.consulta_chirps import ConsultaChirps
+    from sinteticos import ClienteEEFalso
+
+    cliente = ClienteEEFalso()
+
+    def operacao():
+        consulta = ConsultaChirps(cliente)
+        pedidos = 0
+        for i in range(CONSULTAS):
+            consulta.dia_mais_recente(cliente.ultimo_dia + datetime.timedelta(days=i))
+            pedidos += 1
+        return {'chamadas_por_pedido': consulta.chamadas / pedidos}
+
+    return cliente, operacao
+
+
+ETAPAS = {nome[len('etapa_'):]: funcao for nome, funcao in globals().items() if nome.startswith('etapa_')}
+
+# etapas que leem os focos gerados (as outras só precisam do próprio processo)
+DEPENDENCIAS = {'rankings': ['cubo'], 'agregacoes_cubo': ['cubo', 'colunas', 'rankings'],
+                'rankings_consultas': ['cubo', 'colunas', 'rankings'], 'paineis': ['cubo', 'colunas', 'rankings'],
+                'exportacao': ['cubo'], 'figuras': ['cubo'], 'mapa': ['colunas']}
+
+
+# ==============================================================================================================#
+#                                                 MEDIÇÃO
+# ==============================================================================================================#
+# Função que roda uma etapa (no processo filho) e envia o resultado pela fila
+def _medir(nome, diretorios, parametros, fila):
+
+    try:
+        dados, operacao = ETAPAS[nome](diretorios, parametros)
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        extras = operacao()
+        segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        fila.put({'segundos': segundos, 'pico_mb': pico / 1024 ** 2, 'rss_max_mb': _rss_max_mb(), **extras})
+    except Exception as erro:
+        fila.put({'erro': f'{type(erro).__name__}: {erro}'})
+
+
+# pico de memória residente do processo (ru_maxrss é em KB no Linux e em bytes no macOS)
+def _rss_max_mb():
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+# Função que roda uma etapa num processo novo ("spawn": não herda a memória nem os imports do processo pai)
+def medir(nome, diretorios, parametros):
+
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_medir, args=(nome, diretorios, parametros, fila))
+    processo.start()
+    resultado = fila.get()
+    processo.join()
+
+    return resultado
+
+
+def executar(linhas, etapas=None, semente=0, dias_chirps=365, diretorio=None):
+
+    from sinteticos import GeradorFocos
+
+    etapas = list(ETAPAS if not etapas else etapas)
+    base = tempfile.mkdtemp(prefix='bench_queimadas_', dir=diretorio)
+    diretorios = {nome: os.path.join(base, nome) for nome in ('focos', 'cubo', 'colunas', 'rankings', 'eventos',
+                                                                 'chirps')}
+    parametros = {'dias_chirps': dias_chirps, 'largura_px': 700}
+
+    resultado = {'data': datetime.datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                 'linhas': linhas, 'semente': semente, 'etapas': {}}
+
+    try:
+        inicio = time.perf_counter()
+        GeradorFocos(semente).gravar(linhas, diretorios['focos'])
+        resultado['geracao_s'] = time.perf_counter() - inicio
+
+        # etapas que gravam dados usados por outras rodam antes delas
+        for nome in sorted(etapas, key=lambda nome: nome in DEPENDENCIAS):
+            for dependencia in DEPENDENCIAS.get(nome, []):
+                if dependencia not in resultado['etapas']:
+                    resultado['etapas'][dependencia] = medir(dependencia, diretorios, parametros)
+            if nome not in resultado['etapas']:
+                resultado['etapas'][nome] = medir(nome, diretorios, parametros)
+                print(nome, json.dumps(resultado['etapas'][nome], ensure_ascii=False), flush=True)
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+    return resultado
+
+
+# Função que mostra a razão entre o tempo/memória de cada etapa e os de uma execução anterior
+def comparar(atual, anterior):
+
+    print(f'{"etapa":<20} {"tempo (s)":>22} {"pico (MB)":>22}')
+    for nome, medida in atual['etapas'].items():
+        antes = anterior['etapas'].get(nome)
+        if not antes or 'erro' in medida or 'erro' in antes:
+            continue
+        print(f'{nome:<20} {antes["segundos"]:>9.3f} -> {medida["segundos"]:<9.3f}'
+              f' {antes["pico_mb"]:>9.1f} -> {medida["pico_mb"]:<9.1f}'
+              f' ({medida["segundos"] / max(antes["segundos"], 1e-9):.2f}x)')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark dos caminhos de dados do dashboard de queimadas')
+    parser.add_argument('--linhas', type=int, default=1_000_000, help='focos sintéticos gerados')
+    parser.add_argument('--etapas', nargs='+', choices=list(ETAPAS), help='etapas medidas (padrão: todas)')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--dias-chirps', type=int, default=365, help='dias do cache sintético do CHIRPS')
+    parser.add_argument('--diretorio', help='onde gravar os dados temporários (padrão: diretório temporário)')
+    parser.add_argument('--saida', help='arquivo JSON com o resultado')
+    parser.add_argument('--comparar', help='arquivo JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    resultado = executar(args.linhas, args.etapas, args.semente, args.dias_chirps, args.diretorio)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultado, json.load(f))
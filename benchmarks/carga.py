@@ -0,0 +1,493 @@
+# ==============================================================================================================#
+#                        TESTE DE CARGA DOS DASHBOARDS: VÁRIOS USUÁRIOS SIMULTÂNEOS
+# ==============================================================================================================#
+# Simula N usuários usando ao mesmo tempo uma instância do app de queimadas (01_app_queimadas.py) ou do app do
+# CHIRPS (app_chirps/app_chirps.py). Cada usuário é uma sessão do streamlit.testing (AppTest) numa thread do
+# mesmo processo, como as sessões de um servidor: compartilham os caches (st.cache_data/st.cache_resource), o GIL
+# e a memória. Depois da primeira execução, cada usuário faz interações sorteadas (troca de visão, estado, datas,
+# satélite, ano/mês, modo e período...), com uma pausa sorteada entre elas, e cada rerun é cronometrado.
+#
+# Resultado (JSON, comparável com uma execução anterior):
+#   - latência dos reruns (p50/p95/p99/máximo, ms): geral, da primeira execução, por visão e por controle alterado;
+#   - vazão (reruns por segundo) e erros (exceções do app e do próprio teste);
+#   - RSS do processo amostrada durante o teste (início, máximo, fim, crescimento e a série ao longo do tempo);
+#   - no app de queimadas, os trechos mais lentos da instrumentação (queimadas.instrumentacao).
+#
+# O app do CHIRPS roda sem rede: o módulo "ee" é trocado pelo cliente falso de benchmarks/sinteticos.py (com uma
+# latência opcional por chamada ao servidor), o mapa do geemap por um mapa folium sem camadas do Earth Engine e o
+# cache local é sintético (os últimos DIAS_SO_EE dias só existem no "Earth Engine").
+#
+# Uso (na raiz do repositório; sem --linhas, com os dados em "dados/"):
+#
+#   python benchmarks/carga.py --usuarios 20 --interacoes 10 --saida carga.json
+#   python benchmarks/carga.py --linhas 1000000 --usuarios 50 --comparar carga.json --limite-p95 3000
+#   python benchmarks/carga.py --app chirps --usuarios 20 --latencia-ee 300
+# ==============================================================================================================#
+import argparse
+import datetime
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for caminho in (RAIZ, os.path.dirname(os.path.abspath(__file__))):
+    if caminho not in sys.path:
+        sys.path.insert(0, caminho)
+
+# o app do CHIRPS importa os módulos vizinhos pelo nome (como no streamlit run): o diretório dele vai no fim, para
+# "app_chirps" continuar sendo o pacote
+if os.path.join(RAIZ, 'app_chirps') not in sys.path:
+    sys.path.append(os.path.join(RAIZ, 'app_chirps'))
+
+# apps testados: script, controle da visão (chave ou rótulo do rádio) e período sorteado nas datas
+APPS = {'queimadas': {'script': os.path.join(RAIZ, '01_app_queimadas.py'), 'chave_visao': 'tipo_analise',
+                      'periodo': (datetime.date(2003, 1, 1), datetime.date(2024, 5, 31))},
+        'chirps': {'script': os.path.join(RAIZ, 'app_chirps', 'app_chirps.py'), 'rotulo_visao': 'Modo',
+                   'periodo': None}}
+
+# probabilidade de uma interação trocar a visão (as outras alteram um controle qualquer da visão atual)
+PROBABILIDADE_VISAO = 0.3
+
+# dias mais recentes que não estão no cache local sintético do CHIRPS (vão ao Earth Engine falso)
+DIAS_SO_EE = 30
+
+PERCENTIS = (50, 95, 99)
+
+
+# ==============================================================================================================#
+#                                   EARTH ENGINE E GEEMAP FALSOS (APP DO CHIRPS)
+# ==============================================================================================================#
+# Função que instala, no lugar dos módulos "ee" e "geemap.foliumap", o cliente falso do Earth Engine (com
+# "latencia" segundos por chamada ao servidor) e um mapa folium que não pede camadas ao servidor. Retorna o cliente.
+def instalar_ee_falso(ultimo_dia, latencia=0.0):
+
+    import folium
+    from sinteticos import ClienteEEFalso
+
+    class ClienteLento(ClienteEEFalso):
+
+        def responder(self, no):
+            time.sleep(latencia)
+            return super().responder(no)
+
+    cliente = ClienteLento(ultimo_dia)
+    ee = types.ModuleType('ee')
+    for nome in ('ImageCollection', 'FeatureCollection', 'Image', 'Feature', 'Reducer', 'Filter'):
+        setattr(ee, nome, getattr(cliente, nome))
+    ee.Initialize = ee.Authenticate = lambda *argumentos, **opcoes: None
+
+    class Mapa(folium.Map):
+
+        def __init__(self, center=(-15, -55), zoom=4, **opcoes):
+            super().__init__(location=center, zoom_start=zoom)
+
+        # cada camada do Earth Engine seria um mapid pedido ao servidor
+        def addLayer(self, objeto, parametros=None, nome=None):
+            time.sleep(latencia)
+
+        def addLayerControl(self):
+            folium.LayerControl().add_to(self)
+
+        # como o geemap: o HTML do mapa num componente
+        def to_streamlit(self, height=600, **opcoes):
+            import streamlit.components.v1 as components
+            components.html(self.get_root().render(), height=height)
+
+    foliumap = types.ModuleType('geemap.foliumap')
+    foliumap.Map = Mapa
+    geemap = types.ModuleType('geemap')
+    geemap.foliumap = foliumap
+
+    sys.modules.update({'ee': ee, 'geemap': geemap, 'geemap.foliumap': foliumap})
+    return cliente
+
+
+# Função que grava o cache local sintético do CHIRPS e aponta o app para ele. Retorna o período das datas sorteadas.
+def preparar_chirps(diretorio, dias, ultimo_dia):
+
+    from app_chirps.cache_chirps import CacheChirps
+    from sinteticos import gravar_chirps
+
+    os.environ['CHIRPS_CACHE'] = diretorio
+    inicio, _ = gravar_chirps(CacheChirps(diretorio), dias, fim=ultimo_dia - datetime.timedelta(days=DIAS_SO_EE))
+
+    return inicio, ultimo_dia
+
+
+# Função que gera os dados sintéticos do app de queimadas em "diretorio/dados" (focos, cubo, colunas, rankings
+# e grades) e copia o style.css. O teste roda com "diretorio" como diretório de trabalho.
+def preparar_queimadas(diretorio, linhas, semente=0):
+
+    from queimadas.armazenamento import carregar_focos
+    from queimadas.colunas import salvar_colunas
+    from queimadas.cubo import DIMENSOES, construir_cubo, salvar_cubo
+    from queimadas.grade import construir_grades
+    from queimadas.rankings import converter_cubo
+    from sinteticos import GeradorFocos
+
+    dados = os.path.join(diretorio, 'dados')
+    GeradorFocos(semente).gravar(linhas, os.path.join(dados, 'focos'))
+
+    df = carregar_focos(diretorio=os.path.join(dados, 'focos'))
+    salvar_cubo(construir_cubo(df[DIMENSOES]), os.path.join(dados, 'cubo'))
+    salvar_colunas(df, os.path.join(dados, 'colunas'))
+    converter_cubo(os.path.join(dados, 'cubo'), os.path.join(dados, 'rankings'))
+    construir_grades(df).salvar(os.path.join(dados, 'grade', 'grades_mensais.npz'))
+
+    shutil.copy(os.path.join(RAIZ, 'style.css'), diretorio)
+
+
+# ==============================================================================================================#
+#                                              USUÁRIOS
+# ==============================================================================================================#
+# Função que prepara o streamlit.testing para várias sessões ao mesmo tempo, como no servidor:
+#   - um único cache do script compilado (com um cache por execução, sessões compilando o script ao mesmo tempo
+#     quebram o parser do Python);
+#   - um único runtime (falso) para todas as sessões: o AppTest cria um por execução e o apaga no final, o que
+#     tiraria o runtime das outras sessões no meio da execução delas.
+def preparar_sessoes():
+
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    script = app_test.ScriptCache()
+    local_script_runner.ScriptCache = lambda: script
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = app_test.MediaFileManager(app_test.MemoryMediaFileStorage('/mock/media'))
+    runtime.dataframe_source_mgr = app_test.DataframeSourceManager()
+    runtime.cache_storage_manager = app_test.MemoryCacheStorageManager()
+    runtime.bidi_component_registry = app_test.BidiComponentManager()
+    runtime.bidi_component_registry.discover_and_register_components(start_file_watching=False)
+
+    # o AppTest passa a gravar o runtime dele numa classe que ninguém lê
+    Runtime._instance = runtime
+    app_test.Runtime = type('Runtime', (), {'_instance': None})
+
+
+# Função que retorna o rótulo de um controle sem a formatação markdown (":orange[**Estado**]:" -> "Estado")
+def rotulo(controle):
+    return re.sub(r':\w+\[|[\]*:]', '', controle.label).strip()
+
+
+class Usuario:
+
+    def __init__(self, app, semente, pausa, timeout):
+        self.app = app
+        self.aleatorio = random.Random(semente)
+        self.pausa = pausa
+        self.timeout = timeout
+        self.medidas = []
+        self.erros = []
+
+    # Função que retorna o rádio da visão do app
+    def controle_visao(self, at):
+
+        if 'chave_visao' in self.app:
+            return next((radio for radio in at.radio if radio.key == self.app['chave_visao']), None)
+
+        return next((radio for radio in at.radio if rotulo(radio) == self.app['rotulo_visao']), None)
+
+    def visao(self, at):
+
+        controle = self.controle_visao(at)
+        return None if controle is None else str(controle.value).strip('*')
+
+    # Função que sorteia e aplica uma interação (a próxima execução do app a envia). Retorna o controle alterado.
+    def interagir(self, at):
+
+        visao = self.controle_visao(at)
+        if visao is not None and self.aleatorio.random() < PROBABILIDADE_VISAO:
+            visao.set_value(self.aleatorio.choice([opcao for opcao in visao.options if opcao != visao.value]
+                                                  or visao.options))
+            return 'visão'
+
+        controles = [controle for controle in list(at.selectbox) + list(at.radio) + list(at.date_input)
+                     + list(at.slider) if controle is not visao and not controle.proto.disabled]
+        if not controles:
+            return None
+
+        controle = self.aleatorio.choice(controles)
+        tipo = type(controle).__name__
+
+        if tipo == 'Selectbox':
+            controle.select_index(self.aleatorio.randrange(len(controle.options)))
+        elif tipo == 'Radio':
+            controle.set_value(self.aleatorio.choice(controle.options))
+        elif tipo == 'DateInput':
+            controle.set_value(self.sortear_datas(controle))
+        else:
+            controle.set_value(self.sortear_valor(controle))
+
+        return rotulo(controle)
+
+    # Função que sorteia a data (ou o intervalo) de um date_input, dentro dos limites dele e do período do app
+    def sortear_datas(self, controle):
+
+        inicio = _data(controle.proto.min)
+        fim = _data(controle.proto.max) if controle.proto.max else None
+        if self.app['periodo'] is not None:
+            inicio = max(inicio, self.app['periodo'][0])
+            fim = self.app['periodo'][1] if fim is None else min(fim, self.app['periodo'][1])
+        fim = fim or inicio
+
+        datas = sorted(inicio + datetime.timedelta(days=self.aleatorio.randint(0, max((fim - inicio).days, 0)))
+                       for _ in range(2 if controle.proto.is_range else 1))
+
+        return tuple(datas) if controle.proto.is_range else datas[0]
+
+    # Função que sorteia o valor (ou o intervalo) de um slider numérico, no passo dele
+    def sortear_valor(self, controle):
+
+        proto = controle.proto
+        passos = int(round((proto.max - proto.min) / proto.step)) if proto.step else 100
+        valores = sorted(proto.min + self.aleatorio.randint(0, passos) * (proto.step or (proto.max - proto.min) / 100)
+                         for _ in range(len(proto.default)))
+        valores = [round(min(valor, proto.max), 6) for valor in valores]
+        if proto.data_type == proto.INT:
+            valores = [int(valor) for valor in valores]
+
+        return tuple(valores) if len(valores) > 1 else valores[0]
+
+    # Função que cronometra uma execução do app e guarda a medida
+    def executar(self, at, controle, inicio_teste):
+
+        visao = self.visao(at) if controle is not None else None
+        inicio = time.perf_counter()
+        try:
+            at.run(timeout=self.timeout)
+        except Exception as erro:
+            self.erros.append(f'{type(erro).__name__}: {erro}')
+            return False
+
+        fim = time.perf_counter()
+        self.erros.extend(str(excecao.value) for excecao in at.exception)
+        self.medidas.append({'controle': controle or 'primeira execução', 'visao': self.visao(at) or visao,
+                             'ms': (fim - inicio) * 1000, 'instante_s': fim - inicio_teste,
+                             'erro': bool(len(at.exception))})
+        return True
+
+    def rodar(self, interacoes, atraso, inicio_teste):
+
+        from streamlit.testing.v1 import AppTest
+
+        time.sleep(atraso)
+        at = AppTest.from_file(self.app['script'], default_timeout=self.timeout)
+        if not self.executar(at, None, inicio_teste):
+            return
+
+        for _ in range(interacoes):
+            time.sleep(self.aleatorio.expovariate(1 / self.pausa) if self.pausa > 0 else 0)
+            try:
+                controle = self.interagir(at)
+            except Exception as erro:
+                self.erros.append(f'interação: {type(erro).__name__}: {erro}')
+                continue
+            if controle is not None and not self.executar(at, controle, inicio_teste):
+                return
+
+
+# limites dos date_input ("AAAA/MM/DD" ou "AAAA-MM-DD", conforme a versão do streamlit)
+def _data(texto):
+    return datetime.date.fromisoformat(texto.replace('/', '-'))
+
+
+# ==============================================================================================================#
+#                                            MEMÓRIA E RESUMO
+# ==============================================================================================================#
+# memória residente atual do processo (MB): /proc no Linux; nos outros sistemas, o pico (ru_maxrss)
+def rss_mb():
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+# Função (thread) que amostra a RSS e o número de reruns concluídos a cada "intervalo" segundos até "parar"
+def amostrar_memoria(usuarios, amostras, intervalo, parar, inicio_teste):
+
+    while True:
+        amostras.append([round(time.perf_counter() - inicio_teste, 3), round(rss_mb(), 1),
+                         sum(len(usuario.medidas) for usuario in usuarios)])
+        if parar.wait(intervalo):
+            break
+
+
+# Função que resume uma lista de latências (ms)
+def percentis(valores):
+
+    if not valores:
+        return None
+
+    valores = np.asarray(valores)
+    return {'reruns': len(valores), **{f'p{p}': round(float(np.percentile(valores, p)), 1) for p in PERCENTIS},
+            'max': round(float(valores.max()), 1), 'media': round(float(valores.mean()), 1)}
+
+
+def resumir(usuarios, amostras, duracao):
+
+    medidas = [medida for usuario in usuarios for medida in usuario.medidas]
+    interacoes = [medida for medida in medidas if medida['controle'] != 'primeira execução']
+    erros = [erro for usuario in usuarios for erro in usuario.erros]
+
+    por_visao, por_controle = defaultdict(list), defaultdict(list)
+    for medida in interacoes:
+        por_visao[medida['visao']].append(medida['ms'])
+        por_controle[medida['controle']].append(medida['ms'])
+
+    memoria = [amostra[1] for amostra in amostras]
+
+    return {'reruns': len(medidas),
+            'duracao_s': round(duracao, 3),
+            'vazao_reruns_s': round(len(medidas) / duracao, 3) if duracao else None,
+            'latencia_ms': percentis([medida['ms'] for medida in interacoes]),
+            'primeira_execucao_ms': percentis([medida['ms'] for medida in medidas
+                                               if medida['controle'] == 'primeira execução']),
+            'por_visao': {str(visao): percentis(valores) for visao, valores in sorted(por_visao.items(), key=str)},
+            'por_controle': {controle: percentis(valores) for controle, valores in sorted(por_controle.items())},
+            'erros': len(erros),
+            'exemplos_erros': sorted(set(erros))[:10],
+            'rss_mb': {'inicio': memoria[0], 'max': max(memoria), 'fim': memoria[-1],
+                       'crescimento': round(memoria[-1] - memoria[0], 1)} if memoria else None,
+            'rss_serie': amostras}
+
+
+# Função que retorna os trechos da instrumentação do app com mais tempo total (só o app de queimadas)
+def trechos_mais_lentos(n=10):
+
+    from queimadas.instrumentacao import metricas
+
+    trechos = metricas()['trechos']
+    return dict(sorted(trechos.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:n])
+
+
+# ==============================================================================================================#
+#                                                EXECUÇÃO
+# ==============================================================================================================#
+def executar(app='queimadas', usuarios=10, interacoes=10, pausa=1.0, rampa=0.0, linhas=None, dias_chirps=365,
+             latencia_ee=0.0, amostragem=0.5, timeout=600, semente=0, diretorio=None):
+
+    configuracao = dict(APPS[app])
+    base = tempfile.mkdtemp(prefix='carga_dashboards_', dir=diretorio)
+    diretorio_original = os.getcwd()
+
+    try:
+        if app == 'chirps':
+            ultimo_dia = datetime.date.today() - datetime.timedelta(days=60)
+            configuracao['periodo'] = preparar_chirps(os.path.join(base, 'chirps'), dias_chirps, ultimo_dia)
+            cliente = instalar_ee_falso(ultimo_dia, latencia_ee / 1000)
+        elif linhas:
+            preparar_queimadas(base, linhas, semente)
+            os.chdir(base)
+
+        preparar_sessoes()
+
+        simulados = [Usuario(configuracao, semente * 100_000 + i, pausa, timeout) for i in range(usuarios)]
+        amostras, parar = [], threading.Event()
+        inicio = time.perf_counter()
+
+        amostrador = threading.Thread(target=amostrar_memoria, args=(simulados, amostras, amostragem, parar, inicio),
+                                      daemon=True)
+        amostrador.start()
+
+        # os usuários entram espalhados pela rampa (segundos)
+        threads = [threading.Thread(target=usuario.rodar, args=(interacoes, rampa * i / max(usuarios, 1), inicio))
+                   for i, usuario in enumerate(simulados)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        duracao = time.perf_counter() - inicio
+        parar.set()
+        amostrador.join()
+
+        resultado = {'data': datetime.datetime.now().isoformat(timespec='seconds'), 'python': sys.version.split()[0],
+                     'app': app, 'usuarios': usuarios, 'interacoes': interacoes, 'pausa_s': pausa, 'rampa_s': rampa,
+                     'linhas': linhas, 'semente': semente, **resumir(simulados, amostras, duracao)}
+
+        if app == 'chirps':
+            resultado.update(latencia_ee_ms=latencia_ee, chamadas_ee=cliente.chamadas)
+        else:
+            resultado['trechos_mais_lentos'] = trechos_mais_lentos()
+    finally:
+        os.chdir(diretorio_original)
+        shutil.rmtree(base, ignore_errors=True)
+
+    return resultado
+
+
+# Função que mostra a latência, a vazão e a memória em relação às de uma execução anterior
+def comparar(atual, anterior):
+
+    linhas = [(f'latência p{p} (ms)', ('latencia_ms', f'p{p}')) for p in PERCENTIS] + \
+        [('primeira execução p95 (ms)', ('primeira_execucao_ms', 'p95')), ('vazão (reruns/s)', ('vazao_reruns_s',)),
+         ('RSS máxima (MB)', ('rss_mb', 'max')), ('crescimento RSS (MB)', ('rss_mb', 'crescimento'))]
+
+    print(f'{"medida":<28} {"anterior":>10} {"atual":>10}')
+    for nome, chaves in linhas:
+        valores = []
+        for resultado in (anterior, atual):
+            valor = resultado
+            for chave in chaves:
+                valor = valor.get(chave) if isinstance(valor, dict) else None
+            valores.append(valor)
+        if None not in valores:
+            print(f'{nome:<28} {valores[0]:>10.1f} {valores[1]:>10.1f} ({valores[1] / max(valores[0], 1e-9):.2f}x)')
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Teste de carga dos dashboards (usuários simultâneos)')
+    parser.add_argument('--app', choices=list(APPS), default='queimadas')
+    parser.add_argument('--usuarios', type=int, default=10, help='sessões simultâneas')
+    parser.add_argument('--interacoes', type=int, default=10, help='interações de cada usuário')
+    parser.add_argument('--pausa', type=float, default=1.0, help='pausa média (s) entre as interações')
+    parser.add_argument('--rampa', type=float, default=0.0, help='segundos para todos os usuários entrarem')
+    parser.add_argument('--linhas', type=int, help='focos sintéticos gerados (padrão: os dados de "dados/")')
+    parser.add_argument('--dias-chirps', type=int, default=365, help='dias do cache sintético do CHIRPS')
+    parser.add_argument('--latencia-ee', type=float, default=0.0, help='latência (ms) de cada chamada ao EE')
+    parser.add_argument('--amostragem', type=float, default=0.5, help='intervalo (s) das amostras de memória')
+    parser.add_argument('--timeout', type=float, default=600, help='tempo máximo (s) de uma execução do app')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--diretorio', help='onde gravar os dados temporários (padrão: diretório temporário)')
+    parser.add_argument('--saida', help='arquivo JSON com o resultado')
+    parser.add_argument('--comparar', help='arquivo JSON de uma execução anterior')
+    parser.add_argument('--limite-p95', type=float, help='falha (código 1) se a latência p95 passar deste valor (ms)')
+    args = parser.parse_args()
+
+    resultado = executar(args.app, args.usuarios, args.interacoes, args.pausa, args.rampa, args.linhas,
+                         args.dias_chirps, args.latencia_ee, args.amostragem, args.timeout, args.semente,
+                         args.diretorio)
+
+    resumo = {chave: valor for chave, valor in resultado.items() if chave not in ('rss_serie', 'por_controle')}
+    print(json.dumps(resumo, indent=2, ensure_ascii=False))
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultado, json.load(f))
+
+    latencia = resultado['latencia_ms']
+    if args.limite_p95 is not None and (latencia is None or latencia['p95'] > args.limite_p95 or resultado['erros']):
+        sys.exit(1)
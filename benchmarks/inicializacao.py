@@ -0,0 +1,124 @@
+# ==============================================================================================================#
+#                                BENCHMARK DA INICIALIZAÇÃO DO APP DE QUEIMADAS
+# ==============================================================================================================#
+# Mede, cada item num processo Python novo (imports e caches frios, como numa réplica recém-iniciada):
+#
+#   - custo de import (ms, acumulado segundo "python -X importtime") das bibliotecas usadas pelo app;
+#   - tempo até o primeiro elemento desenhado e tempo total da primeira execução de cada visão do app
+#     ("Série Temporal" e "Distribuição Espacial"), rodando o script com o streamlit.testing. Os tempos contam a
+#     partir do início do script (o próprio streamlit já importado, como num servidor no ar).
+#
+# Uso (na raiz do repositório, com os dados em "dados/"):
+#
+#   python benchmarks/inicializacao.py
+#   python benchmarks/inicializacao.py --repeticoes 5 --saida inicializacao.json
+# ==============================================================================================================#
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = '01_app_queimadas.py'
+
+MODULOS = ['streamlit', 'pandas', 'pyarrow', 'plotly.express', 'folium', 'streamlit_folium',
+           'streamlit_extras.row', 'queimadas.servico', 'queimadas.exportacao', 'queimadas.grade']
+
+VISOES = ['**Série Temporal**', '**Distribuição Espacial**']
+
+# script rodado num processo novo para medir uma visão: registra o instante da primeira mensagem com um
+# elemento da página (delta) enviada pelo script e o tempo total da execução
+SCRIPT_VISAO = '''
+import json, sys, time
+from streamlit.runtime.scriptrunner_utils.script_run_context import ScriptRunContext
+from streamlit.testing.v1 import AppTest
+
+primeiro = []
+enqueue = ScriptRunContext.enqueue
+def registrar(self, msg):
+    if not primeiro and msg.HasField('delta'):
+        primeiro.append(time.perf_counter())
+    return enqueue(self, msg)
+ScriptRunContext.enqueue = registrar
+
+app, visao = sys.argv[1], sys.argv[2]
+at = AppTest.from_file(app, default_timeout=600)
+# a visão é o valor inicial do rádio "tipo_analise" da barra lateral
+at.session_state['tipo_analise'] = visao
+inicio = time.perf_counter()
+at.run()
+fim = time.perf_counter()
+print(json.dumps({'primeira_pintura_ms': (primeiro[0] - inicio) * 1000 if primeiro else None,
+                  'total_ms': (fim - inicio) * 1000,
+                  'erros': [str(e.value) for e in at.exception]}))
+'''
+
+
+# Função que retorna o custo de import (ms) de um módulo num processo novo
+def custo_import(modulo):
+
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'], cwd=RAIZ,
+                           capture_output=True, text=True, check=True).stderr
+
+    for linha in saida.splitlines():
+        partes = [parte.strip() for parte in linha.split('|')]
+        if len(partes) == 3 and partes[2] == modulo:
+            return int(partes[1]) / 1000
+
+    return None
+
+
+# Função que mede a primeira execução de uma visão do app num processo novo
+def medir_visao(visao, app=APP):
+
+    saida = subprocess.run([sys.executable, '-c', SCRIPT_VISAO, app, visao], cwd=RAIZ,
+                           capture_output=True, text=True, check=True).stdout
+
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+# Função que resume as repetições de uma medida (mediana, mínimo e máximo)
+def resumir(valores):
+
+    valores = [valor for valor in valores if valor is not None]
+    if not valores:
+        return None
+
+    return {'mediana': statistics.median(valores), 'minimo': min(valores), 'maximo': max(valores)}
+
+
+def executar(repeticoes=3, app=APP):
+
+    resultado = {'python': sys.version.split()[0], 'repeticoes': repeticoes, 'imports_ms': {}, 'visoes': {}}
+
+    for modulo in MODULOS:
+        resultado['imports_ms'][modulo] = resumir([custo_import(modulo) for _ in range(repeticoes)])
+
+    for visao in VISOES:
+        medidas = [medir_visao(visao, app) for _ in range(repeticoes)]
+        resultado['visoes'][visao.strip('*')] = {
+            'primeira_pintura_ms': resumir([medida['primeira_pintura_ms'] for medida in medidas]),
+            'total_ms': resumir([medida['total_ms'] for medida in medidas]),
+            'erros': sorted({erro for medida in medidas for erro in medida['erros']})}
+
+    return resultado
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark da inicialização do app de queimadas')
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--app', default=APP, help='script do app (caminho relativo à raiz do repositório)')
+    parser.add_argument('--saida', help='arquivo JSON com o resultado (padrão: só mostra na tela)')
+    args = parser.parse_args()
+
+    resultado = executar(args.repeticoes, args.app)
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            f.write(texto + '\n')
+
+    print(texto)
@@ -0,0 +1,269 @@
+# ==============================================================================================================#
+#                          DADOS SINTÉTICOS PARA OS BENCHMARKS (FOCOS DE CALOR E CHIRPS)
+# ==============================================================================================================#
+# Gera focos de calor com a mesma estrutura dos dados do INPE e tamanho escolhido (1 a 50 milhões de linhas):
+#
+#   - 27 estados com a participação aproximada de cada um no total de focos;
+#   - ~5.570 municípios (quantidade real por estado), com poucos municípios concentrando a maior parte dos focos;
+#   - 6 biomas, sorteados por município conforme os biomas de cada estado;
+#   - sazonalidade da estação seca (pico em agosto/setembro) e lat/lon em torno da sede de cada município.
+#
+# Os dados são gerados e gravados ano a ano no armazenamento Parquet, então a memória usada pelo gerador fica
+# limitada a um ano de focos. A mesma semente gera sempre os mesmos dados.
+#
+# Também há um cliente falso do Earth Engine (mesma interface usada por app_chirps/consulta_chirps.py e pela
+# carga do cache em app_chirps/cache_chirps.py), que responde sem rede e conta as chamadas ao servidor.
+# ==============================================================================================================#
+import datetime
+import types
+
+import numpy as np
+import pandas as pd
+
+from queimadas.armazenamento import salvar_particao
+
+# estado: (municípios, % dos focos, lat e lon do centro, raio em graus, {bioma: fração dos municípios})
+ESTADOS = {
+    'ACRE': (22, 3.0, -9.0, -70.5, 1.5, {'AMAZÔNIA': 1.0}),
+    'ALAGOAS': (102, 0.2, -9.6, -36.6, 0.5, {'CAATINGA': 0.5, 'MATA ATLÂNTICA': 0.5}),
+    'AMAPÁ': (16, 0.5, 1.4, -51.8, 1.2, {'AMAZÔNIA': 1.0}),
+    'AMAZONAS': (62, 8.0, -4.0, -64.0, 4.5, {'AMAZÔNIA': 1.0}),
+    'BAHIA': (417, 5.0, -12.5, -41.7, 3.0, {'CAATINGA': 0.5, 'CERRADO': 0.35, 'MATA ATLÂNTICA': 0.15}),
+    'CEARÁ': (184, 2.0, -5.2, -39.5, 1.5, {'CAATINGA': 1.0}),
+    'DISTRITO FEDERAL': (1, 0.1, -15.8, -47.9, 0.2, {'CERRADO': 1.0}),
+    'ESPÍRITO SANTO': (78, 0.3, -19.6, -40.6, 0.8, {'MATA ATLÂNTICA': 1.0}),
+    'GOIÁS': (246, 3.0, -15.9, -49.6, 2.2, {'CERRADO': 0.95, 'MATA ATLÂNTICA': 0.05}),
+    'MARANHÃO': (217, 9.0, -5.0, -45.3, 2.5, {'AMAZÔNIA': 0.35, 'CERRADO': 0.6, 'CAATINGA': 0.05}),
+    'MATO GROSSO': (141, 15.0, -12.9, -55.9, 3.5, {'AMAZÔNIA': 0.5, 'CERRADO': 0.45, 'PANTANAL': 0.05}),
+    'MATO GROSSO DO SUL': (79, 4.0, -20.5, -54.8, 2.2, {'CERRADO': 0.6, 'PANTANAL': 0.25,
+                                                         'MATA ATLÂNTICA': 0.15}),
+    'MINAS GERAIS': (853, 4.0, -18.5, -44.5, 3.0, {'CERRADO': 0.55, 'MATA ATLÂNTICA': 0.4, 'CAATINGA': 0.05}),
+    'PARÁ': (144, 15.0, -4.5, -52.5, 4.0, {'AMAZÔNIA': 0.9, 'CERRADO': 0.1}),
+    'PARAÍBA': (223, 0.5, -7.1, -36.8, 0.8, {'CAATINGA': 0.9, 'MATA ATLÂNTICA': 0.1}),
+    'PARANÁ': (399, 1.0, -24.6, -51.6, 1.8, {'MATA ATLÂNTICA': 1.0}),
+    'PERNAMBUCO': (185, 0.8, -8.4, -37.9, 1.2, {'CAATINGA': 0.85, 'MATA ATLÂNTICA': 0.15}),
+    'PIAUÍ': (224, 4.0, -7.7, -42.7, 2.5, {'CERRADO': 0.6, 'CAATINGA': 0.4}),
+    'RIO DE JANEIRO': (92, 0.3, -22.3, -42.7, 0.8, {'MATA ATLÂNTICA': 1.0}),
+    'RIO GRANDE DO NORTE': (167, 0.4, -5.8, -36.6, 0.8, {'CAATINGA': 0.95, 'MATA ATLÂNTICA': 0.05}),
+    'RIO GRANDE DO SUL': (497, 1.0, -29.7, -53.3, 2.0, {'PAMPA': 0.6, 'MATA ATLÂNTICA': 0.4}),
+    'RONDÔNIA': (52, 5.0, -10.9, -62.8, 2.0, {'AMAZÔNIA': 0.9, 'CERRADO': 0.1}),
+    'RORAIMA': (15, 1.5, 2.1, -61.4, 1.8, {'AMAZÔNIA': 1.0}),
+    'SANTA CATARINA': (295, 0.7, -27.2, -50.5, 1.2, {'MATA ATLÂNTICA': 1.0}),
+    'SÃO PAULO': (645, 2.0, -22.3, -48.7, 2.0, {'MATA ATLÂNTICA': 0.7, 'CERRADO': 0.3}),
+    'SERGIPE': (75, 0.2, -10.6, -37.4, 0.5, {'CAATINGA': 0.5, 'MATA ATLÂNTICA': 0.5}),
+    'TOCANTINS': (139, 7.0, -10.2, -48.3, 2.5, {'CERRADO': 0.9, 'AMAZÔNIA': 0.1}),
+}
+
+BIOMAS = ['AMAZÔNIA', 'CAATINGA', 'CERRADO', 'MATA ATLÂNTICA', 'PAMPA', 'PANTANAL']
+
+# fração dos focos em cada mês (estação seca)
+SAZONALIDADE = np.array([2, 2, 2, 2, 3, 5, 10, 20, 25, 15, 8, 6], dtype=np.float64)
+SAZONALIDADE /= SAZONALIDADE.sum()
+
+# desvio (graus) dos focos em torno da sede do município
+ESPALHAMENTO = 0.15
+
+ANO_INICIAL = 2003
+ANO_FINAL = 2024
+
+
+# ==============================================================================================================#
+#                                               FOCOS DE CALOR
+# ==============================================================================================================#
+class GeradorFocos:
+
+    def __init__(self, semente=0):
+
+        rng = np.random.default_rng(semente)
+        self.semente = semente
+
+        estados, municipios, pesos, lat, lon, biomas, estado_municipio = [], [], [], [], [], [], []
+        for codigo, (nome, (quantidade, percentual, lat0, lon0, raio, biomas_estado)) in enumerate(ESTADOS.items()):
+            estados.append(nome)
+            municipios += [f'{nome} {i + 1:04d}' for i in range(quantidade)]
+            estado_municipio.append(np.full(quantidade, codigo))
+
+            # poucos municípios concentram a maior parte dos focos do estado (lei de potência)
+            peso = rng.pareto(1.2, quantidade) + 1e-3
+            pesos.append(percentual * peso / peso.sum())
+
+            lat.append(lat0 + rng.uniform(-raio, raio, quantidade))
+            lon.append(lon0 + rng.uniform(-raio, raio, quantidade))
+            biomas.append(rng.choice([BIOMAS.index(b) for b in biomas_estado], quantidade,
+                                     p=list(biomas_estado.values())))
+
+        self.estados = estados
+        self.municipios = municipios
+        self._estado = np.concatenate(estado_municipio)
+        self._bioma = np.concatenate(biomas)
+        self._lat = np.concatenate(lat)
+        self._lon = np.concatenate(lon)
+
+        pesos = np.concatenate(pesos)
+        self._pesos = pesos / pesos.sum()
+
+    # Função que gera os focos de um ano (dataframe normalizado, em ordem de data)
+    def gerar_ano(self, ano, linhas):
+
+        rng = np.random.default_rng([self.semente, ano])
+
+        municipio = rng.choice(len(self._pesos), linhas, p=self._pesos)
+
+        # dia: mês pela sazonalidade, dia uniforme dentro do mês; hora uniforme no dia
+        meses = rng.choice(12, linhas, p=SAZONALIDADE)
+        inicio_mes = np.array([np.datetime64(datetime.date(ano, m + 1, 1), 's') for m in range(12)] +
+                              [np.datetime64(datetime.date(ano + 1, 1, 1), 's')])
+        duracao = (inicio_mes[1:] - inicio_mes[:-1]).astype(np.int64)
+        segundos = (rng.random(linhas) * duracao[meses]).astype(np.int64)
+        data = (inicio_mes[meses] + segundos).astype('datetime64[ns]')
+
+        df = pd.DataFrame({
+            'data': data,
+            'lat': (self._lat[municipio] + rng.normal(0, ESPALHAMENTO, linhas)).astype(np.float32),
+            'lon': (self._lon[municipio] + rng.normal(0, ESPALHAMENTO, linhas)).astype(np.float32),
+            'municipio': pd.Categorical.from_codes(municipio, self.municipios),
+            'estado': pd.Categorical.from_codes(self._estado[municipio], self.estados),
+            'bioma': pd.Categorical.from_codes(self._bioma[municipio], BIOMAS)})
+
+        return df.sort_values('data', kind='stable', ignore_index=True)
+
+    # Função que divide o total de linhas entre os anos (com uma leve tendência de alta e variação entre anos)
+    def linhas_por_ano(self, linhas, anos):
+
+        rng = np.random.default_rng([self.semente, 0])
+        pesos = np.linspace(0.8, 1.2, len(anos)) * rng.uniform(0.7, 1.3, len(anos))
+        quantidades = np.floor(linhas * pesos / pesos.sum()).astype(np.int64)
+        quantidades[-1] += linhas - quantidades.sum()
+
+        return dict(zip(anos, quantidades.tolist()))
+
+    # Função que gera e grava os focos no armazenamento Parquet (um ano de cada vez). Retorna os arquivos.
+    def gravar(self, linhas, diretorio, anos=range(ANO_INICIAL, ANO_FINAL + 1)):
+
+        arquivos = []
+        for ano, quantidade in self.linhas_por_ano(linhas, list(anos)).items():
+            arquivos.append(salvar_particao(self.gerar_ano(ano, quantidade), ano, diretorio))
+
+        return arquivos
+
+
+# ==============================================================================================================#
+#                                                  CHIRPS
+# ==============================================================================================================#
+# Função que grava "dias" dias de precipitação sintética (distribuição gama, NaN fora de uma máscara fixa) num
+# cache do CHIRPS (app_chirps/cache_chirps.CacheChirps), terminando em "fim"
+def gravar_chirps(cache, dias, fim=datetime.date(2023, 12, 31), semente=0):
+
+    rng = np.random.default_rng(semente)
+    fora = rng.random((cache.ny, cache.nx)) < 0.4
+
+    inicio = fim - datetime.timedelta(days=dias - 1)
+    dia = inicio
+    while dia <= fim:
+        ultimo = min(fim, datetime.date(dia.year, 12, 31))
+        grades = rng.gamma(0.5, 8.0, ((ultimo - dia).days + 1, cache.ny, cache.nx)).astype(np.float32)
+        grades[:, fora] = np.nan
+        cache.gravar(dia, grades)
+        dia = ultimo + datetime.timedelta(days=1)
+
+    return inicio, fim
+
+
+class ClienteEEFalso:
+    # Cliente do Earth Engine sem rede: os objetos são nós de um grafo (como no cliente verdadeiro) e
+    # getInfo() devolve uma resposta montada a partir das datas filtradas. "ultimo_dia" é o último dia com dados.
+
+    def __init__(self, ultimo_dia=datetime.date(2023, 12, 31)):
+        self.ultimo_dia = ultimo_dia
+        self.chamadas = 0
+        self.Reducer = _No(self, 'Reducer')
+        self.Filter = _No(self, 'Filter')
+        self.data = types.SimpleNamespace(computePixels=self.calcular_pixels)
+
+    def ImageCollection(self, nome):
+        return _No(self, 'ImageCollection', nome)
+
+    def FeatureCollection(self, nome):
+        return _No(self, 'FeatureCollection', nome)
+
+    def Image(self, *argumentos):
+        return _No(self, 'Image', *argumentos)
+
+    def Feature(self, *argumentos):
+        return _No(self, 'Feature', *argumentos)
+
+    # resposta de dia_mais_recente (o dia mais recente da janela filtrada e estatísticas fixas) ou, para size(),
+    # o número de dias da coleção filtrada
+    def responder(self, no):
+
+        self.chamadas += 1
+        filtro = no.procurar('filterDate')
+        if filtro is None:
+            return None
+
+        dias = self._dias(filtro)
+        if no.operacao == 'size':
+            return len(dias)
+        if not dias:
+            return {'features': []}
+
+        return {'features': [{'properties': {'data': dias[-1].isoformat(), 'precipitation_mean': 2.5,
+                                             'precipitation_max': 80.0}}]}
+
+    # resposta de data.computePixels: uma banda "AAAAMMDD_precipitation" (linha 0 ao norte) por dia da coleção
+    # filtrada, com o dia do mês como precipitação e VALOR_AUSENTE (fora do Brasil) na primeira coluna
+    def calcular_pixels(self, pedido):
+
+        self.chamadas += 1
+        dias = self._dias(pedido['expression'].procurar('filterDate'))
+        dimensoes = pedido['grid']['dimensions']
+
+        pixels = np.zeros((dimensoes['height'], dimensoes['width']),
+                          dtype=[(f'{dia:%Y%m%d}_precipitation', np.float32) for dia in dias])
+        for dia, banda in zip(dias, pixels.dtype.names):
+            pixels[banda] = dia.day
+            pixels[banda][:, 0] = -9999.0
+
+        return pixels
+
+    # dias com dados de um filterDate (fim exclusivo)
+    def _dias(self, filtro):
+
+        inicio = datetime.date.fromisoformat(filtro.argumentos[0])
+        fim = min(datetime.date.fromisoformat(filtro.argumentos[1]) - datetime.timedelta(days=1), self.ultimo_dia)
+
+        return [inicio + datetime.timedelta(days=i) for i in range((fim - inicio).days + 1)]
+
+
+class _No:
+
+    def __init__(self, cliente, operacao, *argumentos, origem=None):
+        self.cliente = cliente
+        self.operacao = operacao
+        self.argumentos = argumentos
+        self.origem = origem
+
+    def __getattr__(self, nome):
+
+        if nome.startswith('__'):
+            raise AttributeError(nome)
+
+        def metodo(*argumentos, **opcoes):
+            # funções passadas ao map() são aplicadas a um nó de exemplo, como faz o cliente verdadeiro
+            for argumento in argumentos:
+                if callable(argumento) and not isinstance(argumento, _No):
+                    argumento(_No(self.cliente, 'Image'))
+            return _No(self.cliente, nome, *argumentos, origem=self)
+
+        return metodo
+
+    def procurar(self, operacao):
+
+        no = self
+        while no is not None and no.operacao != operacao:
+            no = no.origem
+
+        return no
+
+    def getInfo(self):
+        return self.cliente.responder(self)
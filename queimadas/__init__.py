@@ -0,0 +1,3 @@
+# ==============================================================================================================#
+#                          PACOTE DE DADOS DOS FOCOS DE CALOR (INPE) USADO PELOS APPS
+# ==============================================================================================================#
@@ -0,0 +1,229 @@
+# ==============================================================================================================#
+#                              API HTTP/JSON ASSÍNCRONA DAS CONSULTAS DE FOCOS
+# ==============================================================================================================#
+# Servidor leve (somente biblioteca padrão, asyncio) sobre o ServicoFocos, para clientes em lote sem sessão do
+# navegador. As agregações rodam num pool de threads para não travar o laço de eventos e as respostas JSON
+# ficam num cache LRU próprio (além do cache de resultados do serviço). Conexões HTTP/1.1 são mantidas
+# abertas entre requisições.
+#
+# Rotas (GET):
+#
+#   /estados
+#   /consulta/<granularidade>?estado=PARÁ&inicio=2020-01-01&fim=2020-12-31[&n=5][&zoom=6][&bioma=Cerrado]
+#                             [&satelite=todos]
+#       granularidade: diaria, mensal, anual, climatologia, municipios, biomas, mapa, eventos, satelites
+#   /metricas
+#
+# Uso pela linha de comando:
+#
+#   python -m queimadas.api --porta 8000
+# ==============================================================================================================#
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from queimadas.cache import CacheLRU
+from queimadas.instrumentacao import metricas
+from queimadas.servico import GRANULARIDADES, GRANULARIDADES_SATELITE, ServicoFocos
+
+logger = logging.getLogger(__name__)
+
+TAMANHO_MAXIMO_CABECALHO = 64 * 1024
+
+
+class ErroRequisicao(Exception):
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# Função que converte o resultado de uma consulta em estruturas serializáveis em JSON
+def para_json(resultado):
+
+    if isinstance(resultado, pd.DataFrame):
+        if isinstance(resultado.index, pd.DatetimeIndex):
+            resultado = resultado.reset_index()
+        datas = resultado.select_dtypes('datetime').columns
+        resultado = resultado.assign(**{coluna: resultado[coluna].dt.strftime('%Y-%m-%d') for coluna in datas})
+        return resultado.to_dict(orient='records')
+
+    if isinstance(resultado, pd.Series):
+        indice = resultado.index
+        if isinstance(indice, pd.DatetimeIndex):
+            chaves = indice.strftime('%Y-%m-%d').tolist()
+        else:
+            chaves = [str(chave) for chave in indice]
+        valores = [None if pd.isna(valor) else valor.item() if isinstance(valor, np.generic) else valor
+                   for valor in resultado.to_numpy()]
+        return [{'chave': chave, 'focos': valor} for chave, valor in zip(chaves, valores)]
+
+    return resultado
+
+
+class ServidorAPI:
+
+    def __init__(self, servico=None, cache_respostas=None, max_trabalhos=None):
+        self.servico = ServicoFocos() if servico is None else servico
+        self.cache_respostas = CacheLRU(nome='respostas') if cache_respostas is None else cache_respostas
+        self._executor = ThreadPoolExecutor(max_workers=max_trabalhos, thread_name_prefix='api-focos')
+
+    # Função que resolve uma rota e retorna o corpo da resposta (bytes JSON). Roda no pool de threads.
+    def responder(self, caminho, parametros):
+
+        partes = [parte for parte in caminho.split('/') if parte]
+
+        if partes == ['estados']:
+            return _json(self.servico.estados())
+
+        if partes == ['metricas']:
+            return _json({'caches': [self.servico.cache.metricas(), self.cache_respostas.metricas()],
+                          'instrumentacao': metricas()})
+
+        if len(partes) == 2 and partes[0] == 'consulta':
+            granularidade = partes[1]
+            if granularidade not in GRANULARIDADES:
+                raise ErroRequisicao(HTTPStatus.NOT_FOUND, f'Granularidade desconhecida: {granularidade}')
+
+            chave = (granularidade,) + tuple(sorted((nome, valor[-1]) for nome, valor in parametros.items()))
+            return self.cache_respostas.obter_ou_calcular(chave, lambda: self._consultar(granularidade,
+                                                                                          parametros))
+
+        raise ErroRequisicao(HTTPStatus.NOT_FOUND, f'Rota desconhecida: {caminho}')
+
+    def _consultar(self, granularidade, parametros):
+
+        def parametro(nome, tipo=str, padrao=None):
+            if nome not in parametros:
+                return padrao
+            try:
+                return tipo(parametros[nome][-1])
+            except ValueError:
+                raise ErroRequisicao(HTTPStatus.BAD_REQUEST, f'Parâmetro inválido: {nome}')
+
+        estado = parametro('estado')
+        inicio = parametro('inicio', pd.Timestamp)
+        fim = parametro('fim', pd.Timestamp)
+
+        # quantidade de itens dos rankings e dos eventos (fatias com n <= 0 voltariam vazias ou sem os últimos)
+        n = parametro('n', int)
+        if n is not None and n < 1:
+            raise ErroRequisicao(HTTPStatus.BAD_REQUEST, 'Parâmetro inválido: n (precisa ser maior que zero)')
+
+        extras = ()
+        if granularidade == 'mapa' and 'zoom' in parametros:
+            extras = (parametro('zoom', int),)
+        if granularidade == 'eventos' and 'bioma' in parametros:
+            extras = (parametro('bioma'),)
+        if granularidade in GRANULARIDADES_SATELITE and 'satelite' in parametros:
+            extras = (parametro('satelite'),)
+        resultado = self.servico.consultar(granularidade, estado, inicio, fim, *extras)
+
+        if granularidade in ('municipios', 'biomas'):
+            resultado = resultado[:5 if n is None else n]
+        if granularidade == 'eventos' and n is not None:
+            resultado = resultado.nlargest(n, 'focos')
+
+        return _json({'granularidade': granularidade, 'estado': estado,
+                      'inicio': None if inicio is None else inicio.date().isoformat(),
+                      'fim': None if fim is None else fim.date().isoformat(),
+                      'dados': para_json(resultado)})
+
+    # Função que atende uma conexão (várias requisições se o cliente mantiver a conexão aberta)
+    async def tratar_conexao(self, leitor, escritor):
+
+        laco = asyncio.get_running_loop()
+
+        try:
+            while True:
+                try:
+                    linha = await leitor.readline()
+                    if not linha:
+                        break
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                    cabecalhos = await _ler_cabecalhos(leitor)
+                except (ValueError, asyncio.LimitOverrunError):
+                    await _escrever(escritor, HTTPStatus.BAD_REQUEST, _erro('Requisição inválida'), False)
+                    break
+
+                manter = versao == 'HTTP/1.1' and cabecalhos.get('connection', '').lower() != 'close'
+
+                if metodo != 'GET':
+                    status, corpo = HTTPStatus.METHOD_NOT_ALLOWED, _erro('Somente GET')
+                else:
+                    url = urlsplit(alvo)
+                    try:
+                        corpo = await laco.run_in_executor(self._executor, self.responder, unquote(url.path),
+                                                           parse_qs(url.query))
+                        status = HTTPStatus.OK
+                    except ErroRequisicao as erro:
+                        status, corpo = erro.status, _erro(str(erro))
+                    except ValueError as erro:
+                        status, corpo = HTTPStatus.BAD_REQUEST, _erro(str(erro))
+                    except Exception:
+                        logger.exception('Erro ao responder %s', alvo)
+                        status, corpo = HTTPStatus.INTERNAL_SERVER_ERROR, _erro('Erro interno')
+
+                await _escrever(escritor, status, corpo, manter)
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host='127.0.0.1', porta=8000):
+
+        servidor = await asyncio.start_server(self.tratar_conexao, host, porta, limit=TAMANHO_MAXIMO_CABECALHO)
+        logger.info('API de focos em http://%s:%d', host, porta)
+
+        async with servidor:
+            await servidor.serve_forever()
+
+
+async def _ler_cabecalhos(leitor):
+
+    cabecalhos = {}
+    while True:
+        linha = await leitor.readline()
+        if linha in (b'\r\n', b'\n', b''):
+            return cabecalhos
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+
+
+async def _escrever(escritor, status, corpo, manter):
+
+    cabecalho = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+                 'Content-Type: application/json; charset=utf-8\r\n'
+                 f'Content-Length: {len(corpo)}\r\n'
+                 f'Connection: {"keep-alive" if manter else "close"}\r\n\r\n')
+    escritor.write(cabecalho.encode('latin-1') + corpo)
+    await escritor.drain()
+
+
+def _json(objeto):
+    return json.dumps(objeto, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _erro(mensagem):
+    return _json({'erro': mensagem})
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='API HTTP/JSON das consultas de focos de calor')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--trabalhos', type=int, default=None, help='threads para as agregações')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(ServidorAPI(max_trabalhos=args.trabalhos).servir(args.host, args.porta))
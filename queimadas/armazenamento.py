@@ -0,0 +1,252 @@
+# ==============================================================================================================#
+#                     ARMAZENAMENTO COLUNAR DOS FOCOS DE CALOR (PARQUET PARTICIONADO POR ANO)
+# ==============================================================================================================#
+# Estrutura em disco:
+#
+#   dados/focos/ano=2003/focos.parquet
+#   dados/focos/ano=2004/focos.parquet
+#   ...
+#
+# Cada partição guarda a data como timestamp (int64), lat/lon em float32 e municipio/estado/bioma codificados
+# por dicionário. A leitura carrega somente as colunas e os anos pedidos. Quando o armazenamento não existe,
+# os CSVs compactados antigos (dados/lat.csv, lon.csv, ...) são usados como alternativa.
+#
+# Uso pela linha de comando (converte os CSVs antigos para o novo formato):
+#
+#   python -m queimadas.armazenamento
+# ==============================================================================================================#
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DIRETORIO_DADOS = 'dados'
+DIRETORIO_FOCOS = os.path.join(DIRETORIO_DADOS, 'focos')
+ARQUIVO_PARTICAO = 'focos.parquet'
+
+# colunas disponíveis além da data (que vira o índice do dataframe)
+COLUNAS = ['lat', 'lon', 'municipio', 'estado', 'bioma']
+COLUNAS_CATEGORICAS = ['municipio', 'estado', 'bioma']
+
+ESQUEMA = pa.schema([('data', pa.timestamp('ns')),
+                     ('lat', pa.float32()),
+                     ('lon', pa.float32()),
+                     ('municipio', pa.dictionary(pa.int32(), pa.string())),
+                     ('estado', pa.dictionary(pa.int32(), pa.string())),
+                     ('bioma', pa.dictionary(pa.int32(), pa.string()))])
+
+# arquivos CSV antigos (zip) e a coluna que cada um contém. O "lat.csv" também traz a coluna "data".
+ARQUIVOS_CSV = {'lat': 'lat.csv',
+                'lon': 'lon.csv',
+                'municipio': 'municipios.csv',
+                'estado': 'estados.csv',
+                'bioma': 'biomas.csv'}
+
+# lat/lon foram salvas nos CSVs multiplicadas por 10.000 e como inteiro
+ESCALA_CSV = 10000.
+
+
+# ==============================================================================================================#
+#                                                 ESCRITA
+# ==============================================================================================================#
+# Função que padroniza os tipos de um dataframe de focos com as colunas "data", "lat", "lon", "municipio",
+# "estado" e "bioma" (a data pode estar na coluna ou no índice)
+def normalizar_focos(df):
+
+    if 'data' not in df.columns:
+        df = df.reset_index()
+
+    df = pd.DataFrame({'data': pd.to_datetime(df['data']).astype('datetime64[ns]'),
+                       'lat': df['lat'].astype(np.float32),
+                       'lon': df['lon'].astype(np.float32),
+                       'municipio': df['municipio'].astype('category'),
+                       'estado': df['estado'].astype('category'),
+                       'bioma': df['bioma'].astype('category')})
+
+    # coloca em ordem crescente de data
+    return df.sort_values('data', kind='stable', ignore_index=True)
+
+
+# Função que grava um ano de dados (já normalizado) como uma partição "ano=AAAA" do diretório
+def salvar_particao(df, ano, diretorio=DIRETORIO_FOCOS, esquema=ESQUEMA, nome_arquivo=ARQUIVO_PARTICAO):
+
+    pasta = os.path.join(diretorio, f'ano={int(ano)}')
+    os.makedirs(pasta, exist_ok=True)
+
+    tabela = pa.Table.from_pandas(df[esquema.names], schema=esquema, preserve_index=False)
+
+    # escreve num arquivo temporário e troca no final: quem está lendo nunca vê uma partição pela metade
+    arquivo = os.path.join(pasta, nome_arquivo)
+    pq.write_table(tabela, arquivo + '.tmp', compression='zstd')
+    os.replace(arquivo + '.tmp', arquivo)
+
+    return arquivo
+
+
+# Função que grava o dataframe de focos no armazenamento, uma partição por ano
+def salvar_focos(df, diretorio=DIRETORIO_FOCOS):
+
+    df = normalizar_focos(df)
+
+    arquivos = []
+    for ano, df_ano in df.groupby(df['data'].dt.year, sort=True):
+        arquivos.append(salvar_particao(df_ano, ano, diretorio))
+
+    return arquivos
+
+
+# ==============================================================================================================#
+#                                                 LEITURA
+# ==============================================================================================================#
+# Função que informa se o armazenamento colunar já foi gerado
+def existe_armazenamento(diretorio=DIRETORIO_FOCOS):
+    return bool(anos_disponiveis(diretorio))
+
+
+# Função que lista os anos (partições) presentes no diretório
+def anos_disponiveis(diretorio=DIRETORIO_FOCOS, nome_arquivo=ARQUIVO_PARTICAO):
+
+    if not os.path.isdir(diretorio):
+        return []
+
+    anos = []
+    for nome in os.listdir(diretorio):
+        if nome.startswith('ano=') and os.path.isfile(os.path.join(diretorio, nome, nome_arquivo)):
+            anos.append(int(nome[4:]))
+
+    return sorted(anos)
+
+
+# Função que carrega os focos com apenas as colunas e os anos pedidos. Retorna o dataframe com a "data" como
+# índice em ordem crescente. Se o armazenamento não existir, lê os CSVs antigos.
+def carregar_focos(colunas=None, anos=None, diretorio=DIRETORIO_FOCOS):
+
+    colunas = list(COLUNAS if colunas is None else colunas)
+
+    if not existe_armazenamento(diretorio):
+        df = carregar_focos_csv(colunas)
+        if anos is not None:
+            df = df[df.index.year.isin(list(anos))]
+        return df
+
+    df = ler_particoes(diretorio, ['data'] + colunas, anos)
+
+    if df is None:
+        return _dataframe_vazio(colunas)
+
+    # seta a coluna data como o index do dataframe
+    df.set_index('data', inplace=True)
+
+    if not df.index.is_monotonic_increasing:
+        df.sort_index(kind='stable', inplace=True)
+
+    return df
+
+
+# Função que lê as partições "ano=AAAA" pedidas de um diretório, apenas com as colunas pedidas. As partições
+# são lidas em ordem de ano. Retorna None se nenhuma partição foi encontrada.
+def ler_particoes(diretorio, colunas, anos=None, esquema=ESQUEMA, nome_arquivo=ARQUIVO_PARTICAO):
+
+    arquivos = [os.path.join(diretorio, f'ano={ano}', nome_arquivo)
+                for ano in anos_disponiveis(diretorio, nome_arquivo) if anos is None or ano in anos]
+
+    if not arquivos:
+        return None
+
+    dataset = ds.dataset(arquivos, schema=esquema, format='parquet')
+    return dataset.to_table(columns=colunas).to_pandas()
+
+
+# Função que percorre os focos em lotes (pyarrow.RecordBatch) com o filtro de estado e datas (inclusivas)
+# aplicado na leitura, sem montar o dataframe inteiro na memória
+def varrer_focos(colunas=None, estado=None, data_inicial=None, data_final=None, diretorio=DIRETORIO_FOCOS,
+                 tamanho_lote=256 * 1024):
+
+    colunas = ['data'] + list(COLUNAS if colunas is None else colunas)
+    inicio = None if data_inicial is None else pd.Timestamp(data_inicial)
+    fim = None if data_final is None else pd.Timestamp(data_final) + pd.Timedelta(days=1)
+
+    # se o armazenamento não existe, filtra o dataframe lido dos CSVs
+    if not existe_armazenamento(diretorio):
+        df = carregar_focos_csv(colunas[1:] + (['estado'] if estado is not None and 'estado' not in colunas else []))
+        if estado is not None:
+            df = df[df['estado'] == estado]
+        if inicio is not None:
+            df = df[df.index >= inicio]
+        if fim is not None:
+            df = df[df.index < fim]
+        yield from pa.Table.from_pandas(df.reset_index()[colunas], preserve_index=False).to_batches(tamanho_lote)
+        return
+
+    # só as partições dos anos do intervalo
+    anos = [ano for ano in anos_disponiveis(diretorio)
+            if (inicio is None or ano >= inicio.year) and (fim is None or ano <= fim.year)]
+    if not anos:
+        return
+
+    filtro = None
+    condicoes = []
+    if estado is not None:
+        condicoes.append(ds.field('estado') == estado)
+    if inicio is not None:
+        condicoes.append(ds.field('data') >= pa.scalar(inicio.to_pydatetime(), pa.timestamp('ns')))
+    if fim is not None:
+        condicoes.append(ds.field('data') < pa.scalar(fim.to_pydatetime(), pa.timestamp('ns')))
+    for condicao in condicoes:
+        filtro = condicao if filtro is None else filtro & condicao
+
+    arquivos = [os.path.join(diretorio, f'ano={ano}', ARQUIVO_PARTICAO) for ano in anos]
+    dataset = ds.dataset(arquivos, schema=ESQUEMA, format='parquet')
+
+    yield from dataset.to_batches(columns=colunas, filter=filtro, batch_size=tamanho_lote)
+
+
+# Função que carrega os focos a partir dos CSVs compactados antigos (caminho alternativo)
+def carregar_focos_csv(colunas=None, diretorio=DIRETORIO_DADOS):
+
+    colunas = list(COLUNAS if colunas is None else colunas)
+
+    # o "lat.csv" traz a data, então ele sempre é lido
+    usecols = ['data', 'lat'] if 'lat' in colunas else ['data']
+    partes = [pd.read_csv(os.path.join(diretorio, ARQUIVOS_CSV['lat']), compression='zip', usecols=usecols)]
+
+    for coluna in colunas:
+        if coluna == 'lat':
+            continue
+        dtype = 'category' if coluna in COLUNAS_CATEGORICAS else None
+        partes.append(pd.read_csv(os.path.join(diretorio, ARQUIVOS_CSV[coluna]), compression='zip',
+                                  usecols=[coluna], dtype=dtype))
+
+    # junta
+    df = pd.concat(partes, axis=1)
+
+    # volta lat/lon para graus
+    for coluna in ['lat', 'lon']:
+        if coluna in df.columns:
+            df[coluna] = (df[coluna] / ESCALA_CSV).astype(np.float32)
+
+    # insere a coluna data como DateTime no DataFrame
+    df['data'] = pd.to_datetime(df['data'])
+
+    # seta a coluna data com o index do dataframe e coloca em ordem crescente de data
+    df.set_index('data', inplace=True)
+    df.sort_index(kind='stable', inplace=True)
+
+    return df[colunas]
+
+
+# Função que monta um dataframe vazio com os tipos do armazenamento
+def _dataframe_vazio(colunas):
+    return ESQUEMA.empty_table().to_pandas().set_index('data')[colunas]
+
+
+# Função que converte os CSVs antigos para o armazenamento colunar
+def converter_csv(diretorio_csv=DIRETORIO_DADOS, diretorio=DIRETORIO_FOCOS):
+    return salvar_focos(carregar_focos_csv(COLUNAS, diretorio_csv), diretorio)
+
+
+if __name__ == '__main__':
+    for arquivo in converter_csv():
+        print('Partição gravada ===>>>', arquivo)
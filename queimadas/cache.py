@@ -0,0 +1,164 @@
+# ==============================================================================================================#
+#                       CACHE LRU LIMITADO (ITENS E BYTES) COMPARTILHADO ENTRE AS SESSÕES
+# ==============================================================================================================#
+# Guarda os resultados das consultas (estado, intervalo de datas, granularidade) num único objeto do processo,
+# compartilhado por todas as sessões do app. Os resultados são devolvidos sem cópia e devem ser tratados como
+# somente leitura. Quando o limite de itens ou de bytes é ultrapassado, os itens usados há mais tempo são
+# removidos. Acertos, falhas e remoções ficam disponíveis em "metricas()" para monitoramento.
+# ==============================================================================================================#
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from queimadas.instrumentacao import contar
+
+logger = logging.getLogger(__name__)
+
+# limites padrão (podem ser alterados por variáveis de ambiente)
+MAX_ITENS = int(os.environ.get('QUEIMADAS_CACHE_ITENS', 512))
+MAX_BYTES = int(float(os.environ.get('QUEIMADAS_CACHE_MB', 256)) * 1024 ** 2)
+
+# as métricas vão para o log (INFO) a cada "INTERVALO_LOG" consultas
+INTERVALO_LOG = int(os.environ.get('QUEIMADAS_CACHE_INTERVALO_LOG', 1000))
+
+
+# Função que estima quantos bytes um resultado ocupa na memória
+def tamanho_objeto(objeto):
+
+    if isinstance(objeto, (pd.DataFrame, pd.Series, pd.Index)):
+        tamanho = objeto.memory_usage(index=True, deep=True)
+        return int(tamanho.sum() if isinstance(objeto, pd.DataFrame) else tamanho)
+    if isinstance(objeto, np.ndarray):
+        return int(objeto.nbytes)
+    if isinstance(objeto, (bytes, bytearray, memoryview)):
+        return len(objeto)
+    if isinstance(objeto, (tuple, list)):
+        return sys.getsizeof(objeto) + sum(tamanho_objeto(item) for item in objeto)
+    if isinstance(objeto, dict):
+        return sys.getsizeof(objeto) + sum(tamanho_objeto(item) for item in objeto.values())
+
+    return sys.getsizeof(objeto)
+
+
+class CacheLRU:
+
+    def __init__(self, max_itens=MAX_ITENS, max_bytes=MAX_BYTES, nome='consultas', intervalo_log=INTERVALO_LOG):
+        self.max_itens = max_itens
+        self.max_bytes = max_bytes
+        self.nome = nome
+        self.intervalo_log = intervalo_log
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.RLock()
+        self._calculando = {}
+        self.acertos = self.falhas = self.remocoes = 0
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        return chave in self._itens
+
+    # Função que retorna o valor guardado (ou "padrao") e marca o item como usado recentemente
+    def obter(self, chave, padrao=None):
+
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self._contar(acerto=True)
+                return self._itens[chave][0]
+
+            self._contar(acerto=False)
+            return padrao
+
+    # Função que guarda um valor e remove os itens mais antigos se os limites forem ultrapassados
+    def guardar(self, chave, valor, tamanho=None):
+
+        tamanho = tamanho_objeto(valor) if tamanho is None else tamanho
+
+        with self._trava:
+            if chave in self._itens:
+                self._bytes -= self._itens.pop(chave)[1]
+
+            # um item maior que o cache inteiro não é guardado
+            if self.max_bytes is not None and tamanho > self.max_bytes:
+                return valor
+
+            self._itens[chave] = (valor, tamanho)
+            self._bytes += tamanho
+            self._remover_excesso()
+
+        return valor
+
+    # Função que retorna o valor da chave, calculando com "funcao()" se ele não estiver no cache. Sessões que
+    # pedem a mesma chave ao mesmo tempo esperam um único cálculo.
+    def obter_ou_calcular(self, chave, funcao):
+
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self._contar(acerto=True)
+                return self._itens[chave][0]
+
+            evento = self._calculando.get(chave)
+            dono = evento is None
+            if dono:
+                self._contar(acerto=False)
+                evento = self._calculando[chave] = threading.Event()
+
+        if not dono:
+            evento.wait()
+            return self.obter_ou_calcular(chave, funcao)
+
+        try:
+            return self.guardar(chave, funcao())
+        finally:
+            with self._trava:
+                self._calculando.pop(chave, None)
+            evento.set()
+
+    def _contar(self, acerto):
+
+        if acerto:
+            self.acertos += 1
+        else:
+            self.falhas += 1
+        contar(f'cache.{self.nome}.{"acertos" if acerto else "falhas"}')
+
+        if self.intervalo_log and (self.acertos + self.falhas) % self.intervalo_log == 0:
+            logger.info('cache %s: %s', self.nome, self.metricas())
+
+    def _remover_excesso(self):
+
+        while self._itens and ((self.max_itens is not None and len(self._itens) > self.max_itens) or
+                               (self.max_bytes is not None and self._bytes > self.max_bytes)):
+            chave, (_, tamanho) = self._itens.popitem(last=False)
+            self._bytes -= tamanho
+            self.remocoes += 1
+            logger.debug('cache %s: removido %r (%d bytes)', self.nome, chave, tamanho)
+
+    def limpar(self):
+
+        with self._trava:
+            self._itens.clear()
+            self._bytes = 0
+
+    # Função que retorna as métricas do cache
+    def metricas(self):
+
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {'cache': self.nome,
+                    'itens': len(self._itens),
+                    'bytes': self._bytes,
+                    'max_itens': self.max_itens,
+                    'max_bytes': self.max_bytes,
+                    'acertos': self.acertos,
+                    'falhas': self.falhas,
+                    'remocoes': self.remocoes,
+                    'taxa_acerto': self.acertos / consultas if consultas else 0.0}
@@ -0,0 +1,213 @@
+# ==============================================================================================================#
+#                  FOCOS DE CALOR EM COLUNAS BINÁRIAS MAPEADAS EM MEMÓRIA (COMPARTILHADAS ENTRE PROCESSOS)
+# ==============================================================================================================#
+# Cada coluna é um arquivo .npy sem compressão, aberto com memmap somente leitura. Todos os processos (réplicas
+# do Streamlit, API) que abrem os mesmos arquivos compartilham o cache de páginas do sistema operacional: a
+# memória de cada processo fica perto de zero e abrir o armazenamento é só um mmap, sem leitura nem conversão.
+#
+#   dados/colunas/ATUAL                      nome da versão em uso (trocado de forma atômica pela ingestão)
+#   dados/colunas/v<carimbo>/dia.npy         int32, dias desde 1970-01-01 (a hora do foco não é guardada)
+#   dados/colunas/v<carimbo>/lat.npy         float32
+#   dados/colunas/v<carimbo>/lon.npy         float32
+#   dados/colunas/v<carimbo>/estado.npy      int16, código na tabela "categorias" do meta.json (-1 = vazio)
+#   dados/colunas/v<carimbo>/municipio.npy   int16
+#   dados/colunas/v<carimbo>/bioma.npy       int16
+#   dados/colunas/v<carimbo>/meta.json       tabelas de códigos, blocos por estado e número de linhas
+#
+# As linhas são gravadas em ordem de (estado, dia): o filtro por estado e intervalo de datas é uma fatia
+# contígua das colunas, achada com duas buscas binárias (como em queimadas.consulta.IndiceFocos).
+#
+# Uso pela linha de comando (monta as colunas a partir do armazenamento Parquet):
+#
+#   python -m queimadas.colunas
+# ==============================================================================================================#
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from queimadas.armazenamento import (COLUNAS_CATEGORICAS, DIRETORIO_DADOS, DIRETORIO_FOCOS, carregar_focos,
+                                     normalizar_focos)
+
+DIRETORIO_COLUNAS = os.path.join(DIRETORIO_DADOS, 'colunas')
+ARQUIVO_ATUAL = 'ATUAL'
+
+TIPOS = {'dia': np.int32,
+         'lat': np.float32,
+         'lon': np.float32,
+         'estado': np.int16,
+         'municipio': np.int16,
+         'bioma': np.int16}
+
+UM_DIA = np.timedelta64(1, 'D')
+
+
+# ==============================================================================================================#
+#                                                 ESCRITA
+# ==============================================================================================================#
+# Função que grava os focos como uma nova versão das colunas e passa a apontar para ela. A versão anterior fica
+# no disco até a próxima gravação: um processo que leu ATUAL logo antes da troca ainda consegue abri-la, e os
+# serviços passam para a versão nova na consulta seguinte (ServicoFocos.verificar_dados). As mais antigas são
+# apagadas (processos que ainda as têm abertas continuam lendo os arquivos já mapeados).
+def salvar_colunas(df, diretorio=DIRETORIO_COLUNAS):
+
+    df = normalizar_focos(df)
+
+    categorias = {coluna: [str(valor) for valor in df[coluna].cat.categories] for coluna in COLUNAS_CATEGORICAS}
+    for coluna, valores in categorias.items():
+        if len(valores) > np.iinfo(np.int16).max:
+            raise ValueError(f'A coluna "{coluna}" tem {len(valores)} valores, acima do limite do int16')
+
+    # ordem (estado, dia); dentro do dia mantém a ordem original
+    dias = (df['data'].to_numpy().astype('datetime64[D]') - np.datetime64(0, 'D')) // UM_DIA
+    estados = df['estado'].cat.codes.to_numpy()
+    ordem = np.lexsort((dias, estados))
+
+    colunas = {'dia': dias[ordem],
+               'lat': df['lat'].to_numpy()[ordem],
+               'lon': df['lon'].to_numpy()[ordem]}
+    for coluna in COLUNAS_CATEGORICAS:
+        colunas[coluna] = df[coluna].cat.codes.to_numpy()[ordem]
+
+    # início e fim do bloco de cada estado
+    limites = np.searchsorted(colunas['estado'], np.arange(len(categorias['estado']) + 1))
+    blocos = {valor: [int(limites[i]), int(limites[i + 1])] for i, valor in enumerate(categorias['estado'])
+              if limites[i + 1] > limites[i]}
+
+    versao = f'v{time.time_ns()}'
+    pasta = os.path.join(diretorio, versao)
+    os.makedirs(pasta)
+
+    for nome, tipo in TIPOS.items():
+        np.save(os.path.join(pasta, nome + '.npy'), np.ascontiguousarray(colunas[nome], dtype=tipo))
+
+    with open(os.path.join(pasta, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'linhas': len(df), 'categorias': categorias, 'blocos': blocos}, f, ensure_ascii=False)
+
+    # troca a versão em uso de forma atômica
+    anterior = versao_atual(diretorio)
+    atual = os.path.join(diretorio, ARQUIVO_ATUAL)
+    with open(atual + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(versao)
+    os.replace(atual + '.tmp', atual)
+
+    for nome in os.listdir(diretorio):
+        if nome.startswith('v') and nome not in (versao, anterior) and os.path.isdir(os.path.join(diretorio, nome)):
+            shutil.rmtree(os.path.join(diretorio, nome), ignore_errors=True)
+
+    return pasta
+
+
+# Função que monta as colunas a partir do armazenamento Parquet dos focos
+def converter_focos(diretorio_focos=DIRETORIO_FOCOS, diretorio=DIRETORIO_COLUNAS):
+    return salvar_colunas(carregar_focos(diretorio=diretorio_focos), diretorio)
+
+
+# ==============================================================================================================#
+#                                                 LEITURA
+# ==============================================================================================================#
+# Função que informa se as colunas já foram geradas
+def existe_colunas(diretorio=DIRETORIO_COLUNAS):
+    return os.path.isfile(os.path.join(diretorio, ARQUIVO_ATUAL))
+
+
+# Função que retorna o nome da versão em uso das colunas (None se ainda não foram geradas)
+def versao_atual(diretorio=DIRETORIO_COLUNAS):
+
+    if not existe_colunas(diretorio):
+        return None
+
+    with open(os.path.join(diretorio, ARQUIVO_ATUAL), encoding='utf-8') as f:
+        return f.read().strip()
+
+
+class ColunasFocos:
+
+    # abre (memmap, somente leitura) a versão em uso das colunas
+    def __init__(self, diretorio=DIRETORIO_COLUNAS):
+
+        self.versao = versao_atual(diretorio)
+        if self.versao is None:
+            raise FileNotFoundError(f'As colunas ainda não foram geradas em {diretorio} (python -m queimadas.colunas)')
+        self.pasta = os.path.join(diretorio, self.versao)
+
+        with open(os.path.join(self.pasta, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        self.categorias = meta['categorias']
+        self._blocos = {valor: tuple(limites) for valor, limites in meta['blocos'].items()}
+        self.colunas = {nome: np.load(os.path.join(self.pasta, nome + '.npy'), mmap_mode='r') for nome in TIPOS}
+
+    # lista dos estados presentes, em ordem alfabética
+    @property
+    def estados(self):
+        return sorted(self._blocos)
+
+    def __len__(self):
+        return len(self.colunas['dia'])
+
+    # Função que filtra por estado, bioma ou município (opcionais) e intervalo de datas (inclusivo). Retorna um
+    # dataframe com a "data" como índice, como queimadas.consulta.IndiceFocos.filtrar.
+    def filtrar(self, estado=None, data_inicial=None, data_final=None, bioma=None, municipio=None):
+
+        inicio, fim = _limites_dia(data_inicial, data_final)
+        dia = self.colunas['dia']
+
+        if estado is not None:
+            a, b = self._blocos.get(estado, (0, 0))
+            a, b = a + np.searchsorted(dia[a:b], [inicio, fim])
+            posicoes = slice(a, b)
+        else:
+            # junta as fatias de todos os estados e coloca em ordem de data
+            fatias = []
+            for a, b in self._blocos.values():
+                a, b = a + np.searchsorted(dia[a:b], [inicio, fim])
+                fatias.append(np.arange(a, b))
+            posicoes = np.concatenate(fatias) if fatias else np.arange(0)
+            posicoes = posicoes[np.argsort(dia[posicoes], kind='stable')]
+
+        # bioma/município: máscara só sobre as linhas selecionadas
+        for coluna, valor in (('bioma', bioma), ('municipio', municipio)):
+            if valor is not None:
+                codigo = self._codigo(coluna, valor)
+                mascara = self.colunas[coluna][posicoes] == codigo
+                posicoes = np.arange(len(dia))[posicoes][mascara] if isinstance(posicoes, slice) \
+                    else posicoes[mascara]
+
+        return self._dataframe(posicoes)
+
+    # código de um valor numa coluna categórica (-2 se o valor não existe, para não casar com nenhuma linha)
+    def _codigo(self, coluna, valor):
+
+        valores = self.categorias[coluna]
+        return valores.index(valor) if valor in valores else -2
+
+    # Função que monta o dataframe das linhas pedidas (uma fatia das colunas não é copiada)
+    def _dataframe(self, posicoes):
+
+        datas = pd.DatetimeIndex((self.colunas['dia'][posicoes].astype('datetime64[D]')).astype('datetime64[ns]'),
+                                 name='data')
+
+        dados = {'lat': self.colunas['lat'][posicoes], 'lon': self.colunas['lon'][posicoes]}
+        for coluna in ('municipio', 'estado', 'bioma'):
+            dados[coluna] = pd.Categorical.from_codes(self.colunas[coluna][posicoes], self.categorias[coluna])
+
+        return pd.DataFrame(dados, index=datas, copy=False)
+
+
+# Função que converte o intervalo de datas (inclusivo) para [início, fim) em dias desde 1970-01-01
+def _limites_dia(data_inicial, data_final):
+
+    inicio = np.iinfo(np.int32).min if data_inicial is None else \
+        (np.datetime64(pd.Timestamp(data_inicial).date(), 'D') - np.datetime64(0, 'D')) // UM_DIA
+    fim = np.iinfo(np.int32).max if data_final is None else \
+        (np.datetime64(pd.Timestamp(data_final).date(), 'D') - np.datetime64(0, 'D')) // UM_DIA + 1
+
+    return inicio, fim
+
+
+if __name__ == '__main__':
+    print('Colunas gravadas ===>>>', converter_focos())
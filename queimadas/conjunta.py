@@ -0,0 +1,379 @@
+# ==============================================================================================================#
+#            ANÁLISE CONJUNTA: FOCOS DE CALOR x PRECIPITAÇÃO ANTECEDENTE (CHIRPS) NA MESMA GRADE REGULAR
+# ==============================================================================================================#
+# Os focos já são contados por mês numa grade regular (queimadas.grade, 0.25° sobre o Brasil) e o cache local do
+# CHIRPS (app_chirps/cache_chirps.py) guarda a precipitação diária na mesma grade. Aqui os dois são cruzados sem
+# o Earth Engine, só com os arquivos locais:
+#
+#   - chuva antecedente: para cada mês das grades de focos, o acumulado (mm) dos JANELAS dias anteriores ao dia
+#     1º do mês, por célula. Cada ano é lido do cache (CacheChirps.blocos, memmap) de uma vez, com os dias
+#     anteriores que as janelas precisam, e os acumulados de todos os meses e janelas saem de diferenças da soma
+#     acumulada no tempo (np.cumsum). As células com algum dia sem dado na janela ficam NaN;
+#   - regiões: cada célula pertence ao estado e ao bioma com mais focos dentro dela, então focos e chuva de um
+#     estado/bioma são somados/médios sobre as mesmas células;
+#   - correlações (Pearson) entre os focos do mês e a chuva antecedente: da série da região e de cada célula
+#     (todos os meses ou só um mês do calendário, entre os anos), calculadas sobre os arrays inteiros.
+#
+# Se o cache tiver uma grade mais fina, alinhada e com resolução submúltipla da grade dos focos, a chuva é
+# reamostrada pela média das células.
+#
+# Uso pela linha de comando (grava as regiões das células a partir do armazenamento de focos):
+#
+#   python -m queimadas.conjunta
+# ==============================================================================================================#
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+from app_chirps.cache_chirps import DIRETORIO_CACHE, CacheChirps
+from queimadas.armazenamento import carregar_focos
+from queimadas.grade import DIRETORIO_GRADE, GRADE_BRASIL, Grade, carregar_grades
+
+DIRETORIO_CHIRPS = DIRETORIO_CACHE
+ARQUIVO_REGIOES = os.path.join(DIRETORIO_GRADE, 'regioes.npz')
+
+# dias de chuva acumulados antes do início de cada mês
+JANELAS = (30, 60, 90)
+
+# meses mínimos para uma correlação
+MINIMO_MESES = 3
+
+
+# ==============================================================================================================#
+#                                          REGIÕES DAS CÉLULAS
+# ==============================================================================================================#
+class RegioesGrade:
+
+    # "estados"/"biomas" são os nomes e "codigo_estado"/"codigo_bioma" (ny x nx) o índice do nome de cada célula
+    # (-1 nas células sem focos)
+    def __init__(self, estados, codigo_estado, biomas, codigo_bioma, grade=GRADE_BRASIL):
+        self.estados = list(estados)
+        self.codigo_estado = codigo_estado
+        self.biomas = list(biomas)
+        self.codigo_bioma = codigo_bioma
+        self.grade = grade
+
+    # Função que retorna as células (bool, ny x nx) de um estado e/ou bioma (os dois None: a grade toda)
+    def mascara(self, estado=None, bioma=None):
+
+        mascara = np.ones((self.grade.ny, self.grade.nx), dtype=bool)
+        if estado is not None:
+            mascara &= self.codigo_estado == _codigo(self.estados, estado)
+        if bioma is not None:
+            mascara &= self.codigo_bioma == _codigo(self.biomas, bioma)
+
+        return mascara
+
+    # Função que grava as regiões (npz compactado)
+    def salvar(self, arquivo=ARQUIVO_REGIOES):
+
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+
+        # escreve num temporário e troca no final
+        with open(arquivo + '.tmp', 'wb') as f:
+            np.savez_compressed(f, estados=np.array(self.estados), codigo_estado=self.codigo_estado,
+                                biomas=np.array(self.biomas), codigo_bioma=self.codigo_bioma,
+                                grade=np.array(self.grade.parametros()))
+        os.replace(arquivo + '.tmp', arquivo)
+
+        return arquivo
+
+
+def _codigo(nomes, nome):
+
+    if nome not in nomes:
+        raise KeyError(f'Região sem células na grade: {nome}')
+
+    return nomes.index(nome)
+
+
+# Função que retorna, para cada célula, o índice da categoria com mais focos (-1 nas células sem focos)
+def _predominante(indices, categoria, grade):
+
+    categoria = pd.Categorical(categoria)
+    n = len(categoria.categories)
+    dentro = (indices >= 0) & (categoria.codes >= 0)
+
+    contagens = np.bincount(indices[dentro] * n + categoria.codes[dentro], minlength=grade.ny * grade.nx * n)
+    contagens = contagens.reshape(grade.ny * grade.nx, n)
+    codigo = np.where(contagens.any(axis=1), contagens.argmax(axis=1), -1).astype(np.int16)
+
+    return list(categoria.categories.astype(str)), codigo.reshape(grade.ny, grade.nx)
+
+
+# Função que monta as regiões das células a partir dos focos (colunas lat, lon, estado e bioma)
+def construir_regioes(df, grade=GRADE_BRASIL):
+
+    indices = grade.indices(df['lat'].to_numpy(), df['lon'].to_numpy())
+
+    estados, codigo_estado = _predominante(indices, df['estado'], grade)
+    biomas, codigo_bioma = _predominante(indices, df['bioma'], grade)
+
+    return RegioesGrade(estados, codigo_estado, biomas, codigo_bioma, grade)
+
+
+# Função que carrega as regiões gravadas. Se ainda não foram geradas, são montadas a partir dos focos.
+def carregar_regioes(arquivo=ARQUIVO_REGIOES):
+
+    if not os.path.isfile(arquivo):
+        return construir_regioes(carregar_focos(colunas=['lat', 'lon', 'estado', 'bioma']))
+
+    with np.load(arquivo) as dados:
+        return RegioesGrade(dados['estados'].tolist(), dados['codigo_estado'], dados['biomas'].tolist(),
+                            dados['codigo_bioma'], Grade(*dados['grade']))
+
+
+# ==============================================================================================================#
+#                                 CHUVA ANTECEDENTE (CACHE LOCAL DO CHIRPS)
+# ==============================================================================================================#
+# Função que abre o cache local do CHIRPS (FileNotFoundError se ele ainda não tem nenhum ano)
+def abrir_chirps(diretorio=DIRETORIO_CHIRPS):
+
+    cache = CacheChirps(diretorio)
+    if not cache.anos():
+        raise FileNotFoundError(f'Cache local do CHIRPS não encontrado: {diretorio}')
+
+    return cache
+
+
+# Função que retorna a grade gravada no cache do CHIRPS (FileNotFoundError se o cache não existe)
+def grade_chirps(diretorio=DIRETORIO_CHIRPS):
+    return _grade(abrir_chirps(diretorio))
+
+
+def _grade(cache):
+    return Grade(cache.grade['lat_min'], cache.grade['lat_max'], cache.grade['lon_min'], cache.grade['lon_max'],
+                 cache.grade['resolucao'])
+
+
+# Função que retorna o fator (células do cache por célula da grade) e o deslocamento (linha, coluna) da grade dos
+# focos dentro da grade do cache
+def _alinhamento(origem, grade):
+
+    fator = grade.resolucao / origem.resolucao
+    linha = (grade.lat_min - origem.lat_min) / origem.resolucao
+    coluna = (grade.lon_min - origem.lon_min) / origem.resolucao
+    valores = np.array([fator, linha, coluna])
+
+    if not np.allclose(valores, np.round(valores), atol=1e-6) or round(fator) < 1 or round(linha) < 0 \
+            or round(coluna) < 0 or round(linha + grade.ny * fator) > origem.ny \
+            or round(coluna + grade.nx * fator) > origem.nx:
+        raise ValueError(f'Grade do cache do CHIRPS ({origem}) incompatível com a grade dos focos ({grade})')
+
+    return int(round(fator)), int(round(linha)), int(round(coluna))
+
+
+# Função que reamostra grades diárias (dias x ny x nx) do cache para a grade dos focos: média das células
+# válidas do cache dentro de cada célula (NaN se nenhuma é válida)
+def _reamostrar(bloco, fator, linha, coluna, grade):
+
+    bloco = bloco[:, linha:linha + grade.ny * fator, coluna:coluna + grade.nx * fator]
+    if fator == 1:
+        return np.asarray(bloco, dtype=np.float32)
+
+    bloco = np.asarray(bloco, dtype=np.float32).reshape(len(bloco), grade.ny, fator, grade.nx, fator)
+    finitos = np.isfinite(bloco)
+    soma = np.where(finitos, bloco, 0).sum(axis=(2, 4), dtype=np.float64)
+    quantos = finitos.sum(axis=(2, 4))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(quantos > 0, soma / quantos, np.nan).astype(np.float32)
+
+
+# Função que lê do cache a chuva diária de [inicio, fim) na grade dos focos (dias x ny x nx, NaN nos dias fora do
+# cache e fora do Brasil)
+def ler_chuva(inicio, fim, diretorio=DIRETORIO_CHIRPS, grade=GRADE_BRASIL):
+
+    cache = abrir_chirps(diretorio)
+    fator, linha, coluna = _alinhamento(_grade(cache), grade)
+    chuva = np.full(((fim - inicio).days, grade.ny, grade.nx), np.nan, dtype=np.float32)
+
+    # blocos de dias de um mesmo ano, lidos do memmap só nos dias baixados
+    for primeiro, grades, preenchidos in cache.blocos(inicio, fim - datetime.timedelta(days=1)):
+        dias = np.flatnonzero(preenchidos)
+        if grades is None or not len(dias):
+            continue
+        chuva[dias + (primeiro - inicio).days] = _reamostrar(grades[dias], fator, linha, coluna, grade)
+
+    return chuva
+
+
+# Função que calcula a chuva antecedente (mm) de cada ano, mês e janela (anos x 12 x janelas x ny x nx): o
+# acumulado dos "janela" dias anteriores ao dia 1º do mês, NaN onde falta algum dia no cache
+def chuva_antecedente(anos, janelas=JANELAS, diretorio=DIRETORIO_CHIRPS, grade=GRADE_BRASIL):
+
+    janelas = np.asarray(janelas, dtype=np.int64)
+    resultado = np.full((len(anos), 12, len(janelas), grade.ny, grade.nx), np.nan, dtype=np.float32)
+
+    for posicao, ano in enumerate(anos):
+        inicio = datetime.date(int(ano), 1, 1) - datetime.timedelta(days=int(janelas.max()))
+        fim = datetime.date(int(ano), 12, 1)
+        chuva = ler_chuva(inicio, fim, diretorio, grade)
+
+        # anos sem nenhum dia no cache ficam NaN
+        finitos = np.isfinite(chuva)
+        if not finitos.any():
+            continue
+
+        # somas acumuladas no tempo (com um zero no início): o acumulado de [a, b) é soma[b] - soma[a]. Os dias
+        # sem dado somam zero e ficam de fora da contagem de dias válidos.
+        soma = _soma_acumulada(np.where(finitos, chuva, 0), np.float64)
+        validos = _soma_acumulada(finitos, np.int16)
+        del chuva, finitos
+
+        # dia 1º de cada mês (índice na chuva lida) e início de cada janela (meses x janelas)
+        fins = np.array([(datetime.date(int(ano), mes, 1) - inicio).days for mes in range(1, 13)])
+        inicios = fins[:, np.newaxis] - janelas[np.newaxis, :]
+
+        acumulado = soma[fins][:, np.newaxis] - soma[inicios]
+        completos = validos[fins][:, np.newaxis] - validos[inicios] == janelas[np.newaxis, :, np.newaxis, np.newaxis]
+        resultado[posicao] = np.where(completos, acumulado, np.nan)
+
+    return resultado
+
+
+# Função que retorna a soma acumulada no primeiro eixo (dias), com um zero no início
+def _soma_acumulada(valores, dtype):
+
+    soma = np.zeros((len(valores) + 1,) + valores.shape[1:], dtype=dtype)
+    np.cumsum(valores, axis=0, dtype=dtype, out=soma[1:])
+
+    return soma
+
+
+# ==============================================================================================================#
+#                                      FOCOS x CHUVA (SÉRIES E CORRELAÇÕES)
+# ==============================================================================================================#
+class AnaliseConjunta:
+
+    # "grades" são as grades mensais dos focos (queimadas.grade.GradesMensais), "chuva" a chuva antecedente
+    # (anos x 12 x janelas x ny x nx) dos mesmos anos e "regioes" as regiões das células, todos na mesma grade
+    def __init__(self, grades, chuva, regioes, janelas=JANELAS):
+
+        if grades.grade != regioes.grade or chuva.shape[-2:] != (grades.grade.ny, grades.grade.nx):
+            raise ValueError('Focos, chuva e regiões precisam estar na mesma grade')
+
+        self.grades = grades
+        self.chuva = chuva
+        self.regioes = regioes
+        self.janelas = list(janelas)
+
+    @property
+    def grade(self):
+        return self.grades.grade
+
+    # meses (datetime) das grades, na ordem dos arrays achatados (anos x 12)
+    @property
+    def meses(self):
+        return pd.date_range(f'{self.grades.anos[0]}-01-01', periods=len(self.grades.anos) * 12, freq='MS')
+
+    # Função que retorna a série mensal de uma região: focos (soma nas células) e chuva antecedente de cada janela
+    # (média nas células com dado, ponderada pelo cosseno da latitude). Só os meses com focos gravados.
+    def serie(self, estado=None, bioma=None):
+
+        mascara = self.regioes.mascara(estado, bioma)
+        pesos = np.cos(np.deg2rad(self.grade.lats))[:, np.newaxis] * mascara
+
+        focos = self.grades.contagens[..., mascara].sum(axis=-1, dtype=np.int64)
+
+        chuva = self.chuva[..., mascara]
+        finitos = np.isfinite(chuva)
+        numerador = (np.where(finitos, chuva, 0) * pesos[mascara]).sum(axis=-1, dtype=np.float64)
+        denominador = (finitos * pesos[mascara]).sum(axis=-1, dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = numerador / denominador
+
+        serie = pd.DataFrame({'focos': focos.ravel()}, index=pd.Index(self.meses, name='data'))
+        for k, janela in enumerate(self.janelas):
+            serie[f'chuva_{janela}d'] = media[:, :, k].ravel()
+
+        return serie[self.grades.meses_validos.ravel()]
+
+    # Função que retorna a correlação entre os focos e a chuva de cada janela na série da região (mes=None: todos
+    # os meses; 1 a 12: só esse mês, entre os anos) e o número de meses usados
+    def correlacoes(self, estado=None, bioma=None, mes=None):
+
+        serie = self.serie(estado, bioma)
+        if mes is not None:
+            serie = serie[serie.index.month == mes]
+
+        linhas = []
+        for janela in self.janelas:
+            pares = serie[['focos', f'chuva_{janela}d']].dropna()
+            correlacao = pares.corr().iloc[0, 1] if len(pares) >= MINIMO_MESES else np.nan
+            linhas.append({'janela': f'{janela} dias', 'correlacao': correlacao, 'meses': len(pares)})
+
+        return pd.DataFrame(linhas)
+
+    # Função que retorna o mapa (ny x nx) da correlação, em cada célula, entre os focos do mês e a chuva de uma
+    # janela (mes=None: todos os meses; 1 a 12: só esse mês, entre os anos). NaN fora da região, nas células sem
+    # variação e nas com menos de MINIMO_MESES meses.
+    def mapa_correlacao(self, janela, mes=None, estado=None, bioma=None):
+
+        selecao = self.grades.meses_validos.copy()
+        if mes is not None:
+            selecao[:, np.arange(12) != mes - 1] = False
+
+        x = self.grades.contagens[selecao].astype(np.float64)
+        y = self.chuva[:, :, self.janelas.index(janela)][selecao].astype(np.float64)
+
+        # só os meses com chuva em cada célula
+        validos = np.isfinite(y)
+        n = validos.sum(axis=0)
+        x = np.where(validos, x, 0)
+        y = np.where(validos, y, 0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dx = np.where(validos, x - x.sum(axis=0) / n, 0)
+            dy = np.where(validos, y - y.sum(axis=0) / n, 0)
+            correlacao = (dx * dy).sum(axis=0) / np.sqrt((dx * dx).sum(axis=0) * (dy * dy).sum(axis=0))
+
+        correlacao[(n < MINIMO_MESES) | ~self.regioes.mascara(estado, bioma)] = np.nan
+        return correlacao
+
+    # Função que retorna o mapa (ny x nx) da chuva antecedente de um mês e janela, só nas células da região
+    def mapa_chuva(self, ano, mes, janela, estado=None, bioma=None):
+
+        campo = self.chuva[self.grades._indice_ano(ano), mes - 1, self.janelas.index(janela)]
+        return np.where(self.regioes.mascara(estado, bioma), campo, np.nan)
+
+
+# Função que monta a análise conjunta a partir das grades de focos, das regiões e do cache local do CHIRPS
+def carregar_analise_conjunta(diretorio_chirps=DIRETORIO_CHIRPS, janelas=JANELAS):
+
+    grades = carregar_grades()
+    chuva = chuva_antecedente(grades.anos, janelas, diretorio_chirps, grades.grade)
+
+    return AnaliseConjunta(grades, chuva, carregar_regioes(), janelas)
+
+
+# ==============================================================================================================#
+#                                                 FIGURAS
+# ==============================================================================================================#
+# Função que monta o gráfico da série de uma região: focos em barras (eixo da esquerda) e chuva antecedente de
+# cada janela em linhas (eixo da direita)
+def figura_serie_conjunta(serie, titulo='', altura=400):
+
+    import plotly.graph_objects as go
+
+    datas = serie.index.strftime('%Y-%m-%d')
+    figura = go.Figure(go.Bar(x=datas, y=serie['focos'], name='Focos', marker_color='firebrick', opacity=0.6))
+
+    for coluna in serie.columns.drop('focos'):
+        figura.add_trace(go.Scatter(x=datas, y=serie[coluna], name=f'Chuva {coluna[6:-1]} dias antes',
+                                    mode='lines', yaxis='y2'))
+
+    figura.update_layout(title={'text': titulo, 'x': 0.5, 'xanchor': 'center', 'font_size': 20,
+                                'font_color': 'red'},
+                         height=altura, xaxis=dict(title='Mês', type='date'), yaxis=dict(title='Focos de Calor'),
+                         yaxis2=dict(title='Chuva antecedente (mm)', overlaying='y', side='right'),
+                         legend=dict(orientation='h', y=-0.2))
+
+    return figura
+
+
+if __name__ == '__main__':
+    focos = carregar_focos(colunas=['lat', 'lon', 'estado', 'bioma'])
+    print('Regiões gravadas ===>>>', construir_regioes(focos).salvar())
@@ -0,0 +1,115 @@
+# ==============================================================================================================#
+#                   ÍNDICE DE CONSULTA POR ESTADO/BIOMA/MUNICÍPIO E INTERVALO DE DATAS
+# ==============================================================================================================#
+# O dataframe (focos ou cubo) é reorganizado uma única vez em blocos contíguos por estado, cada bloco em ordem
+# crescente de data. Um filtro (estado, intervalo de datas) vira duas buscas binárias dentro do bloco do estado
+# e retorna uma fatia do dataframe, sem cópia e sem máscara booleana sobre todas as linhas.
+#
+# Para bioma e município são guardadas, por valor, as posições das linhas em ordem de data (formato CSR:
+# posições concatenadas + deslocamentos por código). O filtro também é feito com duas buscas binárias.
+# ==============================================================================================================#
+import numpy as np
+import pandas as pd
+
+UM_DIA = pd.Timedelta(days=1)
+
+
+class IndiceFocos:
+
+    # "df" precisa ter a data como índice ou na coluna "data". A entrada normalmente já vem em ordem de data
+    # (armazenamento e cubo são gravados assim); só é ordenada aqui se não estiver.
+    def __init__(self, df, dimensoes=('bioma', 'municipio')):
+
+        datas = _datas_ns(df)
+        if len(datas) and not (datas[1:] >= datas[:-1]).all():
+            ordem = np.argsort(datas, kind='stable')
+            df, datas = df.iloc[ordem], datas[ordem]
+
+        # blocos contíguos por estado (a ordenação estável preserva a ordem de data dentro de cada bloco)
+        codigos, valores = _codificar(df['estado'])
+        ordem = np.argsort(codigos, kind='stable')
+        self.df = df.iloc[ordem]
+        self._datas = datas[ordem]
+
+        limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+        self._blocos = {valor: (limites[i], limites[i + 1]) for i, valor in enumerate(valores)
+                        if limites[i + 1] > limites[i]}
+
+        # posição (no dataframe reorganizado) de cada linha em ordem de data
+        self._ordem_data = np.empty_like(ordem)
+        self._ordem_data[ordem] = np.arange(len(ordem))
+        self._datas_ordenadas = datas
+
+        # posições por bioma/município, em ordem de data
+        self._grupos = {}
+        for dimensao in dimensoes:
+            codigos, valores = _codificar(df[dimensao])
+            ordem_grupo = np.argsort(codigos, kind='stable')
+            limites = np.searchsorted(codigos[ordem_grupo], np.arange(len(valores) + 1))
+            self._grupos[dimensao] = (self._ordem_data[ordem_grupo], datas[ordem_grupo],
+                                      {valor: (limites[i], limites[i + 1]) for i, valor in enumerate(valores)
+                                       if limites[i + 1] > limites[i]})
+
+    # lista dos estados presentes, em ordem alfabética
+    @property
+    def estados(self):
+        return sorted(self._blocos)
+
+    def __len__(self):
+        return len(self.df)
+
+    # Função que filtra por estado, bioma ou município (opcionais) e intervalo de datas (inclusivo)
+    def filtrar(self, estado=None, data_inicial=None, data_final=None, bioma=None, municipio=None):
+
+        inicio, fim = _limites_ns(data_inicial, data_final)
+
+        if estado is not None:
+            a, b = self._blocos.get(estado, (0, 0))
+            a, b = a + np.searchsorted(self._datas[a:b], [inicio, fim])
+            resultado = self.df.iloc[a:b]
+
+            # bioma/município dentro de um estado: máscara só sobre a fatia
+            for coluna, valor in (('bioma', bioma), ('municipio', municipio)):
+                if valor is not None:
+                    resultado = resultado[(resultado[coluna] == valor).to_numpy()]
+
+            return resultado
+
+        for coluna, valor in (('bioma', bioma), ('municipio', municipio)):
+            if valor is not None:
+                posicoes, datas, blocos = self._grupos[coluna]
+                a, b = blocos.get(valor, (0, 0))
+                a, b = a + np.searchsorted(datas[a:b], [inicio, fim])
+                resultado = self.df.iloc[posicoes[a:b]]
+                if coluna == 'bioma' and municipio is not None:
+                    resultado = resultado[(resultado['municipio'] == municipio).to_numpy()]
+                return resultado
+
+        a, b = np.searchsorted(self._datas_ordenadas, [inicio, fim])
+        return self.df.iloc[self._ordem_data[a:b]]
+
+
+# Função que retorna as datas do dataframe (índice ou coluna "data") como inteiros em nanossegundos
+def _datas_ns(df):
+
+    datas = df['data'] if 'data' in df.columns else df.index
+    return np.asarray(pd.DatetimeIndex(datas).as_unit('ns').asi8)
+
+
+# Função que retorna os códigos inteiros e os valores de uma coluna (categórica ou não)
+def _codificar(coluna):
+
+    if isinstance(coluna.dtype, pd.CategoricalDtype):
+        return coluna.cat.codes.to_numpy(), list(coluna.cat.categories)
+
+    codigos, valores = pd.factorize(coluna, sort=True)
+    return codigos, list(valores)
+
+
+# Função que converte o intervalo de datas (inclusivo) para [início, fim) em nanossegundos
+def _limites_ns(data_inicial, data_final):
+
+    inicio = np.iinfo(np.int64).min if data_inicial is None else pd.Timestamp(data_inicial).as_unit('ns').value
+    fim = np.iinfo(np.int64).max if data_final is None else (pd.Timestamp(data_final) + UM_DIA).as_unit('ns').value
+
+    return inicio, fim
@@ -0,0 +1,130 @@
+# ==============================================================================================================#
+#                       CUBO DE CONTAGENS DIÁRIAS DE FOCOS POR (DATA, ESTADO, BIOMA, MUNICÍPIO)
+# ==============================================================================================================#
+# O cubo é gerado na ingestão e guarda uma linha por combinação de dia/estado/bioma/município com a quantidade
+# de focos. Os gráficos da "Série Temporal" (diário, mensal, anual, mensal médio e tops) são respondidos por
+# somas sobre o cubo, sem voltar às linhas individuais dos focos.
+#
+#   dados/cubo/ano=2003/cubo.parquet
+#   ...
+#
+# Uso pela linha de comando (gera o cubo a partir do armazenamento de focos):
+#
+#   python -m queimadas.cubo
+# ==============================================================================================================#
+import os
+import numpy as np
+import pyarrow as pa
+
+from queimadas.armazenamento import (DIRETORIO_DADOS, anos_disponiveis, carregar_focos, ler_particoes,
+                                     salvar_particao)
+
+DIRETORIO_CUBO = os.path.join(DIRETORIO_DADOS, 'cubo')
+ARQUIVO_CUBO = 'cubo.parquet'
+
+DIMENSOES = ['estado', 'bioma', 'municipio']
+
+ESQUEMA_CUBO = pa.schema([('data', pa.timestamp('ns')),
+                          ('estado', pa.dictionary(pa.int32(), pa.string())),
+                          ('bioma', pa.dictionary(pa.int32(), pa.string())),
+                          ('municipio', pa.dictionary(pa.int32(), pa.string())),
+                          ('focos', pa.int32())])
+
+MESES = np.array(['Jan', 'Fev', 'Mar', 'Abr', 'Mai', 'Jun', 'Jul', 'Ago', 'Set', 'Out', 'Nov', 'Dez'])
+
+
+# ==============================================================================================================#
+#                                          CONSTRUÇÃO E GRAVAÇÃO
+# ==============================================================================================================#
+# Função que monta o cubo a partir do dataframe de focos (índice "data" e colunas estado/bioma/municipio).
+# Focos sem bioma ou município (nulos) continuam no cubo, numa linha com a dimensão nula.
+def construir_cubo(df):
+
+    dia = df.index.floor('D').rename('data')
+
+    cubo = df.groupby([dia] + [df[coluna] for coluna in DIMENSOES], observed=True, dropna=False, sort=True).size()
+    cubo = cubo.rename('focos').astype(np.int32).reset_index()
+
+    for coluna in DIMENSOES:
+        cubo[coluna] = cubo[coluna].astype('category')
+
+    return cubo
+
+
+# Função que grava o cubo, uma partição por ano
+def salvar_cubo(cubo, diretorio=DIRETORIO_CUBO):
+
+    arquivos = []
+    for ano, cubo_ano in cubo.groupby(cubo['data'].dt.year, sort=True):
+        arquivos.append(salvar_particao(cubo_ano, ano, diretorio, ESQUEMA_CUBO, ARQUIVO_CUBO))
+
+    return arquivos
+
+
+# Função que carrega o cubo dos anos pedidos. Se ele ainda não foi gerado, é montado a partir dos focos.
+def carregar_cubo(anos=None, diretorio=DIRETORIO_CUBO):
+
+    cubo = ler_particoes(diretorio, ESQUEMA_CUBO.names, anos, ESQUEMA_CUBO, ARQUIVO_CUBO)
+
+    if cubo is None:
+        if anos_disponiveis(diretorio, ARQUIVO_CUBO):
+            return ESQUEMA_CUBO.empty_table().to_pandas()
+        return construir_cubo(carregar_focos(colunas=DIMENSOES, anos=anos))
+
+    return cubo
+
+
+# ==============================================================================================================#
+#                                    CONSULTAS (sobre o cubo já filtrado)
+# ==============================================================================================================#
+# Função que soma os focos por dia, com zero nos dias sem focos entre o primeiro e o último dia
+def serie_diaria(cubo):
+
+    diaria = cubo.groupby('data', sort=True)['focos'].sum()
+
+    if len(diaria):
+        diaria = diaria.asfreq('D', fill_value=0)
+
+    return diaria.rename('focos')
+
+
+# Função que soma os focos por mês (rótulo no primeiro dia do mês)
+def serie_mensal(cubo):
+    return serie_diaria(cubo).resample('MS').sum()
+
+
+# Função que soma os focos por ano (rótulo no primeiro dia do ano)
+def serie_anual(cubo):
+    return serie_diaria(cubo).resample('YS').sum()
+
+
+# Função que calcula a média dos totais mensais para cada mês do ano (Jan a Dez)
+def climatologia_mensal(mensal):
+
+    climatologia = mensal.groupby(mensal.index.month).mean().reindex(range(1, 13))
+    climatologia.index = MESES
+
+    return climatologia
+
+
+# Função que retorna os "n" municípios com mais focos (n=None retorna o ranking completo)
+def top_municipios(cubo, n=5):
+    return _top(cubo, 'municipio', n)
+
+
+# Função que retorna os "n" biomas com mais focos (n=None retorna o ranking completo)
+def top_biomas(cubo, n=5):
+    return _top(cubo, 'bioma', n)
+
+
+def _top(cubo, coluna, n):
+
+    contagem = cubo.groupby(coluna, observed=True)['focos'].sum()
+    contagem = contagem[contagem > 0].sort_values(ascending=False, kind='stable')
+
+    return contagem[:n].rename('count')
+
+
+if __name__ == '__main__':
+    for arquivo in salvar_cubo(construir_cubo(carregar_focos(colunas=DIMENSOES))):
+        print('Partição gravada ===>>>', arquivo)
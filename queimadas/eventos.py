@@ -0,0 +1,285 @@
+# ==============================================================================================================#
+#                    EVENTOS DE FOGO: FOCOS PRÓXIMOS NO ESPAÇO E EM DIAS SEGUIDOS AGRUPADOS
+# ==============================================================================================================#
+# Dois focos são do mesmo evento quando estão a até RAIO_KM um do outro e a até JANELA_DIAS dias de distância;
+# um evento é o fecho dessa relação (componente conexa: A perto de B e B perto de C juntam A, B e C).
+#
+# O agrupamento é vetorizado com numpy (sem laço por foco): os pares de focos próximos saem do hash espaço-tempo
+# de queimadas.vizinhos e são juntos por um union-find vetorizado (cada raiz aponta para a menor raiz ligada a
+# ela + compressão de caminho).
+#
+# Para cada evento: início, fim, duração em dias, focos, centróide, estado/bioma/município com mais focos e uma
+# aproximação da área queimada (células de 0,01° ~ 1 km, o pixel do MODIS, tocadas pelo evento).
+#
+#   dados/eventos/eventos.parquet
+#
+# Atualização incremental: quando chegam meses novos só os focos a partir de um "corte" são reagrupados. O corte
+# fica antes do primeiro mês alterado (menos a janela) e antes do início de qualquer evento que chega até ele,
+# então os eventos que terminam antes do corte não mudam e são mantidos como estão.
+#
+# Uso pela linha de comando (agrupa todos os focos do armazenamento):
+#
+#   python -m queimadas.eventos
+# ==============================================================================================================#
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from queimadas.armazenamento import DIRETORIO_DADOS, DIRETORIO_FOCOS, anos_disponiveis, carregar_focos
+from queimadas.vizinhos import KM_POR_GRAU, pares_proximos
+
+DIRETORIO_EVENTOS = os.path.join(DIRETORIO_DADOS, 'eventos')
+ARQUIVO_EVENTOS = 'eventos.parquet'
+
+# distância máxima (km) e intervalo máximo (dias) entre dois focos do mesmo evento
+RAIO_KM = 2.0
+JANELA_DIAS = 1
+
+# lado (graus) das células usadas na área aproximada dos eventos
+RESOLUCAO_AREA = 0.01
+
+COLUNAS_FOCOS = ['lat', 'lon', 'municipio', 'estado', 'bioma']
+DIMENSOES_EVENTOS = ('estado', 'bioma', 'municipio')
+COLUNAS_EVENTOS = ['inicio', 'fim', 'duracao_dias', 'focos', 'area_km2', 'lat', 'lon', 'estado', 'bioma', 'municipio']
+
+UM_DIA = pd.Timedelta(days=1)
+
+
+# ==============================================================================================================#
+#                                              AGRUPAMENTO
+# ==============================================================================================================#
+# Função que agrupa os focos em eventos. "dia" são dias inteiros (ex.: dias desde 1970-01-01), "lat" e "lon" em
+# graus. Retorna o rótulo do evento de cada foco (0, 1, 2... na ordem do primeiro foco de cada evento).
+def agrupar_eventos(dia, lat, lon, raio_km=RAIO_KM, janela_dias=JANELA_DIAS):
+
+    n = len(dia)
+    if not n:
+        return np.zeros(0, dtype=np.int64)
+
+    pai = np.arange(n)
+    for i, j in pares_proximos(dia, lat, lon, raio_km, janela_dias):
+        pai = _unir(pai, i, j)
+
+    return np.unique(_raizes(pai), return_inverse=True)[1]
+
+
+# Função que junta os conjuntos dos pares (i, j): cada raiz passa a apontar para a menor raiz ligada a ela, até
+# os pares terem a mesma raiz
+def _unir(pai, i, j):
+
+    while len(i):
+        pai = _raizes(pai)
+        a, b = pai[i], pai[j]
+        diferentes = a != b
+        if not diferentes.any():
+            break
+        a, b = a[diferentes], b[diferentes]
+        i, j = i[diferentes], j[diferentes]
+        np.minimum.at(pai, np.maximum(a, b), np.minimum(a, b))
+
+    return pai
+
+
+# Função que aponta cada elemento direto para a raiz (compressão de caminho por saltos de ponteiro)
+def _raizes(pai):
+
+    while True:
+        avo = pai[pai]
+        if np.array_equal(avo, pai):
+            return pai
+        pai = avo
+
+
+# ==============================================================================================================#
+#                                            TABELA DE EVENTOS
+# ==============================================================================================================#
+# Função que monta a tabela de eventos dos focos (índice de datas e colunas lat/lon/estado/bioma/municipio)
+def construir_eventos(focos, raio_km=RAIO_KM, janela_dias=JANELA_DIAS):
+
+    if not len(focos):
+        return _tabela_vazia()
+
+    dia = _dias(focos.index)
+    lat = focos['lat'].to_numpy(np.float64)
+    lon = focos['lon'].to_numpy(np.float64)
+    rotulos = agrupar_eventos(dia, lat, lon, raio_km, janela_dias)
+
+    return resumir_eventos(rotulos, dia, lat, lon, {dimensao: focos[dimensao] for dimensao in DIMENSOES_EVENTOS})
+
+
+# Função que resume os focos rotulados: uma linha por evento, com as colunas de COLUNAS_EVENTOS
+def resumir_eventos(rotulos, dia, lat, lon, dimensoes):
+
+    grupos = pd.DataFrame({'evento': rotulos, 'dia': dia, 'lat': lat, 'lon': lon}).groupby('evento', sort=True)
+    eventos = grupos.agg(primeiro=('dia', 'min'), ultimo=('dia', 'max'), focos=('dia', 'size'),
+                         lat=('lat', 'mean'), lon=('lon', 'mean'))
+    n = len(eventos)
+
+    # área aproximada: células distintas tocadas pelo evento x área de uma célula na latitude do evento
+    celulas = np.floor(lat / RESOLUCAO_AREA).astype(np.int64) * 100_000 + \
+        np.floor(lon / RESOLUCAO_AREA).astype(np.int64)
+    distintas = np.unique(np.stack([rotulos, celulas], axis=1), axis=0)[:, 0]
+    area_celula = (RESOLUCAO_AREA * KM_POR_GRAU) ** 2 * np.cos(np.radians(eventos['lat'].to_numpy()))
+
+    tabela = pd.DataFrame({
+        'inicio': _datas(eventos['primeiro'].to_numpy()),
+        'fim': _datas(eventos['ultimo'].to_numpy()),
+        'duracao_dias': (eventos['ultimo'] - eventos['primeiro'] + 1).to_numpy(np.int32),
+        'focos': eventos['focos'].to_numpy(np.int32),
+        'area_km2': (np.bincount(distintas, minlength=n) * area_celula).astype(np.float32),
+        'lat': eventos['lat'].to_numpy(np.float32),
+        'lon': eventos['lon'].to_numpy(np.float32)})
+
+    for dimensao, coluna in dimensoes.items():
+        tabela[dimensao] = _predominante(rotulos, coluna, n)
+
+    return tabela
+
+
+# Função que retorna, para cada evento, o valor mais frequente da coluna (categórica) entre os seus focos
+def _predominante(rotulos, coluna, n):
+
+    coluna = pd.Series(coluna).astype('category')
+    codigos = coluna.cat.codes.to_numpy().astype(np.int64)
+    categorias = len(coluna.cat.categories) + 1
+
+    # contagem de cada (evento, código); para cada evento fica o código com mais focos (empate: o menor)
+    pares, contagem = np.unique(rotulos * categorias + codigos + 1, return_counts=True)
+    evento, codigo = pares // categorias, pares % categorias - 1
+    ordem = np.lexsort((codigo, -contagem, evento))
+    primeiros = ordem[np.unique(evento[ordem], return_index=True)[1]]
+
+    escolhido = np.full(n, -1, dtype=np.int64)
+    escolhido[evento[primeiros]] = codigo[primeiros]
+
+    return pd.Categorical.from_codes(escolhido, categories=coluna.cat.categories)
+
+
+# Função que converte as datas do índice dos focos em dias desde 1970-01-01
+def _dias(datas):
+    return pd.DatetimeIndex(datas).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def _datas(dias):
+    return pd.to_datetime(np.asarray(dias, dtype=np.int64), unit='D')
+
+
+def _tabela_vazia():
+    return resumir_eventos(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0),
+                           {dimensao: pd.Categorical([]) for dimensao in DIMENSOES_EVENTOS})
+
+
+# ==============================================================================================================#
+#                                        GRAVAÇÃO E ATUALIZAÇÃO
+# ==============================================================================================================#
+# Função que grava a tabela de eventos com os parâmetros do agrupamento nos metadados do Parquet (troca o
+# arquivo de forma atômica para os processos que estão lendo)
+def salvar_eventos(eventos, diretorio=DIRETORIO_EVENTOS, raio_km=RAIO_KM, janela_dias=JANELA_DIAS):
+
+    os.makedirs(diretorio, exist_ok=True)
+    arquivo = os.path.join(diretorio, ARQUIVO_EVENTOS)
+
+    tabela = pa.Table.from_pandas(eventos[COLUNAS_EVENTOS], preserve_index=False)
+    parametros = json.dumps({'raio_km': raio_km, 'janela_dias': janela_dias})
+    tabela = tabela.replace_schema_metadata({**(tabela.schema.metadata or {}), b'queimadas.eventos': parametros})
+
+    pq.write_table(tabela, arquivo + '.tmp')
+    os.replace(arquivo + '.tmp', arquivo)
+
+    return arquivo
+
+
+# Função que informa se a tabela de eventos já foi gerada
+def existe_eventos(diretorio=DIRETORIO_EVENTOS):
+    return os.path.isfile(os.path.join(diretorio, ARQUIVO_EVENTOS))
+
+
+# Função que lê a tabela de eventos (estado/bioma/municipio categóricos)
+def carregar_eventos(diretorio=DIRETORIO_EVENTOS):
+    return pq.read_table(os.path.join(diretorio, ARQUIVO_EVENTOS)).to_pandas()
+
+
+# Função que retorna os parâmetros (raio_km, janela_dias) com que a tabela gravada foi gerada
+def parametros_eventos(diretorio=DIRETORIO_EVENTOS):
+
+    metadados = pq.read_schema(os.path.join(diretorio, ARQUIVO_EVENTOS)).metadata or {}
+    parametros = json.loads(metadados.get(b'queimadas.eventos', b'{}'))
+
+    return parametros.get('raio_km'), parametros.get('janela_dias')
+
+
+# Função que atualiza a tabela de eventos depois que os focos a partir de "data_minima" mudaram (None ou tabela
+# inexistente/gerada com outros parâmetros: agrupa todos os focos)
+def atualizar_eventos(data_minima=None, diretorio_focos=DIRETORIO_FOCOS, diretorio=DIRETORIO_EVENTOS,
+                      raio_km=RAIO_KM, janela_dias=JANELA_DIAS):
+
+    mantidos, corte = None, None
+
+    if data_minima is not None and existe_eventos(diretorio) and \
+            parametros_eventos(diretorio) == (raio_km, janela_dias):
+        eventos = carregar_eventos(diretorio)
+        corte = pd.Timestamp(data_minima).normalize() - janela_dias * UM_DIA
+
+        # recua o corte até o início dos eventos que chegam nele (que podem se juntar aos focos novos)
+        while True:
+            anterior = eventos.loc[eventos['fim'] >= corte, 'inicio'].min()
+            if pd.isna(anterior) or anterior >= corte:
+                break
+            corte = anterior
+
+        mantidos = eventos[eventos['fim'] < corte]
+
+    anos = None if corte is None else [ano for ano in anos_disponiveis(diretorio_focos) if ano >= corte.year]
+    focos = carregar_focos(colunas=COLUNAS_FOCOS, anos=anos, diretorio=diretorio_focos)
+    if corte is not None:
+        focos = focos[focos.index >= corte]
+
+    eventos = construir_eventos(focos, raio_km, janela_dias)
+    if mantidos is not None:
+        eventos = _juntar_eventos(mantidos, eventos)
+
+    return salvar_eventos(eventos, diretorio, raio_km, janela_dias)
+
+
+# Função que junta os eventos mantidos com os reagrupados (categorias unidas, em ordem de início)
+def _juntar_eventos(mantidos, novos):
+
+    partes = [mantidos.reset_index(drop=True), novos]
+    for dimensao in DIMENSOES_EVENTOS:
+        categorias = partes[0][dimensao].cat.categories.union(partes[1][dimensao].cat.categories)
+        partes = [parte.assign(**{dimensao: parte[dimensao].cat.set_categories(categorias)}) for parte in partes]
+
+    return pd.concat(partes, ignore_index=True).sort_values('inicio', kind='stable', ignore_index=True)
+
+
+# ==============================================================================================================#
+#                                                CONSULTA
+# ==============================================================================================================#
+# Função que filtra os eventos de um estado (None = todos) e bioma (None = todos) que têm algum dia em
+# [data_inicial, data_final] (datas vazias não limitam)
+def filtrar_eventos(eventos, estado=None, data_inicial=None, data_final=None, bioma=None):
+
+    filtro = np.ones(len(eventos), dtype=bool)
+    if estado is not None:
+        filtro &= (eventos['estado'] == estado).to_numpy()
+    if bioma is not None:
+        filtro &= (eventos['bioma'] == bioma).to_numpy()
+    if data_inicial is not None:
+        filtro &= (eventos['fim'] >= pd.Timestamp(data_inicial)).to_numpy()
+    if data_final is not None:
+        filtro &= (eventos['inicio'] <= pd.Timestamp(data_final)).to_numpy()
+
+    return eventos[filtro]
+
+
+# Função que conta os eventos por mês de início
+def eventos_por_mes(eventos):
+    return eventos.set_index('inicio').resample('MS')['focos'].size().rename('eventos')
+
+
+if __name__ == '__main__':
+    print('Eventos gravados ===>>>', atualizar_eventos())
@@ -0,0 +1,160 @@
+# ==============================================================================================================#
+#                          EXPORTAÇÃO DOS DADOS DOS GRÁFICOS E DOS FOCOS (CSV / PARQUET)
+# ==============================================================================================================#
+# Os dados só são serializados quando o download é pedido (os botões recebem uma função que retorna os bytes). As
+# tabelas são escritas em blocos, e os focos brutos são lidos do armazenamento em lotes já filtrados, sem montar
+# uma cópia do dataframe filtrado. Sem nenhum foco no filtro, o arquivo sai vazio mas válido (só o cabeçalho do
+# CSV ou um Parquet sem linhas com o esquema do armazenamento).
+# ==============================================================================================================#
+import io
+import zipfile
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from queimadas.armazenamento import COLUNAS, DIRETORIO_FOCOS, ESQUEMA, varrer_focos
+from queimadas.instrumentacao import contar, trecho
+
+# formato -> (extensão, tipo MIME)
+FORMATOS = {'CSV': ('csv', 'text/csv'),
+            'Parquet': ('parquet', 'application/vnd.apache.parquet')}
+
+LINHAS_POR_BLOCO = 256 * 1024
+
+
+# Função que retorna a extensão e o tipo MIME de um formato
+def extensao(formato):
+    return FORMATOS[formato][0]
+
+
+def mime(formato):
+    return FORMATOS[formato][1]
+
+
+# ==============================================================================================================#
+#                                           ESCRITA EM BLOCOS
+# ==============================================================================================================#
+# Função que gera o CSV de um dataframe em blocos de bytes (cabeçalho só no primeiro bloco)
+def blocos_csv(df, linhas_por_bloco=LINHAS_POR_BLOCO):
+
+    yield df.iloc[:0].to_csv(index=False).encode('utf-8')
+
+    for inicio in range(0, len(df), linhas_por_bloco):
+        yield df.iloc[inicio:inicio + linhas_por_bloco].to_csv(index=False, header=False).encode('utf-8')
+
+
+# Função que gera o CSV de lotes do pyarrow em blocos de bytes (sem lotes, só o cabeçalho com as colunas do
+# esquema, se passado)
+def blocos_csv_lotes(lotes, esquema=None):
+
+    cabecalho = True
+    for lote in lotes:
+        yield lote.to_pandas().to_csv(index=False, header=cabecalho).encode('utf-8')
+        cabecalho = False
+
+    if cabecalho and esquema is not None:
+        yield (','.join(esquema.names) + '\n').encode('utf-8')
+
+
+# Função que escreve lotes do pyarrow num arquivo Parquet, um grupo de linhas por lote. O arquivo usa o esquema
+# dos lotes; "esquema" é o do arquivo sem linhas, quando não vem nenhum lote.
+def escrever_parquet_lotes(lotes, saida, esquema=None):
+
+    escritor = None
+    for lote in lotes:
+        if escritor is None:
+            escritor = pq.ParquetWriter(saida, lote.schema, compression='zstd')
+        escritor.write_batch(lote)
+
+    if escritor is None:
+        if esquema is None:
+            return
+        escritor = pq.ParquetWriter(saida, esquema, compression='zstd')
+    escritor.close()
+
+
+# Função que converte um dataframe em lotes do pyarrow, sem copiar o dataframe inteiro
+def lotes_dataframe(df, linhas_por_bloco=LINHAS_POR_BLOCO):
+
+    esquema = pa.Schema.from_pandas(df, preserve_index=False)
+    for inicio in range(0, len(df), linhas_por_bloco):
+        yield pa.RecordBatch.from_pandas(df.iloc[inicio:inicio + linhas_por_bloco], schema=esquema,
+                                         preserve_index=False)
+
+
+# Função que escreve um dataframe no arquivo aberto "saida"
+def escrever(df, formato, saida):
+
+    if formato == 'CSV':
+        for bloco in blocos_csv(df):
+            saida.write(bloco)
+    elif formato == 'Parquet':
+        escrever_parquet_lotes(lotes_dataframe(df), saida, pa.Schema.from_pandas(df, preserve_index=False))
+    else:
+        raise ValueError(f'Formato desconhecido: {formato}')
+
+
+# esquema dos focos brutos exportados ("data" + colunas pedidas, com os tipos do armazenamento)
+def esquema_focos(colunas=None):
+    return pa.schema([ESQUEMA.field(coluna) for coluna in ['data'] + list(COLUNAS if colunas is None else colunas)])
+
+
+# ==============================================================================================================#
+#                                               EXPORTAÇÃO
+# ==============================================================================================================#
+# Função que exporta um dataframe no formato pedido. Retorna os bytes do arquivo (aceitos pelo
+# st.download_button).
+def exportar(df, formato='CSV'):
+
+    with trecho('exportacao', formato=formato, linhas=len(df)):
+        arquivo = io.BytesIO()
+        escrever(df, formato, arquivo)
+
+    return arquivo.getvalue()
+
+
+# Função que junta várias tabelas ({nome do arquivo sem extensão: dataframe}) num único zip
+def exportar_pacote(tabelas, formato='CSV'):
+
+    arquivo = io.BytesIO()
+
+    with trecho('exportacao', formato=formato, tabelas=len(tabelas)), \
+            zipfile.ZipFile(arquivo, 'w', compression=zipfile.ZIP_DEFLATED) as pacote:
+        for nome, df in tabelas.items():
+            if formato == 'Parquet':
+                # o escritor de Parquet precisa de um arquivo com "seek"
+                conteudo = io.BytesIO()
+                escrever(df, formato, conteudo)
+                pacote.writestr(f'{nome}.{extensao(formato)}', conteudo.getvalue())
+            else:
+                with pacote.open(f'{nome}.{extensao(formato)}', 'w') as saida:
+                    escrever(df, formato, saida)
+
+    return arquivo.getvalue()
+
+
+# Função que exporta os focos brutos de um estado e intervalo de datas, lidos em lotes do armazenamento
+def exportar_focos(estado=None, data_inicial=None, data_final=None, formato='CSV', colunas=None,
+                   diretorio=DIRETORIO_FOCOS):
+
+    lotes = _contando(varrer_focos(colunas, estado, data_inicial, data_final, diretorio))
+    arquivo = io.BytesIO()
+
+    with trecho('exportacao', formato=formato, dados='focos'):
+        if formato == 'CSV':
+            for bloco in blocos_csv_lotes(lotes, esquema_focos(colunas)):
+                arquivo.write(bloco)
+        elif formato == 'Parquet':
+            escrever_parquet_lotes(lotes, arquivo, esquema_focos(colunas))
+        else:
+            raise ValueError(f'Formato desconhecido: {formato}')
+
+    return arquivo.getvalue()
+
+
+# Função que repassa os lotes contando as linhas lidas
+def _contando(lotes):
+
+    for lote in lotes:
+        contar('linhas_lidas', lote.num_rows)
+        yield lote
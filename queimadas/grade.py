@@ -0,0 +1,226 @@
+# ==============================================================================================================#
+#                    GRADE REGULAR DOS FOCOS DE CALOR: ACUMULADO, CLIMATOLOGIA E ANOMALIA
+# ==============================================================================================================#
+# Os focos são contados numa grade regular sobre o Brasil (0.25° por padrão) para cada ano e mês. As contagens
+# ficam num único array (anos x 12 x ny x nx) gravado em "dados/grade/grades_mensais.npz", gerado na ingestão.
+# A partir dele, o acumulado de qualquer ano/mês, a climatologia (média dos anos) e a anomalia (período
+# selecionado menos a climatologia) são somas/médias sobre o array, sem voltar às linhas dos focos.
+#
+# Uso pela linha de comando (gera as grades a partir do armazenamento de focos):
+#
+#   python -m queimadas.grade
+# ==============================================================================================================#
+import os
+import numpy as np
+import pandas as pd
+
+from queimadas.armazenamento import DIRETORIO_DADOS, carregar_focos
+
+DIRETORIO_GRADE = os.path.join(DIRETORIO_DADOS, 'grade')
+ARQUIVO_GRADES = os.path.join(DIRETORIO_GRADE, 'grades_mensais.npz')
+
+
+class Grade:
+
+    # limites (em graus) e resolução da grade. O padrão cobre o Brasil.
+    def __init__(self, lat_min=-34.0, lat_max=6.0, lon_min=-74.0, lon_max=-34.0, resolucao=0.25):
+        self.lat_min, self.lat_max = float(lat_min), float(lat_max)
+        self.lon_min, self.lon_max = float(lon_min), float(lon_max)
+        self.resolucao = float(resolucao)
+        self.ny = int(round((self.lat_max - self.lat_min) / self.resolucao))
+        self.nx = int(round((self.lon_max - self.lon_min) / self.resolucao))
+
+    def __eq__(self, outra):
+        return isinstance(outra, Grade) and self.parametros() == outra.parametros()
+
+    def __hash__(self):
+        return hash(self.parametros())
+
+    def __repr__(self):
+        return 'Grade(lat_min={}, lat_max={}, lon_min={}, lon_max={}, resolucao={})'.format(*self.parametros())
+
+    def parametros(self):
+        return (self.lat_min, self.lat_max, self.lon_min, self.lon_max, self.resolucao)
+
+    # latitudes e longitudes dos centros das células
+    @property
+    def lats(self):
+        return self.lat_min + (np.arange(self.ny) + 0.5) * self.resolucao
+
+    @property
+    def lons(self):
+        return self.lon_min + (np.arange(self.nx) + 0.5) * self.resolucao
+
+    # Função que retorna o índice linear (iy * nx + ix) da célula de cada ponto, ou -1 fora da grade
+    def indices(self, lat, lon):
+
+        iy = np.floor((np.asarray(lat, dtype=np.float64) - self.lat_min) / self.resolucao).astype(np.int64)
+        ix = np.floor((np.asarray(lon, dtype=np.float64) - self.lon_min) / self.resolucao).astype(np.int64)
+        dentro = (iy >= 0) & (iy < self.ny) & (ix >= 0) & (ix < self.nx)
+
+        return np.where(dentro, iy * self.nx + ix, -1)
+
+    # Função que conta os pontos em cada célula (ny x nx)
+    def contar(self, lat, lon, pesos=None):
+
+        indices = self.indices(lat, lon)
+        dentro = indices >= 0
+        pesos = None if pesos is None else np.asarray(pesos)[dentro]
+
+        contagem = np.bincount(indices[dentro], weights=pesos, minlength=self.ny * self.nx)
+        return contagem.reshape(self.ny, self.nx)
+
+
+GRADE_BRASIL = Grade()
+
+
+# ==============================================================================================================#
+#                                        CONTAGENS MENSAIS (ANOS x 12)
+# ==============================================================================================================#
+class GradesMensais:
+
+    # "contagens" é int32 (anos x 12 x ny x nx) e "meses_validos" (anos x 12) marca os meses que têm dados
+    # (meses fora do período dos dados não entram na climatologia)
+    def __init__(self, anos, contagens, meses_validos, grade=GRADE_BRASIL):
+        self.anos = np.asarray(anos, dtype=np.int32)
+        self.contagens = contagens
+        self.meses_validos = meses_validos
+        self.grade = grade
+
+    def _indice_ano(self, ano):
+
+        posicao = np.searchsorted(self.anos, ano)
+        if posicao >= len(self.anos) or self.anos[posicao] != ano:
+            raise KeyError(f'Ano {ano} fora das grades ({self.anos[0]}-{self.anos[-1]})')
+
+        return posicao
+
+    # Função que retorna o acumulado de focos de um ano (mes=None) ou de um mês (1 a 12)
+    def acumulado(self, ano, mes=None):
+
+        campo = self.contagens[self._indice_ano(ano)]
+        return campo.sum(axis=0) if mes is None else campo[mes - 1]
+
+    # Função que retorna a climatologia: média dos acumulados anuais (mes=None) ou do mês, sobre os anos com
+    # dados completos. "anos" restringe o período de referência.
+    def climatologia(self, mes=None, anos=None):
+
+        selecao = np.ones(len(self.anos), dtype=bool) if anos is None else np.isin(self.anos, anos)
+
+        if mes is None:
+            selecao &= self.meses_validos.all(axis=1)
+            campos = self.contagens[selecao].sum(axis=1)
+        else:
+            selecao &= self.meses_validos[:, mes - 1]
+            campos = self.contagens[selecao, mes - 1]
+
+        if not len(campos):
+            return np.full((self.grade.ny, self.grade.nx), np.nan)
+
+        return campos.mean(axis=0, dtype=np.float64)
+
+    # Função que retorna a anomalia: acumulado do período menos a climatologia
+    def anomalia(self, ano, mes=None, anos=None):
+        return self.acumulado(ano, mes) - self.climatologia(mes, anos)
+
+    # Função que grava as grades (npz compactado)
+    def salvar(self, arquivo=ARQUIVO_GRADES):
+
+        os.makedirs(os.path.dirname(arquivo) or '.', exist_ok=True)
+
+        # escreve num temporário e troca no final
+        with open(arquivo + '.tmp', 'wb') as f:
+            np.savez_compressed(f, anos=self.anos, contagens=self.contagens, meses_validos=self.meses_validos,
+                                grade=np.array(self.grade.parametros()))
+        os.replace(arquivo + '.tmp', arquivo)
+
+        return arquivo
+
+
+# Função que conta os focos (índice "data" e colunas lat/lon) por ano, mês e célula da grade, num único bincount
+def construir_grades(df, grade=GRADE_BRASIL):
+
+    if not len(df):
+        return GradesMensais([], np.zeros((0, 12, grade.ny, grade.nx), dtype=np.int32),
+                             np.zeros((0, 12), dtype=bool), grade)
+
+    datas = pd.DatetimeIndex(df.index)
+    anos = np.arange(datas.year.min(), datas.year.max() + 1)
+
+    celulas = grade.ny * grade.nx
+    indices = grade.indices(df['lat'].to_numpy(), df['lon'].to_numpy())
+    periodo = (np.asarray(datas.year) - anos[0]) * 12 + np.asarray(datas.month) - 1
+    dentro = indices >= 0
+
+    contagens = np.bincount(periodo[dentro] * celulas + indices[dentro], minlength=len(anos) * 12 * celulas)
+    contagens = contagens.astype(np.int32).reshape(len(anos), 12, grade.ny, grade.nx)
+
+    # meses entre o primeiro e o último mês com dados
+    meses_validos = np.zeros(len(anos) * 12, dtype=bool)
+    meses_validos[periodo.min():periodo.max() + 1] = True
+
+    return GradesMensais(anos, contagens, meses_validos.reshape(len(anos), 12), grade)
+
+
+# Função que recalcula apenas os meses afetados de um ano, a partir dos focos novos (usada pela ingestão)
+def atualizar_grades(grades, ano, meses, novos):
+
+    novas = construir_grades(novos.set_index('data') if 'data' in novos.columns else novos, grades.grade)
+
+    # acrescenta os anos que ainda não existem
+    anos = np.union1d(grades.anos, [ano]).astype(np.int32)
+    if len(anos) != len(grades.anos):
+        contagens = np.zeros((len(anos), 12, grades.grade.ny, grades.grade.nx), dtype=np.int32)
+        meses_validos = np.zeros((len(anos), 12), dtype=bool)
+        posicoes = np.searchsorted(anos, grades.anos)
+        contagens[posicoes], meses_validos[posicoes] = grades.contagens, grades.meses_validos
+        grades = GradesMensais(anos, contagens, meses_validos, grades.grade)
+
+    i = grades._indice_ano(ano)
+    for mes in meses:
+        grades.contagens[i, mes - 1] = novas.acumulado(ano, mes) if ano in novas.anos else 0
+        grades.meses_validos[i, mes - 1] = True
+
+    return grades
+
+
+# Função que carrega as grades gravadas. Se ainda não foram geradas, são montadas a partir dos focos.
+def carregar_grades(arquivo=ARQUIVO_GRADES):
+
+    if not os.path.isfile(arquivo):
+        return construir_grades(carregar_focos(colunas=['lat', 'lon']))
+
+    with np.load(arquivo) as dados:
+        return GradesMensais(dados['anos'], dados['contagens'], dados['meses_validos'], Grade(*dados['grade']))
+
+
+# ==============================================================================================================#
+#                                                 FIGURAS
+# ==============================================================================================================#
+# Função que monta o mapa (heatmap plotly) de um campo da grade. Para anomalias (e correlações) a escala é
+# divergente e centrada no zero. "rotulo" é o título da barra de cores e "cores" a escala dos campos positivos.
+def figura_grade(campo, grade=GRADE_BRASIL, titulo='', anomalia=False, altura=600, rotulo='Focos', cores='YlOrRd'):
+
+    import plotly.graph_objects as go
+
+    campo = np.asarray(campo, dtype=np.float64)
+
+    if anomalia:
+        limite = np.nanmax(np.abs(campo)) if np.isfinite(campo).any() else 1.0
+        escala = dict(colorscale='RdBu_r', zmid=0, zmin=-limite, zmax=limite)
+    else:
+        campo = np.where(campo > 0, campo, np.nan)
+        escala = dict(colorscale=cores)
+
+    figura = go.Figure(go.Heatmap(z=campo, x=grade.lons, y=grade.lats, colorbar=dict(title=rotulo),
+                                  hoverongaps=False, **escala))
+    figura.update_layout(title={'text': titulo, 'x': 0.5, 'xanchor': 'center', 'font_size': 20,
+                                'font_color': 'red'},
+                         xaxis_title='Longitude', yaxis_title='Latitude', height=altura,
+                         yaxis=dict(scaleanchor='x', scaleratio=1))
+
+    return figura
+
+
+if __name__ == '__main__':
+    print('Grades gravadas ===>>>', construir_grades(carregar_focos(colunas=['lat', 'lon'])).salvar())
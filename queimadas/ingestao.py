@@ -0,0 +1,444 @@
+# ==============================================================================================================#
+#                       INGESTÃO INCREMENTAL DOS FOCOS DE CALOR DO INPE (SUBSTITUI O NOTEBOOK)
+# ==============================================================================================================#
+# - Dados anuais do satélite de referência (2003 até o ano anterior): focos_br_ref_AAAA.zip
+# - Dados mensais de todos os satélites (ano atual): focos_mensal_br_AAAAMM.csv
+#
+# A cada execução a listagem do servidor é comparada com o manifesto da última ingestão (tamanho, ETag e data de
+# modificação de cada arquivo). Só os arquivos que mudaram são baixados e lidos (em paralelo, num pool de
+# processos). Em seguida são regravadas apenas as partições de ano afetadas do armazenamento de focos e, no
+# cubo, apenas os meses afetados. Por fim as colunas mapeadas em memória (queimadas.colunas) são regravadas numa
+# nova versão, trocada de forma atômica para os processos que estão lendo, os rankings de municípios e biomas
+# (queimadas.rankings) são refeitos a partir do cubo e os eventos de fogo (queimadas.eventos) são reagrupados a
+# partir do primeiro mês alterado.
+#
+# A origem pode ser a URL do INPE ou um diretório local com os mesmos arquivos (útil para testes e espelhos).
+#
+# Com --satelites os arquivos mensais também são ingeridos com todos os satélites (queimadas.satelites), num
+# armazenamento e manifesto próprios: cada arquivo alterado é lido e tem as detecções repetidas marcadas num
+# processo do pool, e são regravados os meses afetados dos focos e do cubo por satélite.
+#
+# Uso pela linha de comando:
+#
+#   python -m queimadas.ingestao
+#   python -m queimadas.ingestao --origem-anual /espelho/anual --origem-mensal /espelho/mensal --processos 4
+#   python -m queimadas.ingestao --satelites
+# ==============================================================================================================#
+import argparse
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import unquote, urljoin, urlparse
+
+import pandas as pd
+import requests
+
+from queimadas.armazenamento import (DIRETORIO_DADOS, DIRETORIO_FOCOS, ESQUEMA, carregar_focos, ler_particoes,
+                                     normalizar_focos, salvar_particao)
+from queimadas.colunas import DIRETORIO_COLUNAS, salvar_colunas
+from queimadas.cubo import ARQUIVO_CUBO, DIMENSOES, DIRETORIO_CUBO, ESQUEMA_CUBO, construir_cubo
+from queimadas.eventos import DIRETORIO_EVENTOS, atualizar_eventos
+from queimadas.grade import ARQUIVO_GRADES, atualizar_grades, carregar_grades, construir_grades
+from queimadas.rankings import DIRETORIO_RANKINGS, converter_cubo
+from queimadas.satelites import (DIMENSOES_SATELITES, DIRETORIO_SATELITES, ESQUEMA_CUBO_SATELITES, ESQUEMA_SATELITES,
+                                 SATELITE_REFERENCIA, construir_cubo_satelites, marcar_duplicatas,
+                                 normalizar_satelites)
+
+# link dos dados de queimadas do INPE
+URL_ANUAL = 'https://dataserver-coids.inpe.br/queimadas/queimadas/focos/csv/anual/Brasil_sat_ref/'
+URL_MENSAL = 'https://dataserver-coids.inpe.br/queimadas/queimadas/focos/csv/mensal/Brasil/'
+
+DIRETORIO_INGESTAO = os.path.join(DIRETORIO_DADOS, 'ingestao')
+NOME_MANIFESTO = 'manifesto.json'
+
+PADRAO_ANUAL = re.compile(r'^focos_br_ref_(\d{4})\.zip$')
+PADRAO_MENSAL = re.compile(r'^focos_mensal_br_(\d{4})(\d{2})\.csv$')
+
+# nomes das colunas nos arquivos do INPE -> nomes usados no armazenamento (o arquivo de 2023 usa
+# "latitude/longitude", os anuais usam "data_pas" e os mensais "data_hora_gmt")
+RENOMEIA = {'latitude': 'lat', 'longitude': 'lon', 'data_pas': 'data', 'data_hora_gmt': 'data'}
+COLUNAS_ORIGEM = set(RENOMEIA) | {'lat', 'lon', 'municipio', 'estado', 'bioma', 'satelite'}
+COLUNAS_FOCOS = ['data', 'lat', 'lon', 'municipio', 'estado', 'bioma']
+
+TEMPO_LIMITE = 60
+
+
+# ==============================================================================================================#
+#                                           LISTAGEM DA ORIGEM
+# ==============================================================================================================#
+# Função que informa se a origem é um diretório local (caminho ou URL "file://")
+def origem_local(origem):
+    return urlparse(origem).scheme in ('', 'file') or os.path.isdir(origem)
+
+
+def _caminho_local(origem):
+    return unquote(urlparse(origem).path) if origem.startswith('file://') else origem
+
+
+# Função que lista os arquivos da origem cujo nome casa com o padrão. Cada arquivo é um dicionário com "nome",
+# "url", "tamanho", "etag" e "modificado" (usados para saber se mudou desde a última ingestão).
+def listar_arquivos(origem, padrao, sessao=None):
+
+    if origem_local(origem):
+        return _listar_local(_caminho_local(origem), padrao)
+
+    return _listar_http(origem, padrao, sessao or requests.Session())
+
+
+def _listar_local(diretorio, padrao):
+
+    arquivos = []
+    for nome in sorted(os.listdir(diretorio)):
+        if padrao.match(nome):
+            caminho = os.path.join(diretorio, nome)
+            info = os.stat(caminho)
+            arquivos.append({'nome': nome,
+                             'url': caminho,
+                             'tamanho': info.st_size,
+                             'etag': None,
+                             'modificado': datetime.fromtimestamp(info.st_mtime, timezone.utc).isoformat()})
+
+    return arquivos
+
+
+def _listar_http(url, padrao, sessao):
+
+    resposta = sessao.get(url, timeout=TEMPO_LIMITE)
+    resposta.raise_for_status()
+
+    # links da página de listagem do servidor
+    nomes = sorted({os.path.basename(unquote(href)) for href in re.findall(r'href="([^"?#]+)"', resposta.text)})
+
+    arquivos = []
+    for nome in nomes:
+        if not padrao.match(nome):
+            continue
+
+        # o cabeçalho diz se o arquivo mudou sem precisar baixá-lo
+        url_arquivo = urljoin(url, nome)
+        cabecalho = sessao.head(url_arquivo, timeout=TEMPO_LIMITE, allow_redirects=True)
+        cabecalho.raise_for_status()
+
+        tamanho = cabecalho.headers.get('Content-Length')
+        arquivos.append({'nome': nome,
+                         'url': url_arquivo,
+                         'tamanho': int(tamanho) if tamanho is not None else None,
+                         'etag': cabecalho.headers.get('ETag'),
+                         'modificado': cabecalho.headers.get('Last-Modified')})
+
+    return arquivos
+
+
+# Função que baixa um arquivo (ou só devolve o caminho, se a origem for local)
+def baixar_arquivo(arquivo, diretorio_download, sessao=None):
+
+    if origem_local(arquivo['url']):
+        return _caminho_local(arquivo['url'])
+
+    os.makedirs(diretorio_download, exist_ok=True)
+    destino = os.path.join(diretorio_download, arquivo['nome'])
+
+    with (sessao or requests).get(arquivo['url'], stream=True, timeout=TEMPO_LIMITE) as resposta:
+        resposta.raise_for_status()
+        with open(destino + '.tmp', 'wb') as saida:
+            shutil.copyfileobj(resposta.raw, saida)
+
+    os.replace(destino + '.tmp', destino)
+
+    return destino
+
+
+# ==============================================================================================================#
+#                                                 LEITURA
+# ==============================================================================================================#
+# Função que lê um arquivo do INPE (zip anual ou CSV mensal) e retorna as colunas padronizadas do armazenamento.
+# Fica no nível do módulo para poder rodar no pool de processos.
+def ler_arquivo(caminho):
+
+    compressao = 'zip' if caminho.endswith('.zip') else None
+    df = pd.read_csv(caminho, compression=compressao, usecols=lambda coluna: coluna in COLUNAS_ORIGEM)
+    df.rename(columns=RENOMEIA, inplace=True)
+
+    # seleciona o satélite de referência AQUA_M-T
+    if 'satelite' in df.columns:
+        df = df[df['satelite'] == SATELITE_REFERENCIA]
+
+    return normalizar_focos(df[COLUNAS_FOCOS])
+
+
+# Função que lê um arquivo mensal do INPE com os focos de todos os satélites e marca as detecções repetidas do
+# mesmo fogo (queimadas.satelites). Fica no nível do módulo para poder rodar no pool de processos. Os pares só são
+# procurados dentro do mês do arquivo: os da virada do mês (até TOLERANCIA_MINUTOS) ficam sem marcar.
+def ler_arquivo_satelites(caminho):
+
+    df = pd.read_csv(caminho, usecols=lambda coluna: coluna in COLUNAS_ORIGEM)
+    df.rename(columns=RENOMEIA, inplace=True)
+
+    df['data'] = pd.to_datetime(df['data'])
+    df['duplicata'] = marcar_duplicatas(df['data'], df['lat'], df['lon'], df['satelite'])
+
+    return normalizar_satelites(df[COLUNAS_FOCOS + ['satelite', 'duplicata']])
+
+
+# ==============================================================================================================#
+#                                       ATUALIZAÇÃO DAS PARTIÇÕES
+# ==============================================================================================================#
+# Função que regrava a partição de um ano dos focos trocando os meses afetados pelos focos novos
+def atualizar_focos(ano, meses, novos, diretorio=DIRETORIO_FOCOS):
+
+    partes = [novos]
+
+    existente = ler_particoes(diretorio, ESQUEMA.names, [ano])
+    if existente is not None:
+        partes.insert(0, existente[~existente['data'].dt.month.isin(meses)])
+
+    return salvar_particao(normalizar_focos(pd.concat(partes, ignore_index=True)), ano, diretorio)
+
+
+# Função que regrava a partição de um ano do cubo recalculando só os meses afetados
+def atualizar_cubo(ano, meses, novos, diretorio=DIRETORIO_CUBO):
+
+    partes = [construir_cubo(novos.set_index('data'))]
+
+    existente = ler_particoes(diretorio, ESQUEMA_CUBO.names, [ano], ESQUEMA_CUBO, ARQUIVO_CUBO)
+    if existente is not None:
+        partes.insert(0, existente[~existente['data'].dt.month.isin(meses)])
+
+    cubo = pd.concat(partes, ignore_index=True).sort_values('data', kind='stable', ignore_index=True)
+    for coluna in DIMENSOES:
+        cubo[coluna] = cubo[coluna].astype('category')
+
+    return salvar_particao(cubo, ano, diretorio, ESQUEMA_CUBO, ARQUIVO_CUBO)
+
+
+# Função que regrava as partições de um ano dos focos de todos os satélites e do cubo por satélite trocando os
+# meses afetados
+def atualizar_satelites(ano, meses, novos, diretorio=DIRETORIO_SATELITES):
+
+    diretorio_focos, diretorio_cubo = os.path.join(diretorio, 'focos'), os.path.join(diretorio, 'cubo')
+
+    focos = [novos]
+    existente = ler_particoes(diretorio_focos, ESQUEMA_SATELITES.names, [ano], ESQUEMA_SATELITES)
+    if existente is not None:
+        focos.insert(0, existente[~existente['data'].dt.month.isin(meses)])
+
+    cubo = [construir_cubo_satelites(novos.set_index('data'))]
+    existente = ler_particoes(diretorio_cubo, ESQUEMA_CUBO_SATELITES.names, [ano], ESQUEMA_CUBO_SATELITES,
+                              ARQUIVO_CUBO)
+    if existente is not None:
+        cubo.insert(0, existente[~existente['data'].dt.month.isin(meses)])
+
+    cubo = pd.concat(cubo, ignore_index=True).sort_values('data', kind='stable', ignore_index=True)
+    for coluna in DIMENSOES_SATELITES:
+        cubo[coluna] = cubo[coluna].astype('category')
+
+    return (salvar_particao(normalizar_satelites(pd.concat(focos, ignore_index=True)), ano, diretorio_focos,
+                            ESQUEMA_SATELITES),
+            salvar_particao(cubo, ano, diretorio_cubo, ESQUEMA_CUBO_SATELITES, ARQUIVO_CUBO))
+
+
+# ==============================================================================================================#
+#                                              MANIFESTO
+# ==============================================================================================================#
+def ler_manifesto(diretorio_ingestao=DIRETORIO_INGESTAO):
+
+    caminho = os.path.join(diretorio_ingestao, NOME_MANIFESTO)
+    if not os.path.isfile(caminho):
+        return {}
+
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_manifesto(manifesto, diretorio_ingestao=DIRETORIO_INGESTAO):
+
+    os.makedirs(diretorio_ingestao, exist_ok=True)
+    caminho = os.path.join(diretorio_ingestao, NOME_MANIFESTO)
+
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1, ensure_ascii=False, sort_keys=True)
+    os.replace(caminho + '.tmp', caminho)
+
+
+# Função que informa se o arquivo mudou desde a última ingestão
+def arquivo_mudou(arquivo, manifesto):
+
+    anterior = manifesto.get(arquivo['nome'])
+    if anterior is None:
+        return True
+
+    return any(anterior.get(chave) != arquivo[chave] for chave in ('tamanho', 'etag', 'modificado'))
+
+
+# ==============================================================================================================#
+#                                               INGESTÃO
+# ==============================================================================================================#
+# Função que executa a ingestão incremental. Retorna um resumo com os arquivos processados e as partições
+# regravadas.
+def ingerir(origem_anual=URL_ANUAL, origem_mensal=URL_MENSAL, diretorio_focos=DIRETORIO_FOCOS,
+            diretorio_cubo=DIRETORIO_CUBO, diretorio_ingestao=DIRETORIO_INGESTAO, arquivo_grades=ARQUIVO_GRADES,
+            processos=None, diretorio_colunas=DIRETORIO_COLUNAS, diretorio_rankings=DIRETORIO_RANKINGS,
+            diretorio_eventos=DIRETORIO_EVENTOS):
+
+    sessao = requests.Session()
+    manifesto = ler_manifesto(diretorio_ingestao)
+
+    # o arquivo anual do satélite de referência substitui os mensais do mesmo ano
+    anuais = listar_arquivos(origem_anual, PADRAO_ANUAL, sessao)
+    anos_anuais = {int(PADRAO_ANUAL.match(arquivo['nome']).group(1)) for arquivo in anuais}
+
+    mensais = [arquivo for arquivo in listar_arquivos(origem_mensal, PADRAO_MENSAL, sessao)
+               if int(PADRAO_MENSAL.match(arquivo['nome']).group(1)) not in anos_anuais]
+
+    # meses cobertos por cada arquivo que mudou: {nome: (ano, [meses])}
+    alterados = {}
+    for arquivo in anuais + mensais:
+        if not arquivo_mudou(arquivo, manifesto):
+            continue
+        anual = PADRAO_ANUAL.match(arquivo['nome'])
+        if anual:
+            alterados[arquivo['nome']] = (int(anual.group(1)), list(range(1, 13)))
+        else:
+            mensal = PADRAO_MENSAL.match(arquivo['nome'])
+            alterados[arquivo['nome']] = (int(mensal.group(1)), [int(mensal.group(2))])
+
+    arquivos = [arquivo for arquivo in anuais + mensais if arquivo['nome'] in alterados]
+    resumo = {'arquivos': [arquivo['nome'] for arquivo in arquivos], 'focos': [], 'cubo': [], 'grade': None,
+              'colunas': None, 'rankings': None, 'eventos': None}
+
+    if not arquivos:
+        return resumo
+
+    # baixa e lê em paralelo
+    caminhos = [baixar_arquivo(arquivo, os.path.join(diretorio_ingestao, 'download'), sessao)
+                for arquivo in arquivos]
+
+    if processos == 1:
+        tabelas = list(map(ler_arquivo, caminhos))
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            tabelas = list(pool.map(ler_arquivo, caminhos))
+
+    # agrupa os arquivos lidos por ano
+    por_ano = {}
+    for arquivo, tabela in zip(arquivos, tabelas):
+        ano, meses = alterados[arquivo['nome']]
+        meses_ano, tabelas_ano = por_ano.setdefault(ano, (set(), []))
+        meses_ano.update(meses)
+        tabelas_ano.append(tabela)
+
+    # regrava somente os anos e meses afetados
+    atualizacoes = []
+    for ano, (meses, tabelas_ano) in sorted(por_ano.items()):
+        novos = pd.concat(tabelas_ano, ignore_index=True)
+        meses = sorted(meses)
+        resumo['focos'].append(atualizar_focos(ano, meses, novos, diretorio_focos))
+        resumo['cubo'].append(atualizar_cubo(ano, meses, novos, diretorio_cubo))
+        atualizacoes.append((ano, meses, novos))
+
+    # grades mensais dos mapas: recalcula só os meses afetados (na primeira vez, monta a partir dos focos)
+    if os.path.isfile(arquivo_grades):
+        grades = carregar_grades(arquivo_grades)
+        for ano, meses, novos in atualizacoes:
+            grades = atualizar_grades(grades, ano, meses, novos)
+    else:
+        grades = construir_grades(carregar_focos(colunas=['lat', 'lon'], diretorio=diretorio_focos))
+    resumo['grade'] = grades.salvar(arquivo_grades)
+
+    # colunas mapeadas em memória lidas pelo app (gravadas em ordem de estado, então são refeitas por inteiro)
+    resumo['colunas'] = salvar_colunas(carregar_focos(diretorio=diretorio_focos), diretorio_colunas)
+
+    # rankings de municípios e biomas por estado/mês e estado/ano (somas pequenas sobre o cubo inteiro)
+    resumo['rankings'] = converter_cubo(diretorio_cubo, diretorio_rankings)
+
+    # eventos de fogo: só os focos a partir do primeiro mês alterado são reagrupados
+    data_minima = min(pd.Timestamp(year=ano, month=meses[0], day=1) for ano, meses, _ in atualizacoes)
+    resumo['eventos'] = atualizar_eventos(data_minima, diretorio_focos, diretorio_eventos)
+
+    # o manifesto só é atualizado depois que as partições foram gravadas
+    for arquivo in arquivos:
+        manifesto[arquivo['nome']] = {chave: arquivo[chave] for chave in ('tamanho', 'etag', 'modificado')}
+    salvar_manifesto(manifesto, diretorio_ingestao)
+
+    return resumo
+
+
+# Função que executa a ingestão incremental dos arquivos mensais com todos os satélites (inclusive dos anos que
+# já têm o arquivo anual do satélite de referência). Usa um manifesto próprio, em "diretorio/ingestao".
+def ingerir_satelites(origem_mensal=URL_MENSAL, diretorio=DIRETORIO_SATELITES, processos=None):
+
+    sessao = requests.Session()
+    diretorio_ingestao = os.path.join(diretorio, 'ingestao')
+    manifesto = ler_manifesto(diretorio_ingestao)
+
+    arquivos = [arquivo for arquivo in listar_arquivos(origem_mensal, PADRAO_MENSAL, sessao)
+                if arquivo_mudou(arquivo, manifesto)]
+    resumo = {'arquivos': [arquivo['nome'] for arquivo in arquivos], 'focos': [], 'cubo': []}
+
+    if not arquivos:
+        return resumo
+
+    # baixa e lê (com a marcação das detecções repetidas, a parte mais pesada) em paralelo
+    caminhos = [baixar_arquivo(arquivo, os.path.join(diretorio_ingestao, 'download'), sessao)
+                for arquivo in arquivos]
+
+    if processos == 1:
+        tabelas = list(map(ler_arquivo_satelites, caminhos))
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            tabelas = list(pool.map(ler_arquivo_satelites, caminhos))
+
+    # agrupa os meses lidos por ano e regrava somente os meses afetados
+    por_ano = {}
+    for arquivo, tabela in zip(arquivos, tabelas):
+        mensal = PADRAO_MENSAL.match(arquivo['nome'])
+        meses_ano, tabelas_ano = por_ano.setdefault(int(mensal.group(1)), (set(), []))
+        meses_ano.add(int(mensal.group(2)))
+        tabelas_ano.append(tabela)
+
+    for ano, (meses, tabelas_ano) in sorted(por_ano.items()):
+        focos, cubo = atualizar_satelites(ano, sorted(meses), pd.concat(tabelas_ano, ignore_index=True), diretorio)
+        resumo['focos'].append(focos)
+        resumo['cubo'].append(cubo)
+
+    for arquivo in arquivos:
+        manifesto[arquivo['nome']] = {chave: arquivo[chave] for chave in ('tamanho', 'etag', 'modificado')}
+    salvar_manifesto(manifesto, diretorio_ingestao)
+
+    return resumo
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Ingestão incremental dos focos de calor do INPE')
+    parser.add_argument('--origem-anual', default=URL_ANUAL, help='URL ou diretório dos arquivos anuais')
+    parser.add_argument('--origem-mensal', default=URL_MENSAL, help='URL ou diretório dos arquivos mensais')
+    parser.add_argument('--processos', type=int, default=None, help='número de processos de leitura')
+    parser.add_argument('--satelites', action='store_true',
+                        help='também ingere os arquivos mensais com todos os satélites')
+    args = parser.parse_args()
+
+    resumo = ingerir(args.origem_anual, args.origem_mensal, processos=args.processos)
+
+    for nome in resumo['arquivos']:
+        print('Processado ===>>>', nome)
+    for arquivo in resumo['focos'] + resumo['cubo']:
+        print('Partição gravada ===>>>', arquivo)
+    if resumo['grade']:
+        print('Grades gravadas ===>>>', resumo['grade'])
+    if resumo['colunas']:
+        print('Colunas gravadas ===>>>', resumo['colunas'])
+    if resumo['rankings']:
+        print('Rankings gravados ===>>>', resumo['rankings'])
+    if resumo['eventos']:
+        print('Eventos gravados ===>>>', resumo['eventos'])
+
+    if args.satelites:
+        resumo = ingerir_satelites(args.origem_mensal, processos=args.processos)
+        for nome in resumo['arquivos']:
+            print('Processado (todos os satélites) ===>>>', nome)
+        for arquivo in resumo['focos'] + resumo['cubo']:
+            print('Partição gravada ===>>>', arquivo)
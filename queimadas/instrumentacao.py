@@ -0,0 +1,212 @@
+# ==============================================================================================================#
+#                    INSTRUMENTAÇÃO: TEMPO DE CADA ETAPA, CONTADORES E LINHAS LIDAS POR CONSULTA
+# ==============================================================================================================#
+# Cada execução do app (um "rerun" do Streamlit) é uma "Execucao" com a lista dos trechos medidos (carga dos
+# dados, consultas, figuras, exportações), os contadores (acertos/falhas dos caches, linhas lidas) e o tempo
+# total. Os trechos são abertos com:
+#
+#   with trecho('consulta', granularidade='mensal'):
+#       ...
+#       registrar(linhas=len(filtrado))
+#
+# em qualquer ponto do código: a execução corrente fica numa ContextVar, então o serviço e os módulos de dados
+# não precisam recebê-la. Fora de uma execução (API HTTP, downloads) os trechos só entram nos agregados. A pilha
+# dos trechos abertos também é uma ContextVar: tarefas enviadas a threads com contextvars.copy_context() medem
+# os seus trechos na mesma execução sem misturar a pilha das outras threads.
+#
+# Saídas:
+#   - execucoes_recentes() e metricas(): últimas execuções e agregados do processo (painel de administração do
+#     app e rota /metricas da API);
+#   - log "queimadas.instrumentacao" (INFO): uma linha JSON por execução;
+#   - arquivo JSON Lines opcional (QUEIMADAS_INSTRUMENTACAO_ARQUIVO).
+#
+# O custo é de alguns microssegundos por trecho; QUEIMADAS_INSTRUMENTACAO=0 desliga tudo.
+# ==============================================================================================================#
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+ATIVO = os.environ.get('QUEIMADAS_INSTRUMENTACAO', '1') != '0'
+ARQUIVO_LOG = os.environ.get('QUEIMADAS_INSTRUMENTACAO_ARQUIVO')
+
+# execuções guardadas na memória para o painel de administração
+MAX_EXECUCOES = 50
+
+_execucao_atual = contextvars.ContextVar('queimadas_execucao', default=None)
+_pilha = contextvars.ContextVar('queimadas_pilha', default=())
+_trava = threading.Lock()
+_recentes = deque(maxlen=MAX_EXECUCOES)
+_agregados = {}
+_contadores = Counter()
+
+
+class Execucao:
+
+    def __init__(self, nome, **atributos):
+        self.nome = nome
+        self.atributos = atributos
+        self.inicio = time.perf_counter()
+        self.horario = time.time()
+        self.trechos = []
+        self.contadores = Counter()
+        self.duracao_ms = None
+
+    # Função que retorna a execução como dicionário (pronto para JSON)
+    def resumo(self):
+
+        duracao = self.duracao_ms if self.duracao_ms is not None else (time.perf_counter() - self.inicio) * 1000
+        return {'execucao': self.nome,
+                'horario': round(self.horario, 3),
+                'duracao_ms': round(duracao, 3),
+                **self.atributos,
+                'contadores': dict(self.contadores),
+                'trechos': [dict(trecho) for trecho in self.trechos]}
+
+
+# ==============================================================================================================#
+#                                                EXECUÇÕES
+# ==============================================================================================================#
+# Função que inicia a execução corrente (substitui uma execução anterior que não foi finalizada, como quando o
+# Streamlit interrompe um rerun)
+def iniciar_execucao(nome, **atributos):
+
+    if not ATIVO:
+        return None
+
+    execucao = Execucao(nome, **atributos)
+    _execucao_atual.set(execucao)
+    _pilha.set(())
+    return execucao
+
+
+# Função que finaliza a execução corrente: guarda nas recentes, escreve no log e no arquivo JSON Lines
+def finalizar_execucao():
+
+    execucao = _execucao_atual.get()
+    if execucao is None:
+        return None
+
+    _execucao_atual.set(None)
+    execucao.duracao_ms = (time.perf_counter() - execucao.inicio) * 1000
+    resumo = execucao.resumo()
+    linha = json.dumps(resumo, ensure_ascii=False, default=str)
+
+    with _trava:
+        _recentes.append(resumo)
+        _agregar(f'execucao.{execucao.nome}', execucao.duracao_ms)
+        if ARQUIVO_LOG:
+            with open(ARQUIVO_LOG, 'a', encoding='utf-8') as f:
+                f.write(linha + '\n')
+
+    logger.info('%s', linha)
+    return resumo
+
+
+def execucao_atual():
+    return _execucao_atual.get()
+
+
+# ==============================================================================================================#
+#                                           TRECHOS E CONTADORES
+# ==============================================================================================================#
+# Função (gerenciador de contexto) que mede um trecho. Os atributos (e os passados a "registrar" dentro do
+# trecho) vão junto com o tempo para a execução corrente.
+@contextmanager
+def trecho(nome, **atributos):
+
+    if not ATIVO:
+        yield
+        return
+
+    execucao = _execucao_atual.get()
+    registro = {'trecho': nome, **atributos}
+    inicio = time.perf_counter()
+    token = None
+
+    if execucao is not None:
+        pilha = _pilha.get()
+        registro['inicio_ms'] = round((inicio - execucao.inicio) * 1000, 3)
+        registro['nivel'] = len(pilha)
+        with _trava:
+            execucao.trechos.append(registro)
+        token = _pilha.set(pilha + (registro,))
+
+    try:
+        yield
+    finally:
+        duracao = (time.perf_counter() - inicio) * 1000
+        registro['duracao_ms'] = round(duracao, 3)
+        if token is not None:
+            _pilha.reset(token)
+        with _trava:
+            _agregar(nome, duracao)
+
+
+# Função que acrescenta valores (ex.: linhas lidas) ao trecho aberto mais interno da execução corrente
+def registrar(**valores):
+
+    pilha = _pilha.get()
+    if pilha and _execucao_atual.get() is not None:
+        pilha[-1].update(valores)
+
+
+# Função que soma "n" ao contador "nome" da execução corrente e do processo
+def contar(nome, n=1):
+
+    if not ATIVO:
+        return
+
+    execucao = _execucao_atual.get()
+
+    with _trava:
+        if execucao is not None:
+            execucao.contadores[nome] += n
+        _contadores[nome] += n
+
+
+def _agregar(nome, duracao):
+
+    agregado = _agregados.get(nome)
+    if agregado is None:
+        agregado = _agregados[nome] = {'quantidade': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+
+    agregado['quantidade'] += 1
+    agregado['total_ms'] += duracao
+    agregado['max_ms'] = max(agregado['max_ms'], duracao)
+
+
+# ==============================================================================================================#
+#                                                CONSULTA
+# ==============================================================================================================#
+# Função que retorna as últimas execuções (a mais recente primeiro)
+def execucoes_recentes(n=MAX_EXECUCOES):
+
+    with _trava:
+        return list(_recentes)[::-1][:n]
+
+
+# Função que retorna os agregados do processo: tempo por trecho (quantidade, total, médio e máximo) e contadores
+def metricas():
+
+    with _trava:
+        trechos = {nome: {**agregado,
+                          'total_ms': round(agregado['total_ms'], 3),
+                          'max_ms': round(agregado['max_ms'], 3),
+                          'medio_ms': round(agregado['total_ms'] / agregado['quantidade'], 3)}
+                   for nome, agregado in _agregados.items()}
+        return {'ativo': ATIVO, 'trechos': trechos, 'contadores': dict(_contadores)}
+
+
+def limpar():
+
+    with _trava:
+        _recentes.clear()
+        _agregados.clear()
+        _contadores.clear()
@@ -0,0 +1,94 @@
+# ==============================================================================================================#
+#                        MAPA DOS FOCOS COM AGRUPAMENTO EM GRADE FEITO NO SERVIDOR
+# ==============================================================================================================#
+# Os focos filtrados (podem ser centenas de milhares) não vão para o navegador. Eles são agrupados numa grade
+# cujo tamanho de célula acompanha o zoom do mapa (cerca de 32 pixels de tela por célula). Cada célula vira
+# um ponto no centróide dos seus focos, com a contagem como peso. Se ainda houver mais que "MAX_CELULAS"
+# células, a célula dobra de tamanho até caber, então o tamanho do que é enviado ao navegador é limitado
+# qualquer que seja a quantidade de focos.
+# ==============================================================================================================#
+import numpy as np
+import pandas as pd
+
+MAX_CELULAS = 5000
+MAX_MARCADORES = 500
+PIXELS_CELULA = 32
+ZOOM_INICIAL = 5
+CENTRO_BRASIL = (-15.0, -55.0)
+
+
+# Função que retorna o tamanho da célula (graus) para um nível de zoom. No zoom "z" o mundo tem 256 * 2**z
+# pixels de largura.
+def tamanho_celula(zoom):
+    return 360.0 / (256 * 2 ** zoom) * PIXELS_CELULA
+
+
+# Função que agrupa os focos em células da grade do zoom pedido. Retorna um dataframe com o centróide
+# (lat, lon) e a quantidade de focos de cada célula.
+def agrupar_focos(lat, lon, zoom=ZOOM_INICIAL, max_celulas=MAX_CELULAS):
+
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+
+    if not len(lat):
+        return pd.DataFrame({'lat': [], 'lon': [], 'focos': np.array([], dtype=np.int64)})
+
+    tamanho = tamanho_celula(zoom)
+    while True:
+        colunas = int(np.ceil(360.0 / tamanho)) + 1
+        celula = np.floor((lat + 90.0) / tamanho).astype(np.int64) * colunas + \
+            np.floor((lon + 180.0) / tamanho).astype(np.int64)
+        celulas, inverso = np.unique(celula, return_inverse=True)
+        if len(celulas) <= max_celulas:
+            break
+        tamanho *= 2
+
+    focos = np.bincount(inverso)
+
+    return pd.DataFrame({'lat': np.bincount(inverso, weights=lat) / focos,
+                         'lon': np.bincount(inverso, weights=lon) / focos,
+                         'focos': focos})
+
+
+# Função que retorna o centro (lat, lon) dos focos agrupados, ponderado pela quantidade de focos
+def centro(agrupado):
+
+    if not len(agrupado):
+        return CENTRO_BRASIL
+
+    pesos = agrupado['focos'].to_numpy()
+    return (float(np.average(agrupado['lat'], weights=pesos)), float(np.average(agrupado['lon'], weights=pesos)))
+
+
+# Função que monta o mapa base (sem os focos)
+def mapa_base(centro_mapa=CENTRO_BRASIL, zoom=ZOOM_INICIAL):
+
+    import folium
+
+    return folium.Map(location=centro_mapa, zoom_start=zoom)
+
+
+# Função que monta a camada dos focos agrupados: mapa de calor ponderado e, quando são poucas células,
+# marcadores com a contagem
+def camada_focos(agrupado, nome='Focos de calor'):
+
+    import folium
+    from folium.plugins import HeatMap
+
+    grupo = folium.FeatureGroup(name=nome)
+
+    if not len(agrupado):
+        return grupo
+
+    pontos = agrupado[['lat', 'lon', 'focos']].to_numpy()
+    pesos = pontos[:, 2] / pontos[:, 2].max()
+    HeatMap(np.column_stack([np.round(pontos[:, :2], 4), np.round(pesos, 4)]).tolist(),
+            radius=18, blur=12, min_opacity=0.3).add_to(grupo)
+
+    if len(agrupado) <= MAX_MARCADORES:
+        for lat, lon, focos in pontos:
+            folium.CircleMarker(location=(round(lat, 4), round(lon, 4)), radius=2 + np.log1p(focos),
+                                color='darkred', weight=1, fill=True, fill_opacity=0.6,
+                                tooltip=f'{int(focos)} focos').add_to(grupo)
+
+    return grupo
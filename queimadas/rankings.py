@@ -0,0 +1,254 @@
+# ==============================================================================================================#
+#                 RANKINGS PRÉ-CALCULADOS DE MUNICÍPIOS E BIOMAS POR (ESTADO, MÊS) E (ESTADO, ANO)
+# ==============================================================================================================#
+# Gerados a partir do cubo na ingestão. Municípios, biomas e estados são guardados como códigos inteiros de
+# dicionários compartilhados (listas em ordem alfabética, iguais para todos os anos), e para cada dimensão há
+# duas tabelas já ordenadas por (estado, período, focos decrescente):
+#
+#   municipio_mes_*   focos por estado, mês e município
+#   municipio_ano_*   focos por estado, ano e município
+#   bioma_mes_*, bioma_ano_*
+#
+# Um ranking de um mês ou de um ano inteiro é uma fatia da tabela (já ordenada). Um intervalo qualquer soma os
+# anos inteiros, os meses inteiros restantes e, só para os dias soltos das bordas, as linhas do cubo (bincount
+# sobre os códigos, sem contar textos). A lista dos estados também fica no arquivo, sem precisar abrir o cubo.
+#
+#   dados/rankings/rankings.npz
+#
+# Uso pela linha de comando (gera os rankings a partir do cubo):
+#
+#   python -m queimadas.rankings
+# ==============================================================================================================#
+import os
+
+import numpy as np
+import pandas as pd
+
+from queimadas.armazenamento import DIRETORIO_DADOS
+from queimadas.cubo import DIRETORIO_CUBO, carregar_cubo
+
+DIRETORIO_RANKINGS = os.path.join(DIRETORIO_DADOS, 'rankings')
+ARQUIVO_RANKINGS = 'rankings.npz'
+
+DIMENSOES_RANKING = ('municipio', 'bioma')
+PERIODOS = ('mes', 'ano')
+
+UM_DIA = pd.Timedelta(days=1)
+MES_MIN, MES_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+# ==============================================================================================================#
+#                                          CONSTRUÇÃO E GRAVAÇÃO
+# ==============================================================================================================#
+# Função que monta os dicionários e as tabelas de ranking a partir do cubo (coluna "data" e colunas
+# estado/bioma/municipio/focos). Retorna um dicionário de arrays, no formato gravado.
+def construir_rankings(cubo):
+
+    datas = pd.DatetimeIndex(cubo['data']).to_numpy()
+    meses = (datas.astype('datetime64[M]') - np.datetime64(0, 'M')).astype(np.int32)
+    focos = cubo['focos'].to_numpy(np.int64)
+
+    estados, dicionario_estados = _codificar(cubo['estado'])
+    arrays = {'estados': dicionario_estados}
+
+    for dimensao in DIMENSOES_RANKING:
+        codigos, arrays[dimensao] = _codificar(cubo[dimensao])
+
+        # linhas do cubo com a dimensão nula (código -1) não entram no ranking, como em cubo.top_municipios
+        for periodo, valores in (('mes', meses), ('ano', meses // 12)):
+            tabela = pd.DataFrame({'estado': estados, 'periodo': valores, 'codigo': codigos, 'focos': focos})
+            tabela = tabela[tabela['codigo'] >= 0]
+            tabela = tabela.groupby(['estado', 'periodo', 'codigo'], sort=False)['focos'].sum().reset_index()
+
+            # ordem (estado, período, focos decrescente, código): empates ficam em ordem alfabética
+            ordem = np.lexsort((tabela['codigo'], -tabela['focos'], tabela['periodo'], tabela['estado']))
+            for campo, tipo in (('estado', np.int16), ('periodo', np.int32), ('codigo', np.int16),
+                                ('focos', np.int32)):
+                arrays[f'{dimensao}_{periodo}_{campo}'] = tabela[campo].to_numpy()[ordem].astype(tipo)
+
+    return arrays
+
+
+# Função que retorna os códigos (no dicionário em ordem alfabética) e o dicionário de uma coluna do cubo. Nas
+# colunas categóricas só as categorias são convertidas, não as linhas.
+def _codificar(coluna):
+
+    if not isinstance(coluna.dtype, pd.CategoricalDtype):
+        codigos, valores = pd.factorize(coluna.astype(str), sort=True)
+        return codigos, np.asarray(valores, dtype=str)
+
+    presentes = np.unique(coluna.cat.codes.to_numpy())
+    categorias = np.asarray(coluna.cat.categories.astype(str), dtype=str)[presentes[presentes >= 0]]
+    dicionario = np.unique(categorias)
+
+    mapa = np.full(len(coluna.cat.categories) + 1, -1)
+    mapa[presentes[presentes >= 0]] = np.searchsorted(dicionario, categorias)
+
+    return mapa[coluna.cat.codes.to_numpy()], dicionario
+
+
+# Função que grava os rankings (troca o arquivo de forma atômica para os processos que estão lendo)
+def salvar_rankings(arrays, diretorio=DIRETORIO_RANKINGS):
+
+    os.makedirs(diretorio, exist_ok=True)
+    arquivo = os.path.join(diretorio, ARQUIVO_RANKINGS)
+
+    with open(arquivo + '.tmp', 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(arquivo + '.tmp', arquivo)
+
+    return arquivo
+
+
+# Função que monta os rankings a partir do cubo gravado
+def converter_cubo(diretorio_cubo=DIRETORIO_CUBO, diretorio=DIRETORIO_RANKINGS):
+    return salvar_rankings(construir_rankings(carregar_cubo(diretorio=diretorio_cubo)), diretorio)
+
+
+# ==============================================================================================================#
+#                                                 LEITURA
+# ==============================================================================================================#
+# Função que informa se os rankings já foram gerados
+def existe_rankings(diretorio=DIRETORIO_RANKINGS):
+    return os.path.isfile(os.path.join(diretorio, ARQUIVO_RANKINGS))
+
+
+class RankingsFocos:
+
+    def __init__(self, diretorio=DIRETORIO_RANKINGS):
+
+        with np.load(os.path.join(diretorio, ARQUIVO_RANKINGS)) as arquivo:
+            arrays = {nome: arquivo[nome] for nome in arquivo.files}
+
+        self._estados = arrays['estados'].tolist()
+        self.dicionarios = {dimensao: pd.Index(arrays[dimensao].tolist(), name=dimensao)
+                            for dimensao in DIMENSOES_RANKING}
+
+        # dimensão -> (categorias de uma coluna do cubo, posição de cada uma no dicionário), da última consulta
+        self._mapas = {}
+
+        # tabela -> (estado, período, código, focos, limites do bloco de cada estado)
+        self._tabelas = {}
+        for dimensao in DIMENSOES_RANKING:
+            for periodo in PERIODOS:
+                estado, periodos, codigo, focos = (arrays[f'{dimensao}_{periodo}_{campo}']
+                                                   for campo in ('estado', 'periodo', 'codigo', 'focos'))
+                limites = np.searchsorted(estado, np.arange(len(self._estados) + 1))
+                self._tabelas[dimensao, periodo] = (periodos, codigo, focos, limites)
+
+    # lista dos estados, em ordem alfabética
+    @property
+    def estados(self):
+        return list(self._estados)
+
+    # Função que retorna o ranking completo (focos decrescentes) de "dimensao" ("municipio" ou "bioma") para um
+    # estado (None = todos) nos meses [mes_inicial, mes_final) (meses desde 1970-01, ver "meses_inteiros"),
+    # somando as linhas do cubo em "parciais" (dias soltos das bordas). Retorna None se o cubo tem valores que
+    # não estão nos dicionários (rankings desatualizados).
+    def top(self, dimensao, estado, mes_inicial, mes_final, parciais=()):
+
+        dicionario = self.dicionarios[dimensao]
+        if estado is not None and estado not in self._estados:
+            return _serie(dicionario, np.arange(0), np.arange(0))
+
+        # um único ano ou mês inteiro: a fatia da tabela já é o ranking
+        if estado is not None and not any(len(parcial) for parcial in parciais):
+            for periodo, passo in (('ano', 12), ('mes', 1)):
+                if mes_final - mes_inicial == passo and mes_inicial % passo == 0:
+                    _, codigo, focos, fatia = self._fatia(dimensao, periodo, estado, mes_inicial // passo,
+                                                          mes_final // passo)
+                    return _serie(dicionario, codigo[fatia], focos[fatia])
+
+        contagem = np.zeros(len(dicionario), dtype=np.int64)
+
+        # anos inteiros pela tabela anual e os meses restantes pela mensal
+        ano_inicial, ano_final = -(-mes_inicial // 12), mes_final // 12
+        if ano_inicial < ano_final:
+            trechos = [('ano', ano_inicial, ano_final), ('mes', mes_inicial, ano_inicial * 12),
+                       ('mes', ano_final * 12, mes_final)]
+        else:
+            trechos = [('mes', mes_inicial, mes_final)]
+
+        estados = self._estados if estado is None else [estado]
+        for periodo, inicio, fim in trechos:
+            if inicio >= fim:
+                continue
+            for sigla in estados:
+                _, codigo, focos, fatia = self._fatia(dimensao, periodo, sigla, inicio, fim)
+                contagem += np.bincount(codigo[fatia], weights=focos[fatia], minlength=len(dicionario)).astype(np.int64)
+
+        for parcial in parciais:
+            if not len(parcial):
+                continue
+            coluna = parcial[dimensao]
+            presentes = (coluna.cat.codes >= 0).to_numpy()
+            posicoes = self._posicoes(dimensao, coluna.cat.categories)
+            codigos = posicoes[coluna.cat.codes.to_numpy()[presentes]]
+            if (codigos < 0).any():
+                return None
+            contagem += np.bincount(codigos, weights=parcial['focos'].to_numpy()[presentes],
+                                    minlength=len(dicionario)).astype(np.int64)
+
+        codigos = np.flatnonzero(contagem)
+        ordem = np.lexsort((codigos, -contagem[codigos]))
+        return _serie(dicionario, codigos[ordem], contagem[codigos[ordem]])
+
+    # Função que retorna a posição no dicionário de cada categoria de uma coluna do cubo (-1 se não está). As
+    # fatias do cubo compartilham as categorias, então o resultado é reaproveitado entre as consultas.
+    def _posicoes(self, dimensao, categorias):
+
+        anteriores, posicoes = self._mapas.get(dimensao, (None, None))
+        if anteriores is not categorias:
+            posicoes = self.dicionarios[dimensao].get_indexer(categorias.astype(str))
+            self._mapas[dimensao] = (categorias, posicoes)
+
+        return posicoes
+
+    # Função que retorna a tabela e a fatia das linhas de um estado com período em [inicio, fim)
+    def _fatia(self, dimensao, periodo, estado, inicio, fim):
+
+        periodos, codigo, focos, limites = self._tabelas[dimensao, periodo]
+        i = self._estados.index(estado)
+        a, b = limites[i], limites[i + 1]
+        a, b = a + np.searchsorted(periodos[a:b], [inicio, fim])
+
+        return periodos, codigo, focos, slice(a, b)
+
+
+# Função que monta o ranking no formato de queimadas.cubo.top_municipios/top_biomas
+def _serie(dicionario, codigos, focos):
+    return pd.Series(np.asarray(focos, dtype=np.int64), index=dicionario[codigos], name='count')
+
+
+# Função que divide o intervalo de datas (inclusivo) em meses inteiros [mes_inicial, mes_final) (meses desde
+# 1970-01) e as partes soltas das bordas (lista de pares de datas inclusivos, lidas do cubo)
+def meses_inteiros(data_inicial, data_final):
+
+    inicio = None if data_inicial is None else pd.Timestamp(data_inicial).normalize()
+    fim = None if data_final is None else pd.Timestamp(data_final).normalize()
+
+    mes_inicial = MES_MIN if inicio is None else _mes(inicio) + (inicio.day != 1)
+    mes_final = MES_MAX if fim is None else _mes(fim) + ((fim + UM_DIA).day == 1)
+
+    if mes_inicial >= mes_final:
+        return (0, 0), ([(inicio, fim)] if inicio <= fim else [])
+
+    bordas = []
+    if inicio is not None and inicio.day != 1:
+        bordas.append((inicio, _primeiro_dia(mes_inicial) - UM_DIA))
+    if fim is not None and (fim + UM_DIA).day != 1:
+        bordas.append((_primeiro_dia(mes_final), fim))
+
+    return (mes_inicial, mes_final), bordas
+
+
+def _mes(data):
+    return (data.year - 1970) * 12 + data.month - 1
+
+
+def _primeiro_dia(mes):
+    return pd.Timestamp(year=1970 + mes // 12, month=mes % 12 + 1, day=1)
+
+
+if __name__ == '__main__':
+    print('Rankings gravados ===>>>', converter_cubo())
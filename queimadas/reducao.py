@@ -0,0 +1,85 @@
+# ==============================================================================================================#
+#                          REDUÇÃO DE PONTOS DAS SÉRIES LONGAS ANTES DE DESENHAR OS GRÁFICOS
+# ==============================================================================================================#
+# Um gráfico de linha com 700 pixels de largura não mostra mais de ~700 pontos: a série diária de 2002 a 2024
+# (~8.000 dias) é reduzida no servidor antes de virar o JSON do plotly enviado ao navegador a cada execução.
+#
+#   - "minmax": divide a série em baldes de 2 pixels e guarda o menor e o maior valor de cada um (os picos são
+#     preservados exatamente);
+#   - "lttb" (Largest-Triangle-Three-Buckets, Steinarsson 2013): um ponto por balde, o que forma o maior
+#     triângulo com o ponto escolhido no balde anterior e a média do seguinte (preserva a forma da curva).
+#
+# O primeiro e o último ponto são sempre mantidos. Séries que já cabem na largura voltam sem alteração.
+# ==============================================================================================================#
+import numpy as np
+import pandas as pd
+
+METODOS = ('minmax', 'lttb')
+
+
+# Função que retorna as posições dos pontos mantidos pelo min-max ("pontos" é o máximo de pontos mantidos)
+def indices_minmax(y, pontos):
+
+    y = np.asarray(y)
+    n = len(y)
+    baldes = (pontos - 2) // 2
+    if n <= pontos or baldes < 1:
+        return np.arange(n)
+
+    limites = np.linspace(0, n, baldes + 1).astype(np.int64)
+    balde = np.repeat(np.arange(baldes), np.diff(limites))
+
+    # primeira posição de cada balde em que o valor é o mínimo (e o máximo) do balde
+    posicoes = [np.arange(n)[[0, -1]]]
+    for extremo in (np.minimum.reduceat(y, limites[:-1]), np.maximum.reduceat(y, limites[:-1])):
+        candidatos = np.flatnonzero(y == extremo[balde])
+        _, primeiros = np.unique(balde[candidatos], return_index=True)
+        posicoes.append(candidatos[primeiros])
+
+    return np.unique(np.concatenate(posicoes))
+
+
+# Função que retorna as posições dos pontos mantidos pelo LTTB ("x" numérico e crescente)
+def indices_lttb(x, y, pontos):
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= pontos or pontos < 3:
+        return np.arange(n)
+
+    # "pontos - 2" baldes entre o primeiro e o último ponto
+    limites = np.linspace(1, n - 1, pontos - 1).astype(np.int64)
+    indices = np.empty(pontos, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    anterior = 0
+    for i in range(pontos - 2):
+        a, b = limites[i], limites[i + 1]
+        c, d = (limites[i + 1], limites[i + 2]) if i + 2 < len(limites) else (n - 1, n)
+        media_x, media_y = x[c:d].mean(), y[c:d].mean()
+
+        # área (em dobro) do triângulo formado com o ponto anterior e a média do balde seguinte
+        areas = np.abs((x[anterior] - media_x) * (y[a:b] - y[anterior]) -
+                       (x[anterior] - x[a:b]) * (media_y - y[anterior]))
+        anterior = a + int(np.argmax(areas))
+        indices[i + 1] = anterior
+
+    return indices
+
+
+# Função que reduz uma série (pandas, índice de datas ou numérico) a no máximo "pontos" pontos
+def reduzir_serie(serie, pontos, metodo='minmax'):
+
+    if metodo not in METODOS:
+        raise ValueError(f'Método desconhecido: {metodo}')
+
+    if len(serie) <= pontos:
+        return serie
+
+    valores = serie.to_numpy()
+    if metodo == 'minmax':
+        return serie.iloc[indices_minmax(valores, pontos)]
+
+    x = serie.index.asi8 if isinstance(serie.index, pd.DatetimeIndex) else np.asarray(serie.index, dtype=np.float64)
+    return serie.iloc[indices_lttb(x, valores, pontos)]
@@ -0,0 +1,170 @@
+# ==============================================================================================================#
+#        FOCOS DE TODOS OS SATÉLITES: DETECÇÕES REPETIDAS DO MESMO FOGO E CUBO DE CONTAGENS POR SATÉLITE
+# ==============================================================================================================#
+# Os arquivos mensais do INPE trazem os focos de todos os satélites (AQUA, TERRA, NOAA-20, NPP-375, GOES...) e o
+# mesmo fogo costuma ser detectado por mais de um deles em passagens próximas. Uma detecção é marcada como
+# repetida ("duplicata") quando um satélite de maior prioridade detectou um foco a até TOLERANCIA_KM dela, com
+# até TOLERANCIA_MINUTOS de diferença. A prioridade é do satélite de referência (AQUA_M-T) e depois a ordem
+# alfabética; detecções do mesmo satélite nunca são repetidas (são pixels diferentes). Os pares são procurados
+# com o hash espaço-tempo de queimadas.vizinhos, em lotes, sem comparar todos os focos com todos.
+#
+# A ingestão marca cada arquivo mensal separadamente: duas detecções do mesmo fogo dos dois lados da virada do mês
+# (a até TOLERANCIA_MINUTOS da meia-noite GMT do dia 1º) não formam par e as duas contam em "todos".
+#
+# Estrutura em disco (gerada por "python -m queimadas.ingestao --satelites"):
+#
+#   dados/satelites/focos/ano=2024/focos.parquet   todas as detecções, com as colunas "satelite" e "duplicata"
+#   dados/satelites/cubo/ano=2024/cubo.parquet     por (dia, estado, bioma, município, satélite): "focos" (todas
+#                                                   as detecções) e "unicos" (sem as repetidas)
+#
+# As séries de todos os satélites (TODOS_SATELITES) somam "unicos"; as de um satélite somam os "focos" dele.
+# ==============================================================================================================#
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from queimadas.armazenamento import ARQUIVO_PARTICAO, DIRETORIO_DADOS, ESQUEMA, ler_particoes, normalizar_focos
+from queimadas.cubo import ARQUIVO_CUBO, DIMENSOES, ESQUEMA_CUBO
+from queimadas.vizinhos import pares_proximos
+
+DIRETORIO_SATELITES = os.path.join(DIRETORIO_DADOS, 'satelites')
+DIRETORIO_FOCOS_SATELITES = os.path.join(DIRETORIO_SATELITES, 'focos')
+DIRETORIO_CUBO_SATELITES = os.path.join(DIRETORIO_SATELITES, 'cubo')
+
+# satélite de referência: o único dos arquivos anuais e o de maior prioridade entre as detecções repetidas
+SATELITE_REFERENCIA = 'AQUA_M-T'
+
+# valor do filtro de satélite que soma todos os satélites, sem as detecções repetidas
+TODOS_SATELITES = 'todos'
+
+# distância (km) e diferença de horário (minutos) máximas entre duas detecções do mesmo fogo
+TOLERANCIA_KM = 1.0
+TOLERANCIA_MINUTOS = 60
+
+DIMENSOES_SATELITES = DIMENSOES + ['satelite']
+
+ESQUEMA_SATELITES = pa.schema(list(ESQUEMA) + [('satelite', pa.dictionary(pa.int32(), pa.string())),
+                                               ('duplicata', pa.bool_())])
+
+# cubo de referência (data, estado, bioma, municipio) + satélite, focos e únicos
+ESQUEMA_CUBO_SATELITES = pa.schema(list(ESQUEMA_CUBO)[:-1] + [('satelite', pa.dictionary(pa.int32(), pa.string())),
+                                                              ('focos', pa.int32()), ('unicos', pa.int32())])
+
+
+# ==============================================================================================================#
+#                                         DETECÇÕES REPETIDAS
+# ==============================================================================================================#
+# Função que ordena os satélites pela prioridade: o de referência primeiro e os outros em ordem alfabética
+def ordem_prioridade(satelites):
+    return sorted(set(satelites), key=lambda satelite: (satelite != SATELITE_REFERENCIA, satelite))
+
+
+# Função que marca as detecções repetidas. "data" com o horário da detecção, "lat"/"lon" em graus e "satelite"
+# com o nome do satélite de cada foco. Retorna um array booleano (True = repetida). Só são comparados os focos
+# passados (na ingestão, os de um arquivo mensal).
+def marcar_duplicatas(data, lat, lon, satelite, tolerancia_km=TOLERANCIA_KM, tolerancia_minutos=TOLERANCIA_MINUTOS):
+
+    satelite = pd.Categorical(satelite)
+    minutos = pd.DatetimeIndex(data).as_unit('ns').asi8 // (60 * 10 ** 9)
+
+    # prioridade de cada foco (0 = maior)
+    ordem = ordem_prioridade(satelite.categories)
+    prioridade = np.array([ordem.index(valor) for valor in satelite.categories] + [len(ordem)])[satelite.codes]
+
+    duplicata = np.zeros(len(minutos), dtype=bool)
+    for i, j in pares_proximos(minutos, lat, lon, tolerancia_km, tolerancia_minutos):
+        diferentes = prioridade[i] != prioridade[j]
+        i, j = i[diferentes], j[diferentes]
+
+        # no par, a detecção do satélite de menor prioridade é a repetida
+        duplicata[np.where(prioridade[i] > prioridade[j], i, j)] = True
+
+    return duplicata
+
+
+# Função que padroniza os tipos de um dataframe de focos de todos os satélites (colunas de
+# queimadas.armazenamento.normalizar_focos mais "satelite" e "duplicata")
+def normalizar_satelites(df):
+
+    if 'data' not in df.columns:
+        df = df.reset_index()
+
+    # a ordem de data é a de normalizar_focos (ordenação estável), então as colunas extras ficam alinhadas
+    df = df.assign(data=pd.to_datetime(df['data'])).sort_values('data', kind='stable', ignore_index=True)
+
+    focos = normalizar_focos(df)
+    focos['satelite'] = df['satelite'].astype('category')
+    focos['duplicata'] = df['duplicata'].astype(bool)
+
+    return focos
+
+
+# ==============================================================================================================#
+#                                          CUBO POR SATÉLITE
+# ==============================================================================================================#
+# Função que monta o cubo por satélite a partir dos focos (índice "data" e colunas de DIMENSOES_SATELITES e
+# "duplicata")
+def construir_cubo_satelites(df):
+
+    dia = df.index.floor('D').rename('data')
+    unico = (~df['duplicata'].to_numpy(bool)).astype(np.int32)
+
+    grupos = pd.Series(unico, index=df.index).groupby([dia] + [df[coluna] for coluna in DIMENSOES_SATELITES],
+                                                      observed=True, dropna=False, sort=True)
+    cubo = grupos.agg(['size', 'sum']).rename(columns={'size': 'focos', 'sum': 'unicos'})
+    cubo = cubo.astype(np.int32).reset_index()
+
+    for coluna in DIMENSOES_SATELITES:
+        cubo[coluna] = cubo[coluna].astype('category')
+
+    return cubo
+
+
+# Função que carrega o cubo por satélite dos anos pedidos (vazio se a ingestão de todos os satélites ainda não
+# foi feita)
+def carregar_cubo_satelites(anos=None, diretorio=DIRETORIO_CUBO_SATELITES):
+
+    cubo = ler_particoes(diretorio, ESQUEMA_CUBO_SATELITES.names, anos, ESQUEMA_CUBO_SATELITES, ARQUIVO_CUBO)
+
+    if cubo is None:
+        return ESQUEMA_CUBO_SATELITES.empty_table().to_pandas()
+
+    return cubo
+
+
+# Função que carrega os focos de todos os satélites dos anos pedidos (data no índice)
+def carregar_focos_satelites(anos=None, diretorio=DIRETORIO_FOCOS_SATELITES):
+
+    df = ler_particoes(diretorio, ESQUEMA_SATELITES.names, anos, ESQUEMA_SATELITES, ARQUIVO_PARTICAO)
+    if df is None:
+        df = ESQUEMA_SATELITES.empty_table().to_pandas()
+
+    return df.set_index('data')
+
+
+# ==============================================================================================================#
+#                                    CONSULTAS (sobre o cubo já filtrado)
+# ==============================================================================================================#
+# Função que deixa no cubo por satélite só as contagens do satélite pedido, na coluna "focos" (TODOS_SATELITES:
+# todas as detecções sem as repetidas), no formato do cubo de referência
+def filtrar_satelite(cubo, satelite):
+
+    if satelite == TODOS_SATELITES:
+        return cubo.assign(focos=cubo['unicos'])
+
+    return cubo[(cubo['satelite'] == satelite).to_numpy()]
+
+
+# Função que soma os focos por mês e satélite (uma coluna por satélite, na ordem de prioridade, e a coluna
+# TODOS_SATELITES sem as detecções repetidas)
+def serie_satelites(cubo):
+
+    mes = pd.DatetimeIndex(cubo['data'].to_numpy().astype('datetime64[M]'), name='data')
+
+    tabela = cubo.groupby([mes, cubo['satelite']], observed=True)['focos'].sum().unstack(fill_value=0)
+    tabela = tabela.reindex(columns=ordem_prioridade(tabela.columns.astype(str)))
+    tabela[TODOS_SATELITES] = cubo.groupby(mes)['unicos'].sum()
+
+    return tabela
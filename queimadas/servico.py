@@ -0,0 +1,366 @@
+# ==============================================================================================================#
+#                  SERVIÇO DE CONSULTAS DOS FOCOS DE CALOR (INDEPENDENTE DO STREAMLIT)
+# ==============================================================================================================#
+# Reúne o acesso aos dados (cubo de contagens diárias e focos individuais, carregados sob demanda) e as
+# agregações usadas pelos painéis: séries diária/mensal/anual, climatologia mensal, rankings de municípios e
+# biomas, focos agrupados para o mapa e eventos de fogo (queimadas.eventos). As séries e os rankings também podem
+# vir do cubo de todos os satélites (queimadas.satelites), de um satélite ou de todos sem as detecções repetidas.
+# Os resultados ficam no cache LRU do serviço. As séries mensal e anual (e a climatologia) saem da série diária
+# já calculada: os quatro painéis temporais fazem uma única leitura do cubo. Quando a ingestão (de qualquer
+# processo) regrava os arquivos de dados, o serviço descarta o que carregou deles e os resultados do cache (ver
+# "verificar_dados"). É usado pelo app e pela API HTTP (queimadas.api), e pode ser importado por outros serviços:
+#
+#   from queimadas.servico import ServicoFocos
+#   servico = ServicoFocos()
+#   servico.consultar('mensal', 'PARÁ', '2020-01-01', '2020-12-31')
+# ==============================================================================================================#
+import os
+import threading
+import time
+
+import pandas as pd
+
+from queimadas.armazenamento import ARQUIVO_PARTICAO, DIRETORIO_FOCOS, anos_disponiveis, carregar_focos
+from queimadas.cache import CacheLRU
+from queimadas.colunas import ARQUIVO_ATUAL, DIRETORIO_COLUNAS, ColunasFocos, existe_colunas
+from queimadas.consulta import IndiceFocos
+from queimadas.instrumentacao import contar, registrar, trecho
+from queimadas.cubo import (ARQUIVO_CUBO, DIRETORIO_CUBO, carregar_cubo, climatologia_mensal, serie_diaria,
+                            top_biomas, top_municipios)
+from queimadas.eventos import ARQUIVO_EVENTOS, DIRETORIO_EVENTOS, carregar_eventos, existe_eventos, filtrar_eventos
+from queimadas.mapa import ZOOM_INICIAL, agrupar_focos
+from queimadas.rankings import ARQUIVO_RANKINGS, DIRETORIO_RANKINGS, RankingsFocos, existe_rankings, meses_inteiros
+from queimadas.satelites import (DIMENSOES_SATELITES, DIRETORIO_CUBO_SATELITES, carregar_cubo_satelites,
+                                 filtrar_satelite, ordem_prioridade, serie_satelites)
+
+GRANULARIDADES = ('diaria', 'mensal', 'anual', 'climatologia', 'municipios', 'biomas', 'mapa', 'eventos', 'satelites')
+
+# granularidades que aceitam o filtro de satélite (nome do satélite ou TODOS_SATELITES)
+GRANULARIDADES_SATELITE = ('diaria', 'mensal', 'anual', 'climatologia', 'municipios', 'biomas')
+
+# séries obtidas da série diária: granularidade -> frequência do resample
+REAMOSTRAGENS = {'mensal': 'MS', 'anual': 'YS'}
+
+# intervalo mínimo, em segundos, entre duas verificações dos arquivos de dados (ver "verificar_dados")
+INTERVALO_VERIFICACAO = float(os.environ.get('QUEIMADAS_INTERVALO_VERIFICACAO', 5))
+
+
+class ServicoFocos:
+
+    def __init__(self, cache=None, diretorio_cubo=DIRETORIO_CUBO, diretorio_focos=DIRETORIO_FOCOS,
+                 diretorio_colunas=DIRETORIO_COLUNAS, diretorio_rankings=DIRETORIO_RANKINGS,
+                 diretorio_eventos=DIRETORIO_EVENTOS, diretorio_cubo_satelites=DIRETORIO_CUBO_SATELITES,
+                 intervalo_verificacao=INTERVALO_VERIFICACAO):
+        self.cache = CacheLRU() if cache is None else cache
+        self.diretorio_cubo = diretorio_cubo
+        self.diretorio_focos = diretorio_focos
+        self.diretorio_colunas = diretorio_colunas
+        self.diretorio_rankings = diretorio_rankings
+        self.diretorio_eventos = diretorio_eventos
+        self.diretorio_cubo_satelites = diretorio_cubo_satelites
+        self._trava = threading.Lock()
+        self._colunas = None
+        self._rankings = None
+        self._eventos = None
+
+        # índices do cubo, dos focos e do cubo por satélite: nome -> (anos já carregados, IndiceFocos)
+        self._indices = {}
+
+        # estado dos arquivos de dados na última verificação (ver "verificar_dados")
+        self.intervalo_verificacao = intervalo_verificacao
+        self._assinatura = self._assinatura_dados()
+        self._verificado = time.monotonic()
+
+    # cubo de contagens diárias indexado por estado e data, com todos os anos
+    @property
+    def cubo(self):
+        return self.indice('cubo')
+
+    # focos individuais (lat/lon) indexados por estado e data, com todos os anos, usados só pelo mapa
+    @property
+    def focos(self):
+        return self.focos_intervalo()
+
+    # Função que retorna os focos do mapa cobrindo [data_inicial, data_final]. Quando as colunas mapeadas em
+    # memória existem, são abertas sem cópia (compartilhadas entre processos); senão o Parquet é carregado.
+    def focos_intervalo(self, data_inicial=None, data_final=None):
+
+        if self._colunas is None and existe_colunas(self.diretorio_colunas):
+            with self._trava:
+                if self._colunas is None:
+                    self._colunas = ColunasFocos(self.diretorio_colunas)
+
+        if self._colunas is not None:
+            return self._colunas
+
+        return self.indice('focos', data_inicial, data_final)
+
+    # Função que retorna o índice do cubo ("cubo"), dos focos ("focos") ou do cubo por satélite ("satelites") com
+    # as partições dos anos de
+    # [data_inicial, data_final] carregadas. Os anos são lidos na primeira consulta que precisa deles e o índice
+    # só é refeito quando entra um ano novo.
+    def indice(self, nome, data_inicial=None, data_final=None):
+
+        diretorio, arquivo = self._particoes()[nome]
+
+        # sem partições (cubo ainda não gerado ou só os CSVs antigos), tudo é carregado de uma vez
+        disponiveis = anos_disponiveis(diretorio, arquivo)
+        anos = {ano for ano in disponiveis if _ano_no_intervalo(ano, data_inicial, data_final)}
+
+        carregados, indice = self._indices.get(nome, (set(), None))
+        if indice is not None and anos <= carregados:
+            return indice
+
+        # intervalo sem nenhuma partição (ex.: 2002, antes do primeiro ano gravado): nada é lido e o índice não
+        # muda. Responde um índice vazio (nenhum ano carregado ainda) ou o já carregado, sem dados no intervalo.
+        if disponiveis and not anos:
+            return indice if indice is not None else self._indice_vazio(nome)
+
+        with self._trava:
+            carregados, indice = self._indices.get(nome, (set(), None))
+            faltando = sorted(anos - carregados)
+
+            if indice is None or faltando:
+                with trecho('carga', dados=nome, anos=len(faltando)):
+                    novos = self._carregar(nome, faltando if disponiveis else None)
+                    registrar(linhas=len(novos))
+                    if indice is not None:
+                        novos = _juntar(indice.df, novos)
+                    indice = IndiceFocos(novos, dimensoes=() if nome == 'focos' else ('bioma', 'municipio'))
+                self._indices[nome] = (carregados | set(faltando), indice)
+
+        return indice
+
+    # rankings pré-calculados de municípios e biomas (None se ainda não foram gerados)
+    @property
+    def rankings(self):
+
+        if self._rankings is None and existe_rankings(self.diretorio_rankings):
+            with self._trava:
+                if self._rankings is None:
+                    self._rankings = RankingsFocos(self.diretorio_rankings)
+
+        return self._rankings
+
+    # tabela dos eventos de fogo, uma linha por evento (None se ainda não foi gerada)
+    @property
+    def eventos(self):
+
+        if self._eventos is None and existe_eventos(self.diretorio_eventos):
+            with self._trava:
+                if self._eventos is None:
+                    with trecho('carga', dados='eventos'):
+                        self._eventos = carregar_eventos(self.diretorio_eventos)
+                        registrar(linhas=len(self._eventos))
+
+        return self._eventos
+
+    # Função que confere (no máximo a cada "intervalo_verificacao" segundos) se os arquivos de dados mudaram
+    # desde a última verificação: ATUAL das colunas, rankings, eventos e partições do cubo, dos focos e do cubo
+    # por satélite. O que foi carregado de um arquivo alterado é descartado, e os resultados do cache também.
+    # Assim as réplicas que não fizeram a ingestão passam a ler a versão nova na consulta seguinte.
+    def verificar_dados(self):
+
+        agora = time.monotonic()
+        if agora - self._verificado < self.intervalo_verificacao:
+            return
+        self._verificado = agora
+
+        assinatura = self._assinatura_dados()
+        with self._trava:
+            alterados = {nome for nome, valor in assinatura.items() if valor != self._assinatura[nome]}
+            if not alterados:
+                return
+
+            self._assinatura = assinatura
+            if 'colunas' in alterados:
+                self._colunas = None
+            if 'rankings' in alterados:
+                self._rankings = None
+            if 'eventos' in alterados:
+                self._eventos = None
+            for nome in alterados & set(self._indices):
+                del self._indices[nome]
+
+        contar('recargas_dados')
+        self.cache.limpar()
+
+    # Função que retorna o estado (modificação, inode e tamanho) de cada arquivo de dados lido pelo serviço
+    def _assinatura_dados(self):
+
+        assinatura = {'colunas': _estado_arquivo(os.path.join(self.diretorio_colunas, ARQUIVO_ATUAL)),
+                      'rankings': _estado_arquivo(os.path.join(self.diretorio_rankings, ARQUIVO_RANKINGS)),
+                      'eventos': _estado_arquivo(os.path.join(self.diretorio_eventos, ARQUIVO_EVENTOS))}
+
+        for nome, (diretorio, arquivo) in self._particoes().items():
+            assinatura[nome] = tuple((ano, _estado_arquivo(os.path.join(diretorio, f'ano={ano}', arquivo)))
+                                     for ano in anos_disponiveis(diretorio, arquivo))
+
+        return assinatura
+
+    # diretório e nome do arquivo das partições de cada índice
+    def _particoes(self):
+        return {'cubo': (self.diretorio_cubo, ARQUIVO_CUBO),
+                'focos': (self.diretorio_focos, ARQUIVO_PARTICAO),
+                'satelites': (self.diretorio_cubo_satelites, ARQUIVO_CUBO)}
+
+    def _indice_vazio(self, nome):
+        return IndiceFocos(self._carregar(nome, []), dimensoes=() if nome == 'focos' else ('bioma', 'municipio'))
+
+    def _carregar(self, nome, anos):
+
+        if nome == 'cubo':
+            return carregar_cubo(anos, self.diretorio_cubo)
+        if nome == 'satelites':
+            return carregar_cubo_satelites(anos, self.diretorio_cubo_satelites)
+
+        return carregar_focos(colunas=['lat', 'lon', 'estado'], anos=anos, diretorio=self.diretorio_focos)
+
+    # lista dos estados, em ordem alfabética (dos metadados das colunas mapeadas em memória ou dos rankings, sem
+    # carregar o cubo, se existirem)
+    def estados(self):
+
+        self.verificar_dados()
+        if existe_colunas(self.diretorio_colunas):
+            return self.focos_intervalo().estados
+        if self.rankings is not None:
+            return self.rankings.estados
+
+        return self.cubo.estados
+
+    # lista dos satélites do cubo por satélite, na ordem de prioridade (vazia se a ingestão de todos os satélites
+    # não foi feita)
+    def satelites(self):
+
+        self.verificar_dados()
+        if not anos_disponiveis(self.diretorio_cubo_satelites, ARQUIVO_CUBO):
+            return []
+
+        return ordem_prioridade(self.indice('satelites').df['satelite'].dropna().unique())
+
+    # Função que retorna o resultado de uma consulta para um estado e intervalo de datas (inclusivo).
+    # Granularidades: "diaria", "mensal", "anual", "climatologia", "municipios" e "biomas" (rankings completos),
+    # "mapa" (focos agrupados; "parametros" é o zoom) e "eventos" (eventos de fogo com algum dia no intervalo e
+    # estado predominante igual ao pedido; "parametros" é o bioma, opcional) e "satelites" (focos por mês de cada
+    # satélite). Nas de GRANULARIDADES_SATELITE "parametros" é o satélite, opcional (sem ele as consultas usam o
+    # satélite de referência). O resultado é compartilhado: somente leitura.
+    def consultar(self, granularidade, estado, data_inicial=None, data_final=None, *parametros):
+
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f'Granularidade desconhecida: {granularidade}')
+
+        self.verificar_dados()
+        chave = (granularidade, estado, _data(data_inicial), _data(data_final)) + parametros
+        with trecho('consulta', granularidade=granularidade):
+            return self.cache.obter_ou_calcular(chave, lambda: self.calcular(*chave))
+
+    def calcular(self, granularidade, estado, data_inicial, data_final, *parametros):
+
+        if granularidade == 'climatologia':
+            return climatologia_mensal(self.consultar('mensal', estado, data_inicial, data_final, *parametros))
+
+        if granularidade in REAMOSTRAGENS:
+            diaria = self.consultar('diaria', estado, data_inicial, data_final, *parametros)
+            return diaria.resample(REAMOSTRAGENS[granularidade]).sum()
+
+        if granularidade == 'mapa':
+            focos = self.focos_intervalo(data_inicial, data_final).filtrar(estado, data_inicial, data_final)
+            _linhas_lidas(len(focos))
+            return agrupar_focos(focos['lat'].to_numpy(), focos['lon'].to_numpy(), *(parametros or (ZOOM_INICIAL,)))
+
+        if granularidade == 'eventos':
+            if self.eventos is None:
+                raise ValueError('Eventos de fogo ainda não foram gerados (python -m queimadas.eventos)')
+            eventos = filtrar_eventos(self.eventos, estado, data_inicial, data_final, *parametros)
+            _linhas_lidas(len(eventos))
+            return eventos
+
+        if granularidade == 'satelites':
+            cubo = self.indice('satelites', data_inicial, data_final).filtrar(estado, data_inicial, data_final)
+            _linhas_lidas(len(cubo))
+            return serie_satelites(cubo)
+
+        if granularidade in ('municipios', 'biomas') and self.rankings is not None and not parametros:
+            ranking = self.calcular_ranking(granularidade, estado, data_inicial, data_final)
+            if ranking is not None:
+                return ranking
+
+        cubo_filtrado = self.filtrar_cubo(estado, data_inicial, data_final, *parametros)
+        _linhas_lidas(len(cubo_filtrado))
+
+        if granularidade == 'diaria':
+            return serie_diaria(cubo_filtrado)
+        if granularidade == 'municipios':
+            return top_municipios(cubo_filtrado, None)
+
+        return top_biomas(cubo_filtrado, None)
+
+    # Função que monta o ranking de municípios ou biomas pelas tabelas pré-calculadas: meses e anos inteiros vêm
+    # prontos e só os dias soltos das bordas do intervalo são lidos do cubo
+    def calcular_ranking(self, granularidade, estado, data_inicial, data_final):
+
+        (mes_inicial, mes_final), bordas = meses_inteiros(data_inicial, data_final)
+        parciais = [self.indice('cubo', inicio, fim).filtrar(estado, inicio, fim) for inicio, fim in bordas]
+        _linhas_lidas(sum(len(parcial) for parcial in parciais))
+
+        dimensao = 'municipio' if granularidade == 'municipios' else 'bioma'
+        return self.rankings.top(dimensao, estado, mes_inicial, mes_final, parciais)
+
+    # Função que filtra o cubo de referência (satelite=None) ou o cubo por satélite, com as contagens do satélite
+    # pedido (ou de todos sem as detecções repetidas) na coluna "focos"
+    def filtrar_cubo(self, estado, data_inicial, data_final, satelite=None):
+
+        if satelite is None:
+            return self.indice('cubo', data_inicial, data_final).filtrar(estado, data_inicial, data_final)
+
+        cubo = self.indice('satelites', data_inicial, data_final).filtrar(estado, data_inicial, data_final)
+        return filtrar_satelite(cubo, satelite)
+
+
+# Função que padroniza as datas da chave do cache (texto, date ou Timestamp viram date)
+def _data(data):
+    return None if data is None else pd.Timestamp(data).date()
+
+
+# Função que retorna (modificação, inode, tamanho) de um arquivo, ou None se ele não existe. As gravações trocam
+# o arquivo com os.replace, então uma versão nova sempre muda o inode.
+def _estado_arquivo(caminho):
+
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+
+    return estado.st_mtime_ns, estado.st_ino, estado.st_size
+
+
+# Função que registra as linhas lidas por uma consulta (no trecho corrente e no contador do processo)
+def _linhas_lidas(linhas):
+    registrar(linhas=linhas)
+    contar('linhas_lidas', linhas)
+
+
+# Função que informa se o ano tem algum dia em [data_inicial, data_final] (datas vazias não limitam)
+def _ano_no_intervalo(ano, data_inicial, data_final):
+    return (data_inicial is None or ano >= pd.Timestamp(data_inicial).year) and \
+        (data_final is None or ano <= pd.Timestamp(data_final).year)
+
+
+# Função que junta os dados já carregados com os de anos novos, mantendo as colunas categóricas
+def _juntar(carregados, novos):
+
+    # dicionário comum (união das categorias): os códigos são refeitos sem voltar aos textos de cada linha
+    for coluna in DIMENSOES_SATELITES:
+        if coluna in carregados.columns and coluna in novos.columns and \
+                isinstance(carregados[coluna].dtype, pd.CategoricalDtype) and \
+                isinstance(novos[coluna].dtype, pd.CategoricalDtype):
+            categorias = carregados[coluna].cat.categories.union(novos[coluna].cat.categories)
+            carregados = carregados.assign(**{coluna: carregados[coluna].cat.set_categories(categorias)})
+            novos = novos.assign(**{coluna: novos[coluna].cat.set_categories(categorias)})
+
+    df = pd.concat([carregados, novos])
+    for coluna in DIMENSOES_SATELITES:
+        if coluna in df.columns and not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].astype('category')
+
+    return df
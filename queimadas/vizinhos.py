@@ -0,0 +1,91 @@
+# ==============================================================================================================#
+#                  PARES DE FOCOS PRÓXIMOS NO ESPAÇO E NO TEMPO (HASH ESPAÇO-TEMPO, SEM COMPARAR TODOS)
+# ==============================================================================================================#
+# Usado pelos eventos de fogo (queimadas.eventos) e pela remoção das detecções repetidas entre satélites
+# (queimadas.satelites). Cada foco cai numa célula (lon, lat, tempo) com lado de "raio_km" no espaço e de
+# "janela" no tempo, então os vizinhos possíveis estão na mesma célula ou nas adjacentes (3 x 3 no espaço, a
+# própria célula ou a seguinte no tempo). Os pares candidatos saem de buscas binárias nas chaves ordenadas e
+# passam pelo teste exato da distância e do intervalo de tempo.
+#
+# Os pares são gerados em lotes de LOTE_PARES focos: a memória fica limitada mesmo com dezenas de milhões de
+# focos, e cada lote pode ser consumido (união, marcação) antes de gerar o seguinte.
+# ==============================================================================================================#
+import numpy as np
+
+KM_POR_GRAU = 111.32
+
+# focos por lote na busca dos pares candidatos (limita a memória dos arrays de pares)
+LOTE_PARES = 2_000_000
+
+
+# Função (geradora) que retorna, em lotes, os pares (i, j) de focos a até "raio_km" um do outro e com tempos a
+# até "janela" de distância (|tempo[i] - tempo[j]| <= janela). "tempo" são inteiros (dias, minutos...), "lat" e
+# "lon" em graus. Cada par aparece uma única vez, em qualquer ordem.
+def pares_proximos(tempo, lat, lon, raio_km, janela=0):
+
+    tempo = np.asarray(tempo, dtype=np.int64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    n = len(tempo)
+    if not n:
+        return
+
+    # células com lado >= raio (na longitude, na latitude mais afastada do equador) e >= janela no tempo
+    lado_lat = raio_km / KM_POR_GRAU
+    lado_lon = lado_lat / np.cos(np.radians(min(float(np.abs(lat).max()), 89.0)))
+    lado_tempo = max(int(janela), 1)
+
+    # chave inteira (coluna, linha, tempo), com uma célula de folga nas bordas para os deslocamentos
+    ix = np.floor((lon - lon.min()) / lado_lon).astype(np.int64) + 1
+    iy = np.floor((lat - lat.min()) / lado_lat).astype(np.int64) + 1
+    it = (tempo - tempo.min()) // lado_tempo
+    linhas, tempos = int(iy.max()) + 2, int(it.max()) + 2
+    chave = (ix * linhas + iy) * tempos + it
+
+    ordem = np.argsort(chave, kind='stable')
+    ordenada = chave[ordem]
+
+    for dx, dy, dt in _deslocamentos(janela > 0):
+        passo = (dx * linhas + dy) * tempos + dt
+
+        # os focos são percorridos na ordem das chaves: as buscas binárias andam sempre para frente
+        for inicio in range(0, n, LOTE_PARES):
+            lote = slice(inicio, inicio + LOTE_PARES)
+            i, j = _candidatos(ordenada, ordem, ordenada[lote] + passo, ordem[lote])
+
+            # na própria célula cada par aparece duas vezes (e cada foco com ele mesmo)
+            if (dx, dy, dt) == (0, 0, 0):
+                i, j = i[i < j], j[i < j]
+
+            perto = (distancia2_km(lat[i], lon[i], lat[j], lon[j]) <= raio_km ** 2) & \
+                (np.abs(tempo[i] - tempo[j]) <= janela)
+            yield i[perto], j[perto]
+
+
+# Função que lista os deslocamentos (coluna, linha, tempo) das células vizinhas. Na mesma célula de tempo basta
+# metade das vizinhas (o par é encontrado a partir de um dos dois focos); na seguinte entram todas.
+def _deslocamentos(proxima_celula):
+    return [(dx, dy, dt) for dt in range(1 + proxima_celula) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            if dt > 0 or (dx, dy) >= (0, 0)]
+
+
+# Função que retorna os pares (origem, foco) com a chave do foco igual ao "alvo" de cada origem
+def _candidatos(ordenada, ordem, alvo, origem):
+
+    a = np.searchsorted(ordenada, alvo, 'left')
+    quantos = np.searchsorted(ordenada, alvo, 'right') - a
+
+    i = np.repeat(origem, quantos)
+    posicao = np.repeat(a - np.cumsum(quantos) + quantos, quantos) + np.arange(len(i))
+
+    return i, ordem[posicao]
+
+
+# Função que retorna o quadrado da distância (km²) entre os pontos (aproximação equirretangular, precisa para
+# distâncias de poucos km)
+def distancia2_km(lat1, lon1, lat2, lon2):
+
+    dy = (lat1 - lat2) * KM_POR_GRAU
+    dx = (lon1 - lon2) * KM_POR_GRAU * np.cos(np.radians((lat1 + lat2) / 2))
+
+    return dx * dx + dy * dy
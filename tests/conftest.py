@@ -0,0 +1,47 @@
+# ==============================================================================================================#
+#                                  DADOS SINTÉTICOS COMPARTILHADOS PELOS TESTES
+# ==============================================================================================================#
+# Os testes rodam a partir da raiz do repositório (python -m pytest -q) e usam os geradores de dados sintéticos
+# dos benchmarks, gravados em diretórios temporários (nunca em dados/).
+# ==============================================================================================================#
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+from benchmarks.sinteticos import GeradorFocos  # noqa: E402
+from queimadas.armazenamento import carregar_focos  # noqa: E402
+from queimadas.cubo import DIMENSOES, construir_cubo, salvar_cubo  # noqa: E402
+from queimadas.servico import ServicoFocos  # noqa: E402
+
+
+# focos e cubo sintéticos de 2003 a 2005 (diretórios "focos" e "cubo")
+@pytest.fixture(scope='session')
+def dados_sinteticos(tmp_path_factory):
+
+    diretorio = tmp_path_factory.mktemp('dados')
+    GeradorFocos(semente=0).gravar(20_000, str(diretorio / 'focos'), anos=range(2003, 2006))
+    salvar_cubo(construir_cubo(carregar_focos(colunas=DIMENSOES, diretorio=str(diretorio / 'focos'))),
+                str(diretorio / 'cubo'))
+
+    return diretorio
+
+
+# Função que cria serviços novos (cache vazio) só com os dados sintéticos: rankings, colunas e eventos ficam em
+# diretórios vazios, então as consultas vão ao cubo
+@pytest.fixture
+def novo_servico(dados_sinteticos):
+
+    def criar():
+        return ServicoFocos(diretorio_cubo=str(dados_sinteticos / 'cubo'),
+                            diretorio_focos=str(dados_sinteticos / 'focos'),
+                            diretorio_colunas=str(dados_sinteticos / 'colunas'),
+                            diretorio_rankings=str(dados_sinteticos / 'rankings'),
+                            diretorio_eventos=str(dados_sinteticos / 'eventos'),
+                            diretorio_cubo_satelites=str(dados_sinteticos / 'cubo_satelites'))
+
+    return criar
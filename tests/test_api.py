@@ -0,0 +1,27 @@
+import json
+from http import HTTPStatus
+
+import pytest
+
+from queimadas.api import ErroRequisicao, ServidorAPI
+
+
+@pytest.mark.parametrize('n', ['0', '-3'])
+@pytest.mark.parametrize('granularidade', ['municipios', 'biomas', 'eventos'])
+def test_n_menor_que_um_e_rejeitado(novo_servico, granularidade, n):
+
+    api = ServidorAPI(novo_servico())
+
+    with pytest.raises(ErroRequisicao) as erro:
+        api.responder(f'/consulta/{granularidade}', {'estado': ['PARÁ'], 'n': [n]})
+
+    assert erro.value.status == HTTPStatus.BAD_REQUEST
+
+
+def test_n_limita_o_ranking(novo_servico):
+
+    api = ServidorAPI(novo_servico())
+    parametros = {'estado': ['PARÁ'], 'inicio': ['2004-01-01'], 'fim': ['2004-12-31']}
+
+    assert len(json.loads(api.responder('/consulta/municipios', parametros))['dados']) == 5
+    assert len(json.loads(api.responder('/consulta/municipios', {**parametros, 'n': ['2']}))['dados']) == 2
@@ -0,0 +1,68 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from app_chirps.cache_chirps import CacheChirps
+from benchmarks.sinteticos import ClienteEEFalso
+
+# grade pequena (4 x 4 células de 0.5°)
+GRADE = {'lat_min': -10.0, 'lat_max': -8.0, 'lon_min': -50.0, 'lon_max': -48.0, 'resolucao': 0.5}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheChirps(str(tmp_path / 'cache'), GRADE)
+
+
+def test_dia_no_cache_nao_chama_o_earth_engine(cache):
+
+    dia = datetime.date(2023, 6, 15)
+    grade = np.arange(16, dtype=np.float32).reshape(4, 4)
+    cache.gravar(dia, grade)
+
+    cliente = ClienteEEFalso()
+    assert cache.preencher(dia, dia, cliente) == []
+    assert cliente.chamadas == 0
+    np.testing.assert_array_equal(cache.ler(dia), grade)
+
+
+def test_dia_faltando_e_baixado_e_gravado(cache):
+
+    cliente = ClienteEEFalso(ultimo_dia=datetime.date(2024, 1, 1))
+    gravados = cache.preencher(datetime.date(2023, 12, 30), datetime.date(2024, 1, 2), cliente)
+
+    # um pedido por ano (size + computePixels); o dia ainda não publicado fica fora do cache
+    assert gravados == [datetime.date(2023, 12, 30), datetime.date(2023, 12, 31), datetime.date(2024, 1, 1)]
+    assert cliente.chamadas == 4
+    assert not cache.contem(datetime.date(2024, 1, 2))
+
+    # linha 0 ao sul e VALOR_AUSENTE como NaN
+    grade = cache.ler(datetime.date(2023, 12, 31))
+    assert np.isnan(grade[:, 0]).all()
+    np.testing.assert_array_equal(grade[:, 1:], 31)
+
+    # na segunda vez só o dia que faltava é pedido
+    cliente.ultimo_dia = datetime.date(2024, 1, 2)
+    assert cache.preencher(datetime.date(2023, 12, 30), datetime.date(2024, 1, 2), cliente) == \
+        [datetime.date(2024, 1, 1), datetime.date(2024, 1, 2)]
+    assert cliente.chamadas == 6
+
+
+def test_mascara_de_dias_em_anos_parciais(cache):
+
+    # 28/02 a 01/03 de um ano bissexto
+    cache.gravar(datetime.date(2024, 2, 28), np.ones((3, 4, 4), dtype=np.float32))
+
+    dias = cache.dias_preenchidos(2024)
+    assert len(dias) == 366
+    assert np.flatnonzero(dias).tolist() == [58, 59, 60]
+    assert len(cache.dias_preenchidos(2023)) == 365 and not cache.dias_preenchidos(2023).any()
+
+    assert cache.anos() == [2024]
+    assert cache.ler(datetime.date(2024, 2, 27)) is None
+    assert cache.ultimo_dia_disponivel(datetime.date(2024, 3, 10)) == datetime.date(2024, 3, 1)
+
+    acumulado, preenchidos = cache.acumulado(datetime.date(2024, 2, 1), datetime.date(2024, 3, 31))
+    assert preenchidos == 3
+    np.testing.assert_array_equal(acumulado, 3)
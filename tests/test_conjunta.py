@@ -0,0 +1,88 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from app_chirps.cache_chirps import CacheChirps
+from queimadas.conjunta import JANELAS, chuva_antecedente
+from queimadas.grade import Grade
+
+# grade pequena (4 x 4 células de 0.5°), a mesma no cache e nos focos
+GRADE = Grade(-10.0, -8.0, -50.0, -48.0, 0.5)
+
+INICIO = datetime.date(2022, 9, 1)
+FIM = datetime.date(2023, 12, 31)
+
+# dia sem dado no cache: 47 dias antes de 01/01/2023
+FALTANDO = datetime.date(2022, 11, 15)
+
+
+# precipitação de um dia: o número de dias desde INICIO (a mesma em todas as células)
+def _chuva(dia):
+    return float((dia - INICIO).days)
+
+
+# cache de 01/09/2022 a 31/12/2023 sem FALTANDO e com a célula (0, 0) fora do Brasil
+@pytest.fixture
+def diretorio(tmp_path):
+
+    cache = CacheChirps(str(tmp_path / 'cache'), dict(zip(('lat_min', 'lat_max', 'lon_min', 'lon_max', 'resolucao'),
+                                                          GRADE.parametros())))
+    dia = INICIO
+    while dia <= FIM:
+        if dia != FALTANDO:
+            grade = np.full((GRADE.ny, GRADE.nx), _chuva(dia), dtype=np.float32)
+            grade[0, 0] = np.nan
+            cache.gravar(dia, grade)
+        dia += datetime.timedelta(days=1)
+
+    return cache.diretorio
+
+
+# acumulado de [dia - janela, dia) somando dia a dia (None se falta algum dia)
+def _esperado(dia, janela):
+
+    dias = [dia - datetime.timedelta(days=i) for i in range(1, janela + 1)]
+    if FALTANDO in dias or dias[-1] < INICIO:
+        return None
+
+    return sum(_chuva(d) for d in dias)
+
+
+def test_janelas_de_janeiro_pegam_o_ano_anterior(diretorio):
+
+    chuva = chuva_antecedente([2023], JANELAS, diretorio, GRADE)[0]
+
+    # janeiro: 30 dias (02/12 a 31/12) completos; 60 e 90 dias passam por FALTANDO
+    janeiro = chuva[0, :, 1, 1]
+    assert janeiro[0] == pytest.approx(_esperado(datetime.date(2023, 1, 1), 30))
+    assert np.isnan(janeiro[1:]).all()
+
+    # 90 dias antes de 01/04/2023: 01/01 a 31/03, todos no cache
+    assert chuva[3, 2, 1, 1] == pytest.approx(_esperado(datetime.date(2023, 4, 1), 90))
+
+    _conferir(chuva, 2023)
+
+
+def test_ano_sem_dias_anteriores_no_cache(diretorio):
+
+    # janeiro de 2022 precisa de dias de 2021, que não estão no cache
+    chuva = chuva_antecedente([2022], JANELAS, diretorio, GRADE)[0]
+
+    assert np.isnan(chuva[:9]).all()
+    assert np.isfinite(chuva[9, 0, 1, 1])
+    _conferir(chuva, 2022)
+
+
+# confere todos os meses e janelas de um ano com a soma dia a dia
+def _conferir(chuva, ano):
+
+    for mes in range(1, 13):
+        for k, janela in enumerate(JANELAS):
+            esperado = _esperado(datetime.date(ano, mes, 1), janela)
+            campo = chuva[mes - 1, k]
+            assert np.isnan(campo[0, 0])
+            if esperado is None:
+                assert np.isnan(campo).all()
+            else:
+                np.testing.assert_allclose(campo[1:, 1:], esperado, rtol=1e-6)
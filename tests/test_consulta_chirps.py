@@ -0,0 +1,37 @@
+import datetime
+
+from app_chirps.consulta_chirps import JANELA_DIAS, ConsultaChirps
+from benchmarks.sinteticos import ClienteEEFalso
+
+DIA = datetime.date(2023, 12, 20)
+
+
+def test_dia_com_dados_em_uma_chamada():
+
+    cliente = ClienteEEFalso(ultimo_dia=datetime.date(2023, 12, 31))
+    consulta = ConsultaChirps(cliente)
+
+    assert consulta.dia_mais_recente(DIA) == (DIA, 2.5, 80.0)
+    assert consulta.chamadas == cliente.chamadas == 1
+
+
+def test_volta_para_o_dia_anterior_com_dados_na_mesma_chamada():
+
+    cliente = ClienteEEFalso(ultimo_dia=DIA - datetime.timedelta(days=5))
+    consulta = ConsultaChirps(cliente)
+
+    assert consulta.dia_mais_recente(DIA) == (DIA - datetime.timedelta(days=5), 2.5, 80.0)
+    assert consulta.chamadas == cliente.chamadas == 1
+
+
+def test_janela_sem_dados():
+
+    cliente = ClienteEEFalso(ultimo_dia=DIA - datetime.timedelta(days=JANELA_DIAS + 1))
+    consulta = ConsultaChirps(cliente)
+
+    assert consulta.dia_mais_recente(DIA) is None
+    assert consulta.chamadas == cliente.chamadas == 1
+
+    # a janela vai até JANELA_DIAS dias antes da data
+    cliente.ultimo_dia = DIA - datetime.timedelta(days=JANELA_DIAS)
+    assert consulta.dia_mais_recente(DIA)[0] == cliente.ultimo_dia
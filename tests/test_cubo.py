@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from queimadas.cubo import carregar_cubo, construir_cubo, salvar_cubo, serie_diaria, top_municipios
+from queimadas.rankings import RankingsFocos, construir_rankings, meses_inteiros, salvar_rankings
+from queimadas.satelites import construir_cubo_satelites
+
+
+# focos de dois dias com bioma e município nulos em algumas linhas (acontece nos arquivos do INPE)
+def _focos():
+
+    datas = pd.to_datetime(['2020-01-10 10:00', '2020-01-10 12:00', '2020-01-10 15:00', '2020-02-03 01:00',
+                            '2020-02-03 02:00'])
+    df = pd.DataFrame({'estado': ['PARÁ', 'PARÁ', 'PARÁ', 'PARÁ', 'MATO GROSSO'],
+                       'bioma': ['AMAZÔNIA', None, 'AMAZÔNIA', None, 'CERRADO'],
+                       'municipio': ['ALTAMIRA', 'ALTAMIRA', None, None, 'SORRISO'],
+                       'satelite': ['AQUA_M-T', 'AQUA_M-T', 'NOAA-20', 'AQUA_M-T', 'AQUA_M-T'],
+                       'duplicata': [False, False, True, False, False]},
+                      index=pd.DatetimeIndex(datas, name='data'))
+
+    for coluna in ('estado', 'bioma', 'municipio', 'satelite'):
+        df[coluna] = df[coluna].astype('category')
+
+    return df
+
+
+def test_cubo_conta_focos_com_dimensao_nula(tmp_path):
+
+    cubo = construir_cubo(_focos())
+
+    assert cubo['focos'].sum() == 5
+    assert serie_diaria(cubo).loc['2020-01-10'] == 3
+    assert serie_diaria(cubo).loc['2020-02-03'] == 2
+
+    # a gravação em parquet preserva as linhas com valor nulo
+    salvar_cubo(cubo, str(tmp_path))
+    assert carregar_cubo(diretorio=str(tmp_path))['focos'].sum() == 5
+
+
+def test_rankings_ignoram_dimensao_nula(tmp_path):
+
+    cubo = construir_cubo(_focos())
+    esperado = top_municipios(cubo, None)
+    assert esperado.to_dict() == {'ALTAMIRA': 2, 'SORRISO': 1}
+
+    salvar_rankings(construir_rankings(cubo), str(tmp_path))
+    rankings = RankingsFocos(str(tmp_path))
+
+    (mes_inicial, mes_final), _ = meses_inteiros('2020-01-01', '2020-02-29')
+    assert rankings.top('municipio', None, mes_inicial, mes_final).to_dict() == esperado.to_dict()
+
+    # dias soltos nas bordas somados a partir do cubo, com linhas de município nulo
+    (mes_inicial, mes_final), _ = meses_inteiros('2020-02-01', '2020-02-29')
+    parcial = cubo[(cubo['data'] == '2020-01-10').to_numpy()]
+    assert rankings.top('municipio', None, mes_inicial, mes_final, [parcial]).to_dict() == esperado.to_dict()
+
+
+def test_cubo_satelites_conta_focos_com_dimensao_nula():
+
+    cubo = construir_cubo_satelites(_focos())
+
+    assert cubo['focos'].sum() == 5
+    assert cubo['unicos'].sum() == 4
+    assert np.array_equal(cubo.groupby('data')['focos'].sum().to_numpy(), [3, 2])
@@ -0,0 +1,63 @@
+import io
+import zipfile
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from queimadas.exportacao import FORMATOS, exportar, exportar_focos, exportar_pacote
+
+TABELA = pd.DataFrame({'data': pd.date_range('2020-01-01', periods=10), 'focos': range(10)})
+
+
+# bytes que o st.download_button recebe do valor retornado pela função do botão
+def _bytes_download(valor):
+    return convert_data_to_bytes_and_infer_mime(valor, ValueError(f'tipo não aceito: {type(valor)}'))[0]
+
+
+def _ler(conteudo, formato):
+    if formato == 'CSV':
+        return pd.read_csv(io.BytesIO(conteudo))
+    return pq.read_table(io.BytesIO(conteudo)).to_pandas()
+
+
+@pytest.mark.parametrize('formato', list(FORMATOS))
+def test_exportar_tabela(formato):
+
+    tabela = _ler(_bytes_download(exportar(TABELA, formato)), formato)
+
+    assert tabela['focos'].tolist() == list(range(10))
+
+
+@pytest.mark.parametrize('formato', list(FORMATOS))
+def test_exportar_pacote(formato):
+
+    conteudo = _bytes_download(exportar_pacote({'diaria': TABELA, 'anual': TABELA.iloc[:2]}, formato))
+
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as pacote:
+        extensao = FORMATOS[formato][0]
+        assert sorted(pacote.namelist()) == [f'anual.{extensao}', f'diaria.{extensao}']
+        assert len(_ler(pacote.read(f'anual.{extensao}'), formato)) == 2
+
+
+@pytest.mark.parametrize('formato', list(FORMATOS))
+def test_exportar_focos(dados_sinteticos, formato):
+
+    focos = _ler(_bytes_download(exportar_focos('PARÁ', '2004-01-01', '2004-12-31', formato,
+                                                diretorio=str(dados_sinteticos / 'focos'))), formato)
+
+    assert len(focos) > 0
+    assert list(focos.columns) == ['data', 'lat', 'lon', 'municipio', 'estado', 'bioma']
+    assert (focos['estado'] == 'PARÁ').all()
+
+
+@pytest.mark.parametrize('formato', list(FORMATOS))
+def test_exportar_focos_sem_resultado_gera_arquivo_valido(dados_sinteticos, formato):
+
+    for estado, inicio, fim in [('PARÁ', '1990-01-01', '1990-12-31'), ('NENHUM', '2004-01-01', '2004-12-31')]:
+        focos = _ler(_bytes_download(exportar_focos(estado, inicio, fim, formato,
+                                                    diretorio=str(dados_sinteticos / 'focos'))), formato)
+
+        assert len(focos) == 0
+        assert list(focos.columns) == ['data', 'lat', 'lon', 'municipio', 'estado', 'bioma']
@@ -0,0 +1,168 @@
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from queimadas import ingestao
+from queimadas.armazenamento import carregar_focos, ler_particoes
+from queimadas.cubo import ARQUIVO_CUBO, ESQUEMA_CUBO
+from queimadas.grade import carregar_grades
+from queimadas.satelites import SATELITE_REFERENCIA
+
+MUNICIPIOS = [('ALTAMIRA', 'PARÁ', 'AMAZÔNIA'), ('SORRISO', 'MATO GROSSO', 'CERRADO'),
+              ('CORUMBÁ', 'MATO GROSSO DO SUL', 'PANTANAL')]
+
+
+# focos aleatórios de um mês, com as colunas dos arquivos do INPE ("data" e "lat/lon" com os nomes pedidos)
+def _focos(ano, mes, linhas, semente, data='data_hora_gmt', lat='lat', lon='lon', satelites=None):
+
+    rng = np.random.default_rng(semente)
+    inicio = pd.Timestamp(year=ano, month=mes, day=1)
+    segundos = rng.integers(0, (inicio + pd.offsets.MonthBegin() - inicio).total_seconds(), linhas)
+    municipio = rng.integers(0, len(MUNICIPIOS), linhas)
+
+    df = pd.DataFrame({data: (inicio + pd.to_timedelta(np.sort(segundos), 's')).strftime('%Y-%m-%d %H:%M:%S'),
+                       lat: rng.uniform(-20, -3, linhas).round(4),
+                       lon: rng.uniform(-60, -45, linhas).round(4),
+                       'municipio': [MUNICIPIOS[i][0] for i in municipio],
+                       'estado': [MUNICIPIOS[i][1] for i in municipio],
+                       'bioma': [MUNICIPIOS[i][2] for i in municipio]})
+    if satelites is not None:
+        df['satelite'] = rng.choice(satelites, linhas)
+
+    return df
+
+
+def _gravar_anual(df, diretorio, ano):
+
+    caminho = os.path.join(diretorio, f'focos_br_ref_{ano}.zip')
+    with zipfile.ZipFile(caminho, 'w') as arquivo:
+        arquivo.writestr(f'focos_br_ref_{ano}.csv', df.to_csv(index=False))
+
+    return caminho
+
+
+def _gravar_mensal(df, diretorio, ano, mes):
+
+    caminho = os.path.join(diretorio, f'focos_mensal_br_{ano}{mes:02d}.csv')
+    df.to_csv(caminho, index=False)
+
+    return caminho
+
+
+# origem local com o arquivo anual de 2023 (colunas "latitude/longitude"), um mensal de 2023 (que deve ser
+# ignorado) e os mensais de janeiro e fevereiro de 2024 com vários satélites
+@pytest.fixture
+def origem(tmp_path):
+
+    anual, mensal = tmp_path / 'anual', tmp_path / 'mensal'
+    anual.mkdir()
+    mensal.mkdir()
+
+    _gravar_anual(pd.concat([_focos(2023, mes, 50, mes, 'data_pas', 'latitude', 'longitude') for mes in (8, 9)]),
+                  anual, 2023)
+    _gravar_mensal(_focos(2023, 5, 40, 5, satelites=[SATELITE_REFERENCIA]), mensal, 2023, 5)
+    for mes in (1, 2):
+        _gravar_mensal(_focos(2024, mes, 300, 10 + mes, satelites=[SATELITE_REFERENCIA, 'NOAA-20', 'GOES-16']),
+                       mensal, 2024, mes)
+
+    return tmp_path
+
+
+def _ingerir(origem, **opcoes):
+    saida = origem / 'saida'
+    return ingestao.ingerir(str(origem / 'anual'), str(origem / 'mensal'), diretorio_focos=str(saida / 'focos'),
+                            diretorio_cubo=str(saida / 'cubo'), diretorio_ingestao=str(saida / 'ingestao'),
+                            arquivo_grades=str(saida / 'grade' / 'grades.npz'), processos=1,
+                            diretorio_colunas=str(saida / 'colunas'), diretorio_rankings=str(saida / 'rankings'),
+                            diretorio_eventos=str(saida / 'eventos'), **opcoes)
+
+
+def _cubo(origem, ano):
+    return ler_particoes(str(origem / 'saida' / 'cubo'), ESQUEMA_CUBO.names, [ano], ESQUEMA_CUBO, ARQUIVO_CUBO)
+
+
+# Função que embrulha uma função de atualização guardando (nome, ano, meses) de cada chamada
+def _espiar(nome, funcao, chamadas):
+
+    def espia(*argumentos):
+        ano, meses = argumentos[1:3] if nome == 'atualizar_grades' else argumentos[:2]
+        chamadas.append((nome, ano, meses))
+        return funcao(*argumentos)
+
+    return espia
+
+
+def test_renomeia_latitude_longitude_de_2023(origem):
+
+    original = pd.read_csv(origem / 'anual' / 'focos_br_ref_2023.zip')
+    df = ingestao.ler_arquivo(str(origem / 'anual' / 'focos_br_ref_2023.zip'))
+
+    assert list(df.columns) == ingestao.COLUNAS_FOCOS
+    np.testing.assert_allclose(np.sort(df['lat']), np.sort(original['latitude']), atol=1e-4)
+    np.testing.assert_allclose(np.sort(df['lon']), np.sort(original['longitude']), atol=1e-4)
+
+
+def test_mantem_so_o_satelite_de_referencia(origem):
+
+    original = pd.read_csv(origem / 'mensal' / 'focos_mensal_br_202401.csv')
+    df = ingestao.ler_arquivo(str(origem / 'mensal' / 'focos_mensal_br_202401.csv'))
+
+    referencia = original[original['satelite'] == SATELITE_REFERENCIA]
+    assert 0 < len(df) == len(referencia) < len(original)
+    np.testing.assert_allclose(np.sort(df['lat']), np.sort(referencia['lat']), atol=1e-4)
+
+
+def test_arquivo_anual_substitui_os_mensais_do_ano(origem):
+
+    resumo = _ingerir(origem)
+
+    assert resumo['arquivos'] == ['focos_br_ref_2023.zip', 'focos_mensal_br_202401.csv',
+                                  'focos_mensal_br_202402.csv']
+
+    focos = carregar_focos(anos=[2023], diretorio=str(origem / 'saida' / 'focos'))
+    assert len(focos) == 100
+    assert set(focos.index.month) == {8, 9}
+
+
+def test_arquivos_sem_mudanca_sao_pulados(origem):
+
+    _ingerir(origem)
+    resumo = _ingerir(origem)
+
+    assert resumo['arquivos'] == []
+    assert resumo['focos'] == resumo['cubo'] == []
+
+
+def test_atualiza_so_os_meses_alterados(origem, monkeypatch):
+
+    _ingerir(origem)
+    cubo_antes = _cubo(origem, 2024)
+    grades_antes = carregar_grades(str(origem / 'saida' / 'grade' / 'grades.npz'))
+
+    # fevereiro de 2024 é republicado com outros focos
+    _gravar_mensal(_focos(2024, 2, 500, 99, satelites=[SATELITE_REFERENCIA]), origem / 'mensal', 2024, 2)
+
+    chamadas = []
+    for nome in ('atualizar_focos', 'atualizar_cubo', 'atualizar_grades'):
+        monkeypatch.setattr(ingestao, nome, _espiar(nome, getattr(ingestao, nome), chamadas))
+
+    resumo = _ingerir(origem)
+
+    assert resumo['arquivos'] == ['focos_mensal_br_202402.csv']
+    assert chamadas == [('atualizar_focos', 2024, [2]), ('atualizar_cubo', 2024, [2]),
+                        ('atualizar_grades', 2024, [2])]
+
+    # janeiro fica como estava e fevereiro passa a ter os 500 focos novos
+    cubo = _cubo(origem, 2024)
+    janeiro = cubo[cubo['data'].dt.month == 1].reset_index(drop=True)
+    pd.testing.assert_frame_equal(janeiro, cubo_antes[cubo_antes['data'].dt.month == 1].reset_index(drop=True),
+                                  check_categorical=False)
+    assert cubo.loc[cubo['data'].dt.month == 2, 'focos'].sum() == 500
+
+    grades = carregar_grades(str(origem / 'saida' / 'grade' / 'grades.npz'))
+    np.testing.assert_array_equal(grades.acumulado(2024, 1), grades_antes.acumulado(2024, 1))
+    np.testing.assert_array_equal(grades.acumulado(2023, 8), grades_antes.acumulado(2023, 8))
+    assert grades.acumulado(2024, 2).sum() == 500 != grades_antes.acumulado(2024, 2).sum()
@@ -0,0 +1,75 @@
+import os
+
+import pandas as pd
+
+from queimadas.armazenamento import carregar_focos
+from queimadas.colunas import ColunasFocos, salvar_colunas
+from queimadas.cubo import DIMENSOES, construir_cubo, salvar_cubo
+from queimadas.servico import ServicoFocos
+
+
+def test_intervalo_sem_particao_nao_carrega_anos(novo_servico):
+
+    servico = novo_servico()
+    diaria = servico.consultar('diaria', 'PARÁ', '2002-03-01', '2002-12-31')
+
+    assert diaria.sum() == 0
+    assert 'cubo' not in servico._indices
+
+
+def test_intervalo_sem_particao_nao_duplica_o_ano_seguinte(novo_servico):
+
+    esperado = novo_servico().calcular('anual', 'PARÁ', '2004-01-01', '2004-12-31')
+    linhas = len(novo_servico().indice('cubo', '2004-01-01', '2004-12-31').df)
+
+    servico = novo_servico()
+    for data_inicial, data_final in [('2002-03-01', '2002-12-31'), ('2004-01-01', '2004-12-31'),
+                                     ('2030-01-01', '2030-12-31'), ('2004-01-01', '2004-12-31')]:
+        servico.cache.limpar()
+        anual = servico.calcular('anual', 'PARÁ', data_inicial, data_final)
+
+    assert esperado.sum() > 0
+    pd.testing.assert_series_equal(anual, esperado)
+    assert len(servico.indice('cubo', '2004-01-01', '2004-12-31').df) == linhas
+    assert servico._indices['cubo'][0] == {2004}
+
+
+def test_colunas_mantem_a_versao_anterior(dados_sinteticos, tmp_path):
+
+    focos = carregar_focos(diretorio=str(dados_sinteticos / 'focos'))
+    diretorio = str(tmp_path / 'colunas')
+
+    primeira = salvar_colunas(focos[:100], diretorio)
+    segunda = salvar_colunas(focos[:200], diretorio)
+
+    # quem leu ATUAL antes da troca ainda abre a versão anterior
+    assert os.path.isdir(primeira)
+    assert len(ColunasFocos(diretorio)) == 200
+
+    terceira = salvar_colunas(focos[:300], diretorio)
+    assert not os.path.exists(primeira)
+    assert os.path.isdir(segunda) and os.path.isdir(terceira)
+
+
+def test_servico_passa_para_os_dados_regravados(dados_sinteticos, tmp_path):
+
+    focos = carregar_focos(diretorio=str(dados_sinteticos / 'focos'))
+    focos = focos[focos.index.year == 2003]
+    diretorio_cubo, diretorio_colunas = str(tmp_path / 'cubo'), str(tmp_path / 'colunas')
+
+    salvar_cubo(construir_cubo(focos[DIMENSOES]), diretorio_cubo)
+    salvar_colunas(focos, diretorio_colunas)
+
+    servico = ServicoFocos(diretorio_cubo=diretorio_cubo, diretorio_focos=str(dados_sinteticos / 'focos'),
+                           diretorio_colunas=diretorio_colunas, diretorio_rankings=str(tmp_path / 'rankings'),
+                           diretorio_eventos=str(tmp_path / 'eventos'),
+                           diretorio_cubo_satelites=str(tmp_path / 'cubo_satelites'), intervalo_verificacao=0)
+    assert servico.consultar('anual', None).sum() == len(focos)
+    assert servico.consultar('mapa', None)['focos'].sum() == len(focos)
+
+    # outra ingestão (de outro processo) regrava o cubo e as colunas
+    salvar_cubo(construir_cubo(focos[:1000][DIMENSOES]), diretorio_cubo)
+    salvar_colunas(focos[:1000], diretorio_colunas)
+
+    assert servico.consultar('anual', None).sum() == 1000
+    assert servico.consultar('mapa', None)['focos'].sum() == 1000